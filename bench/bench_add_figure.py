@@ -0,0 +1,75 @@
+"""
+Scaling of figure insertion in add_figure.py.
+
+Only add_figure_in_document() is timed, on an already loaded document,
+so load and save cost does not hide how insertion grows with the number
+of figures. Pass --scripts_dir to time another checkout's scripts, e.g.
+a worktree of an older commit.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import importlib
+import contextlib
+
+from synthetic_report import make_synthetic_report
+
+
+def main(scales: list[int], repeats: int, scripts_dir: str | None):
+    if scripts_dir is not None:
+        sys.path.insert(0, os.path.abspath(scripts_dir))
+    add_figure = importlib.import_module("add_figure")
+    helper = importlib.import_module("helper")
+
+    print(f"{'figures':>8} {'body':>7} {'insert (s)':>11} {'per figure (ms)':>16}")
+    for n in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = make_synthetic_report(
+                tmp, paragraphs=n * 5, figures=n, tables=0, image_size=(60, 40)
+            )
+            config = helper.load_yaml(paths["config"])
+
+            best = float("inf")
+            for _ in range(repeats):
+                document = helper.open_document(paths["docx"])
+                body = len(document.element.body)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(open(os.devnull, "w")):
+                    if hasattr(add_figure, "add_figure_in_document"):
+                        add_figure.add_figure_in_document(
+                            document, paths["figure_dir"], config
+                        )
+                    else:
+                        # scripts from before the *_in_document split
+                        add_figure.add_figure(
+                            paths["docx"],
+                            os.path.join(tmp, "out.docx"),
+                            paths["figure_dir"],
+                            paths["config"],
+                        )
+                best = min(best, time.perf_counter() - start)
+
+            print(f"{n:>8} {body:>7} {best:>11.3f} {1000 * best / n:>16.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark add_figure insertion")
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[10, 100, 500, 1000, 2000],
+        help="comma separated figure counts",
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    parser.add_argument(
+        "--scripts_dir",
+        type=str,
+        default=None,
+        help="scripts directory to benchmark instead of inst/scripts",
+    )
+    args = parser.parse_args()
+
+    main(args.scales, args.repeats, args.scripts_dir)
@@ -0,0 +1,75 @@
+"""
+Tagging and verifying alt text in separate scripts versus one pass.
+
+"separate" runs add_figure_alt_text.py, add_table_alt_text.py, and
+check_alt_text_magic.py, like add_plots(), add_tables(), and
+validate_alt_text_magic_strings() do, each loading the document.
+"single" runs alt_text.py --tag figures,tables --verify, which loads
+the document once, walks it once, and saves it once.
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from run_benchmarks import prepare_report
+
+from worker import run_script
+
+
+def main(scales: list[int], repeats: int):
+    print(f"{'figures':>8} {'separate (s)':>13} {'single (s)':>11}")
+    for figures in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            _, docs = prepare_report(tmp, figures, 5, 0.25, 0.3, 3, (300, 200))
+            middle = os.path.join(tmp, "middle.docx")
+            out = os.path.join(tmp, "out.docx")
+
+            runs = {
+                "separate": [
+                    ("add_figure_alt_text.py", ["-i", docs["figures"], "-o", middle]),
+                    ("add_table_alt_text.py", ["-i", middle, "-o", out]),
+                    ("check_alt_text_magic.py", ["-i", out]),
+                ],
+                "single": [
+                    (
+                        "alt_text.py",
+                        [
+                            "-i",
+                            docs["figures"],
+                            "-o",
+                            out,
+                            "--tag",
+                            "figures,tables",
+                            "--verify",
+                        ],
+                    )
+                ],
+            }
+            results = {}
+            for name, scripts in runs.items():
+                best = float("inf")
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    for script, args in scripts:
+                        result = run_script(script, args)
+                        if result["status"] != 0:
+                            raise RuntimeError(result["stderr"])
+                    best = min(best, time.perf_counter() - start)
+                results[name] = best
+            print(f"{figures:>8} {results['separate']:>13.3f} {results['single']:>11.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tagging and verifying alt text")
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[50, 200, 800],
+        help="comma separated figure counts",
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.scales, args.repeats)
@@ -0,0 +1,89 @@
+"""
+Build many reports that share one artifact tree, one after the other
+(one pipeline.py run per report, each loading its own config, footnotes
+and metadata) versus batch.py with a pool of workers.
+
+Every report is a copy of the same synthetic document, so all of them
+read the same figures, tables and metadata sidecars.
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from synthetic_report import make_synthetic_report
+
+import batch
+from worker import run_script
+
+
+def main(reports: int, workers: int, figures: int, tables: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_synthetic_report(
+            tmp,
+            paragraphs=(figures + tables) * 3,
+            figures=figures,
+            tables=tables,
+        )
+        jobs = []
+        for r in range(reports):
+            docx_in = os.path.join(tmp, f"report-{r:03d}.docx")
+            shutil.copy(paths["docx"], docx_in)
+            jobs.append(
+                {
+                    "docx_in": docx_in,
+                    "docx_out": os.path.join(tmp, f"report-{r:03d}-draft.docx"),
+                }
+            )
+        shared_args = [
+            "-s",
+            "figures,footnotes",
+            "-d",
+            paths["figure_dir"],
+            "-t",
+            paths["table_dir"],
+            "-f",
+            paths["footnotes"],
+            "-c",
+            paths["config"],
+        ]
+
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            start = time.perf_counter()
+            for job in jobs:
+                run_script(
+                    "pipeline.py",
+                    ["-i", job["docx_in"], "-o", job["docx_out"]] + shared_args,
+                )
+            sequential = time.perf_counter() - start
+
+            start = time.perf_counter()
+            summary = batch.run_batch(
+                jobs,
+                shared_args,
+                workers,
+                paths["figure_dir"],
+                paths["table_dir"],
+                paths["footnotes"],
+                paths["config"],
+            )
+            batched = time.perf_counter() - start
+
+        print(f"reports: {reports} x ({figures} figures, {tables} tables)")
+        print(f"{'sequential (s)':>24} {sequential:>8.3f}")
+        label = f"batch, {summary['workers']} workers (s)"
+        print(f"{label:>24} {batched:>8.3f}")
+        print(f"{'failed jobs':>24} {summary['failed']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch report builds")
+    parser.add_argument("-r", "--reports", type=int, default=16)
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("-n", "--figures", type=int, default=100)
+    parser.add_argument("-t", "--tables", type=int, default=25)
+    args = parser.parse_args()
+
+    main(args.reports, args.workers, args.figures, args.tables)
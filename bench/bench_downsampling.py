@@ -0,0 +1,105 @@
+"""
+Document size and add_figure.py time with image_downsampling on and off.
+
+Figures are large antialiased scatter plots shown at default_fig_width
+(use_artifact_size is turned off). Each configuration runs add_figure()
+end to end (load, insert, save) with an empty image cache, and the size
+of the saved document is reported.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+
+import yaml
+from PIL import Image, ImageDraw, ImageFilter
+
+from synthetic_report import make_synthetic_report
+
+import helper
+import add_figure
+
+
+def write_plot(path: str, index: int, image_size: tuple[int, int]):
+    """Overwrite a synthetic figure with a scatter plot, smoothed like device output."""
+    rng = random.Random(index)
+    width, height = image_size
+    img = Image.new("RGB", image_size, (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for k in range(0, width, width // 20):
+        draw.line([(k, 0), (k, height)], fill=(230, 230, 230), width=3)
+    r = max(width // 500, 2)
+    for _ in range(20000):
+        x = rng.gauss(width / 2, width / 6)
+        y = rng.gauss(height / 2, height / 6)
+        draw.ellipse(
+            [x - r, y - r, x + r, y + r],
+            fill=(rng.randrange(200), 80, 160),
+            outline=(0, 0, 0),
+        )
+    img = img.filter(ImageFilter.GaussianBlur(1.5))
+    img.save(path, dpi=(300, 300))
+
+
+def main(figures: int, image_size: tuple[int, int], target_dpi: int, quantize: int):
+    settings = {
+        "off": None,
+        f"{target_dpi} dpi": {"enabled": True, "target_dpi": target_dpi},
+    }
+    if quantize:
+        settings[f"{target_dpi} dpi, {quantize} colors"] = {
+            "enabled": True,
+            "target_dpi": target_dpi,
+            "png_quantize_colors": quantize,
+        }
+
+    print(f"{'downsampling':>22} {'figures':>8} {'time (s)':>9} {'docx (MB)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_synthetic_report(
+            tmp, paragraphs=figures * 2, figures=figures, tables=0, image_size=(60, 40)
+        )
+        for f in range(figures):
+            write_plot(
+                os.path.join(paths["figure_dir"], f"figure-{f:05d}.png"), f, image_size
+            )
+
+        for i, (name, block) in enumerate(settings.items()):
+            config = helper.load_yaml(paths["config"])
+            config["image_cache_dir"] = os.path.join(tmp, f"cache-{i}")
+            config["use_artifact_size"] = False
+            if block is not None:
+                config["image_downsampling"] = block
+            config_path = os.path.join(tmp, f"config-{i}.yaml")
+            with open(config_path, "w") as f:
+                yaml.safe_dump(config, f)
+
+            docx_out = os.path.join(tmp, f"out-{i}.docx")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                add_figure.add_figure(
+                    paths["docx"], docx_out, paths["figure_dir"], config_path
+                )
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(docx_out) / 1e6
+
+            print(f"{name:>22} {figures:>8} {elapsed:>9.3f} {size:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark figure downsampling")
+    parser.add_argument("-n", "--figures", type=int, default=10)
+    parser.add_argument(
+        "--image_size",
+        type=lambda x: tuple(int(v) for v in x.split("x")),
+        default=(6000, 4000),
+        help="figure size in pixels, e.g. 6000x4000",
+    )
+    parser.add_argument("--target_dpi", type=int, default=300)
+    parser.add_argument(
+        "--quantize", type=int, default=0, help="also run with this many colors"
+    )
+    args = parser.parse_args()
+
+    main(args.figures, args.image_size, args.target_dpi, args.quantize)
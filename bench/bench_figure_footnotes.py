@@ -0,0 +1,99 @@
+"""
+Footnote placement cost in add_figure_footnotes.py.
+
+Figures are inserted first, then only add_figure_footnotes_in_document()
+is timed on the loaded document. Half of the figures are in multi-figure
+magic strings so placement has to find several picture paragraphs per
+anchor. --without_figures skips the insertion, the worst case where no
+anchor has its pictures and every search runs to the end of the body.
+Pass --scripts_dir to time another checkout's scripts.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import importlib
+import contextlib
+
+from synthetic_report import make_synthetic_report
+
+
+def main(
+    scales: list[int],
+    repeats: int,
+    panels: int,
+    without_figures: bool,
+    scripts_dir: str | None,
+):
+    if scripts_dir is not None:
+        sys.path.insert(0, os.path.abspath(scripts_dir))
+    add_figure = importlib.import_module("add_figure")
+    add_figure_footnotes = importlib.import_module("add_figure_footnotes")
+    helper = importlib.import_module("helper")
+
+    print(f"{'figures':>8} {'anchors':>8} {'body':>7} {'footnotes (s)':>14}")
+    for n in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            multi = n // (2 * panels)
+            paths = make_synthetic_report(
+                tmp,
+                paragraphs=n * 5,
+                figures=n - multi * panels,
+                tables=0,
+                multi_figures=multi,
+                panels=panels,
+                image_size=(60, 40),
+            )
+            config = helper.load_yaml(paths["config"])
+            footnotes = helper.load_yaml(paths["footnotes"])
+
+            if without_figures:
+                with_figures = paths["docx"]
+            else:
+                with_figures = os.path.join(tmp, "figures.docx")
+                with contextlib.redirect_stdout(open(os.devnull, "w")):
+                    add_figure.add_figure(
+                        paths["docx"], with_figures, paths["figure_dir"], paths["config"]
+                    )
+
+            best = float("inf")
+            for _ in range(repeats):
+                document = helper.open_document(with_figures)
+                body = len(document.element.body)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(open(os.devnull, "w")):
+                    add_figure_footnotes.add_figure_footnotes_in_document(
+                        document, paths["figure_dir"], footnotes, config
+                    )
+                best = min(best, time.perf_counter() - start)
+
+            anchors = n - multi * panels + multi
+            print(f"{n:>8} {anchors:>8} {body:>7} {best:>14.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark figure footnote placement")
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[100, 500, 1000],
+        help="comma separated figure counts",
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    parser.add_argument("-p", "--panels", type=int, default=3)
+    parser.add_argument(
+        "--without_figures",
+        action="store_true",
+        help="time placement on the document before figures are inserted",
+    )
+    parser.add_argument(
+        "--scripts_dir",
+        type=str,
+        default=None,
+        help="scripts directory to benchmark instead of inst/scripts",
+    )
+    args = parser.parse_args()
+
+    main(args.scales, args.repeats, args.panels, args.without_figures, args.scripts_dir)
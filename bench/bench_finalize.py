@@ -0,0 +1,60 @@
+"""
+Finalizing a draft in separate steps versus one fused pass.
+
+"separate" runs remove_bookmarks.py then remove_magic_strings.py, like
+finalize_document() did, each loading and saving the document. "fused"
+runs finalize.py, which walks the document once and saves it once, and
+also keeps captions with their artifacts.
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from run_benchmarks import prepare_report
+
+from worker import run_script
+
+
+def main(scales: list[int], repeats: int):
+    print(f"{'figures':>8} {'separate (s)':>13} {'fused (s)':>10}")
+    for figures in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            _, docs = prepare_report(tmp, figures, 5, 0.25, 0.3, 3, (300, 200))
+            middle = os.path.join(tmp, "middle.docx")
+            out = os.path.join(tmp, "out.docx")
+
+            runs = {
+                "separate": [
+                    ("remove_bookmarks.py", ["-i", docs["draft"], "-o", middle]),
+                    ("remove_magic_strings.py", ["-i", middle, "-o", out]),
+                ],
+                "fused": [("finalize.py", ["-i", docs["draft"], "-o", out])],
+            }
+            results = {}
+            for name, scripts in runs.items():
+                best = float("inf")
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    for script, args in scripts:
+                        result = run_script(script, args)
+                        if result["status"] != 0:
+                            raise RuntimeError(result["stderr"])
+                    best = min(best, time.perf_counter() - start)
+                results[name] = best
+            print(f"{figures:>8} {results['separate']:>13.3f} {results['fused']:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark finalizing a draft")
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[50, 200, 800],
+        help="comma separated figure counts",
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.scales, args.repeats)
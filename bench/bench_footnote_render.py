@@ -0,0 +1,78 @@
+"""
+Footnote paragraph generation with and without a shared FootnoteRenderer.
+
+--paragraphs footnote paragraphs are made from --distinct metadata
+variants (artifacts of one report often share their source script,
+notes and abbreviations), a third of them with _{sub} and ^{super}script
+notes. "per call" builds the text lines and paragraph from scratch like
+create_meta_text_lines() and create_footnote_paragraph() do, "renderer"
+reuses one FootnoteRenderer for all of them.
+"""
+import time
+import argparse
+
+import synthetic_report  # noqa: F401, puts inst/scripts on sys.path
+import helper
+
+FOOTNOTES = {
+    "figure_footnotes": {"DV": "Observed data are shown as points"},
+    "table_footnotes": {},
+    "abbreviations": {"AUC": "area under the curve", "Cmax": "maximum concentration"},
+}
+CONFIG = {
+    "footnotes_font": "Arial Narrow",
+    "footnotes_font_size": 10,
+    "footnote_order": ["Source", "Object", "Notes", "Abbreviations"],
+}
+
+
+def make_metadata(variant: int) -> dict:
+    notes = [f"Dose group {variant}."]
+    if variant % 3 == 0:
+        notes.append("C_{max} and AUC_{0-inf} are shown on a log^{10} scale")
+    return {
+        "source_meta": {
+            "path": f"scripts/model-{variant % 20}.R",
+            "latest_time": "2025-01-01 00:00:00",
+        },
+        "object_meta": {
+            "path": f"OUTPUTS/figures/figure-{variant}.png",
+            "creation_time": "2025-01-01 00:00:00",
+            "meta_type": "DV",
+            "footnotes": {"notes": notes, "abbreviations": ["AUC", "Cmax"]},
+        },
+    }
+
+
+def main(paragraphs: int, distinct: int, repeats: int):
+    metadata = [make_metadata(p % distinct) for p in range(paragraphs)]
+
+    def per_call():
+        for i, meta in enumerate(metadata):
+            lines = helper.create_meta_text_lines(FOOTNOTES, meta, False, "figure", CONFIG)
+            helper.create_footnote_paragraph(lines, f"figure-{i}.png", i, CONFIG)
+
+    def renderer():
+        footnote_renderer = helper.FootnoteRenderer(CONFIG, FOOTNOTES)
+        for i, meta in enumerate(metadata):
+            lines = footnote_renderer.meta_text_lines(meta, "figure")
+            footnote_renderer.footnote_paragraph(lines, f"figure-{i}.png", i)
+
+    print(f"paragraphs: {paragraphs}, distinct metadata: {distinct}")
+    for name, render in [("per call", per_call), ("renderer", renderer)]:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            render()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name + ' (s)':>16} {best:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark footnote paragraph generation")
+    parser.add_argument("-n", "--paragraphs", type=int, default=10000)
+    parser.add_argument("-d", "--distinct", type=int, default=200)
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.paragraphs, args.distinct, args.repeats)
@@ -0,0 +1,77 @@
+"""
+Size of document.xml and save/parse time of a report whose figure and
+table footnotes carry their font inline versus through the
+footnotes_character_style character styles.
+
+Figures are inserted first, then figure and table footnotes are added
+with each setting and the document is saved; parse time is the time to
+open the saved document again.
+"""
+import os
+import time
+import zipfile
+import argparse
+import tempfile
+import contextlib
+
+from synthetic_report import make_synthetic_report
+
+import helper
+from add_figure import add_figure
+from add_figure_footnotes import add_figure_footnotes_in_document
+from add_table_footnotes import add_table_footnotes_in_document
+
+
+def main(figures: int, tables: int, repeats: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_synthetic_report(
+            tmp,
+            paragraphs=(figures + tables) * 3,
+            figures=figures,
+            tables=tables,
+            image_size=(60, 40),
+        )
+        footnotes = helper.load_yaml(paths["footnotes"])
+        with_figures = os.path.join(tmp, "figures.docx")
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            add_figure(paths["docx"], with_figures, paths["figure_dir"], paths["config"])
+
+        print(f"footnotes: {figures} figures, {tables} tables")
+        print(f"{'':>12} {'document.xml (MB)':>18} {'save (s)':>9} {'parse (s)':>10}")
+        for name, character_style in [("inline", False), ("style", True)]:
+            config = helper.load_yaml(paths["config"])
+            config["footnotes_character_style"] = character_style
+            out = os.path.join(tmp, f"{name}.docx")
+
+            save = parse = float("inf")
+            for _ in range(repeats):
+                document = helper.open_document(with_figures)
+                add_figure_footnotes_in_document(
+                    document, paths["figure_dir"], footnotes, config
+                )
+                add_table_footnotes_in_document(
+                    document, paths["table_dir"], footnotes, config
+                )
+                start = time.perf_counter()
+                helper.save_document(document, out)
+                save = min(save, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                helper.open_document(out)
+                parse = min(parse, time.perf_counter() - start)
+
+            with zipfile.ZipFile(out) as z:
+                size = z.getinfo("word/document.xml").file_size / 1e6
+            print(f"{name:>12} {size:>18.2f} {save:>9.3f} {parse:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark inline footnote run properties against character styles"
+    )
+    parser.add_argument("-n", "--figures", type=int, default=2000)
+    parser.add_argument("-t", "--tables", type=int, default=500)
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.figures, args.tables, args.repeats)
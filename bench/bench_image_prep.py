@@ -0,0 +1,72 @@
+"""
+Image preparation cost in add_figure.py with label_multi_figures on.
+
+Every figure is a panel of a multi figure so each one is labeled. Only
+add_figure_in_document() is timed, for each image_workers value, once
+with an empty label cache (cold) and once with the cache filled by the
+previous run (warm). Speedups from image_workers need as many free cores.
+"""
+import os
+import time
+import argparse
+import tempfile
+import contextlib
+
+from synthetic_report import make_synthetic_report
+
+import helper
+import add_figure
+
+
+def main(figures: int, panels: int, workers: list[int], image_size: tuple[int, int]):
+    print(f"{'workers':>8} {'figures':>8} {'cold (s)':>9} {'warm (s)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_synthetic_report(
+            tmp,
+            paragraphs=figures * 2,
+            figures=0,
+            tables=0,
+            multi_figures=figures // panels,
+            panels=panels,
+            image_size=image_size,
+        )
+        config = helper.load_yaml(paths["config"])
+        config["label_multi_figures"] = True
+
+        for n in workers:
+            config["image_workers"] = n
+            config["image_cache_dir"] = os.path.join(tmp, f"cache-{n}")
+
+            timings = []
+            for _ in ("cold", "warm"):
+                document = helper.open_document(paths["docx"])
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(open(os.devnull, "w")):
+                    add_figure.add_figure_in_document(
+                        document, paths["figure_dir"], config
+                    )
+                timings.append(time.perf_counter() - start)
+
+            print(f"{n:>8} {figures:>8} {timings[0]:>9.3f} {timings[1]:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark figure image preparation")
+    parser.add_argument("-n", "--figures", type=int, default=200)
+    parser.add_argument("-p", "--panels", type=int, default=4)
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[1, 2, 4, 8],
+        help="comma separated image_workers values",
+    )
+    parser.add_argument(
+        "--image_size",
+        type=lambda x: tuple(int(v) for v in x.split("x")),
+        default=(1800, 1200),
+        help="panel size in pixels, e.g. 1800x1200",
+    )
+    args = parser.parse_args()
+
+    main(args.figures, args.panels, args.workers, args.image_size)
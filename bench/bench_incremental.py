@@ -0,0 +1,91 @@
+"""
+Full versus incremental rebuild of a draft after one figure changed.
+
+The full build is the Python part of build_report() (the figures and
+footnotes stages of pipeline.py on a document that already holds its
+tables, so add_tables() in R is not included). The incremental build is
+incremental.py on the previous draft after one figure file was rewritten.
+"""
+import os
+import time
+import argparse
+import tempfile
+import contextlib
+
+from synthetic_report import make_synthetic_report, write_figure
+
+import pipeline
+import incremental
+
+
+def main(figures: int, tables: int, image_size: tuple[int, int]):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_synthetic_report(
+            tmp,
+            paragraphs=(figures + tables) * 3,
+            figures=figures,
+            tables=tables,
+            image_size=image_size,
+        )
+        draft = os.path.join(tmp, "draft.docx")
+        args = dict(
+            docx_in=paths["docx"],
+            figure_dir=paths["figure_dir"],
+            table_dir=paths["table_dir"],
+            footnotes_yaml=paths["footnotes"],
+            config_yaml=paths["config"],
+        )
+
+        def full_build():
+            pipeline.build_report(
+                paths["docx"],
+                draft,
+                ["figures", "footnotes"],
+                paths["figure_dir"],
+                paths["table_dir"],
+                paths["footnotes"],
+                paths["config"],
+            )
+
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            start = time.perf_counter()
+            full_build()
+            full = time.perf_counter() - start
+
+            start = time.perf_counter()
+            incremental.update_draft(draft, record=True, **args)
+            record = time.perf_counter() - start
+
+            start = time.perf_counter()
+            incremental.update_draft(draft, **args)
+            unchanged = time.perf_counter() - start
+
+            write_figure(
+                os.path.join(paths["figure_dir"], f"figure-{figures // 2:05d}.png"),
+                figures + 1,
+                image_size,
+            )
+            start = time.perf_counter()
+            incremental.update_draft(draft, **args)
+            one_figure = time.perf_counter() - start
+
+        print(f"artifacts: {figures} figures, {tables} tables")
+        print(f"{'full build (s)':>24} {full:>8.3f}")
+        print(f"{'record manifest (s)':>24} {record:>8.3f}")
+        print(f"{'incremental, none (s)':>24} {unchanged:>8.3f}")
+        print(f"{'incremental, one (s)':>24} {one_figure:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark incremental rebuilds")
+    parser.add_argument("-n", "--figures", type=int, default=400)
+    parser.add_argument("-t", "--tables", type=int, default=100)
+    parser.add_argument(
+        "--image_size",
+        type=lambda x: tuple(int(v) for v in x.split("x")),
+        default=(1200, 800),
+        help="figure size in pixels, e.g. 1200x800",
+    )
+    args = parser.parse_args()
+
+    main(args.figures, args.tables, args.image_size)
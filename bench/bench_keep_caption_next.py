@@ -0,0 +1,114 @@
+"""
+Keeping captions with their artifacts in reports with an increasing
+number of figures and tables.
+
+Two previous implementations are kept here for reference. "forward
+scan" rejoins the w:t text of every paragraph after a caption until it
+finds a magic string, which is quadratic in the size of the report.
+"anchor index" looks the magic string up in MagicIndex but still
+resolves p.style.name through python-docx for every paragraph.
+"paragraph index" is keep_caption_next_in_document(), finding every
+caption and the magic string after it in one pass over the paragraphs.
+All three are checked to leave the same document behind.
+"""
+import re
+import time
+import argparse
+import tempfile
+
+from run_benchmarks import prepare_report
+
+import helper
+from docx.oxml import OxmlElement
+from magic_index import MagicIndex
+from parse_magic_string import has_magic_string
+from keep_caption_next import keep_caption_next_in_document
+
+CAPTION_STYLE = "Caption"
+MAGIC_PATTERN = re.compile(r"\{rpfy\}\:.*?\.[^.]+$")
+
+
+def is_caption(p) -> bool:
+    return (p.style and p.style.name == CAPTION_STYLE) or any(
+        ("SEQ Table" in instr.text or "SEQ Figure" in instr.text)
+        for instr in p._element.xpath(".//w:instrText")
+    )
+
+
+def add_keep_next(element):
+    pPr = element.get_or_add_pPr()
+    if not pPr.xpath("./w:keepNext"):
+        pPr.append(OxmlElement("w:keepNext"))
+
+
+def keep_caption_next_forward_scan(doc):
+    paras = doc.paragraphs
+    for i, p in enumerate(paras):
+        if not is_caption(p):
+            continue
+        add_keep_next(p._element)
+        for q in paras[i + 1 :]:
+            text = "".join(t.text for t in q._element.xpath(".//w:t"))
+            if MAGIC_PATTERN.search(text):
+                add_keep_next(q._element)
+                break
+
+
+def keep_caption_next_anchor_index(doc):
+    index = MagicIndex(doc)
+    for i, p in enumerate(doc.paragraphs):
+        if not is_caption(p):
+            continue
+        add_keep_next(p._element)
+        for anchor in index.anchors_after(i):
+            if has_magic_string(anchor.xml_text):
+                add_keep_next(anchor.element)
+                break
+
+
+def main(scales: list[int], repeats: int):
+    implementations = [
+        ("forward scan", keep_caption_next_forward_scan),
+        ("anchor index", keep_caption_next_anchor_index),
+        ("paragraph index", keep_caption_next_in_document),
+    ]
+    print(
+        f"{'artifacts':>10}"
+        + "".join(f" {name + ' (s)':>20}" for name, _ in implementations)
+    )
+    for figures in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            _, docs = prepare_report(tmp, figures, 3, 0.25, 0.0, 3, (60, 40))
+
+            results = {}
+            for name, keep in implementations:
+                best = float("inf")
+                for _ in range(repeats):
+                    document = helper.open_document(docs["report"])
+                    start = time.perf_counter()
+                    keep(document)
+                    best = min(best, time.perf_counter() - start)
+                results[name] = (best, document.element.xml)
+
+            documents = {str(xml) for _, xml in results.values()}
+            if len(documents) != 1:
+                raise AssertionError(f"Documents differ at {figures} artifacts")
+            print(
+                f"{figures:>10}"
+                + "".join(f" {results[name][0]:>20.3f}" for name, _ in implementations)
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark keeping captions with artifacts")
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[250, 500, 1000, 2000],
+        help="comma separated artifact counts",
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.scales, args.repeats)
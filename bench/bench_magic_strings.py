@@ -0,0 +1,93 @@
+"""
+Finding and parsing magic strings in paragraph texts.
+
+--strings paragraph texts are generated, a mix of single figures, figures
+with args, multi figure lists with per-file args and tables. "distinct"
+times every text once; "repeated" draws the same number of texts from
+--distinct different ones, like paragraphs read again by later steps and
+rebuilds in the worker. Pass --scripts_dir to time another checkout's
+scripts; checkouts without lex_magic_strings() are timed with the
+MAGIC_PATTERN.findall() and parse_magic_string() they used.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import importlib
+
+import synthetic_report  # noqa: F401, puts inst/scripts on sys.path
+
+
+def make_text(i: int) -> str:
+    match i % 4:
+        case 0:
+            return f"{{rpfy}}:figures/figure-{i:06d}.png"
+        case 1:
+            return f"{{rpfy}}:figure-{i:06d}.png<width: 5, height: 3.5>"
+        case 2:
+            panels = ", ".join(
+                f"panel-{i:06d}-{p}.png<width: {p + 2}>" for p in range(4)
+            )
+            return f"{{rpfy}}:[{panels}]"
+        case _:
+            return f"{{rpfy}}:table-{i:06d}.csv"
+
+
+def main(strings: int, distinct: int, repeats: int, scripts_dir: str | None):
+    if scripts_dir is not None:
+        sys.path.insert(0, os.path.abspath(scripts_dir))
+    module = importlib.import_module("parse_magic_string")
+
+    if hasattr(module, "lex_magic_strings"):
+
+        def lex(text):
+            return [token.args() for token in module.lex_magic_strings(text)]
+
+        def clear():
+            module.lex_magic_strings.cache_clear()
+            module._parse_entries.cache_clear()
+
+    else:
+
+        def lex(text):
+            return [
+                module.parse_magic_string(match)
+                for match in module.MAGIC_PATTERN.findall(text)
+            ]
+
+        def clear():
+            pass
+
+    random.seed(0)
+    texts = {
+        "distinct": [make_text(i) for i in range(strings)],
+        "repeated": [make_text(random.randrange(distinct)) for _ in range(strings)],
+    }
+
+    print(f"magic strings: {strings}, repeated from {distinct} distinct")
+    for name, batch in texts.items():
+        best = float("inf")
+        for _ in range(repeats):
+            clear()
+            start = time.perf_counter()
+            for text in batch:
+                lex(text)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name + ' (s)':>16} {best:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark magic string lexing")
+    parser.add_argument("-n", "--strings", type=int, default=100000)
+    parser.add_argument("-d", "--distinct", type=int, default=2000)
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    parser.add_argument(
+        "--scripts_dir",
+        type=str,
+        default=None,
+        help="scripts directory to benchmark instead of inst/scripts",
+    )
+    args = parser.parse_args()
+
+    main(args.strings, args.distinct, args.repeats, args.scripts_dir)
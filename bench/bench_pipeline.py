@@ -0,0 +1,128 @@
+"""
+Compare the chained per-step scripts against the single-load pipeline.
+
+Both halves of build_report() that run in Python are timed:
+- strip: remove_footnotes -> remove_tables -> remove_figures
+- build: keep_caption_next -> add_figure -> add_figure_alt_text ->
+  add_figure_footnotes -> add_table_footnotes
+
+Each chained step loads and saves the document like the R wrappers do;
+interpreter startup (uv run per step) is not included, so the real
+saving from R is larger.
+"""
+import os
+import time
+import argparse
+import tempfile
+import contextlib
+
+from synthetic_report import make_synthetic_report
+
+import pipeline
+from remove_footnotes import remove_footnotes
+from remove_tables import remove_tables
+from remove_figures import remove_figures
+from keep_caption_next import keep_caption_next
+from add_figure import add_figure
+from add_figure_alt_text import tag_figures_with_magic
+from add_figure_footnotes import add_figure_footnotes
+from add_table_footnotes import add_table_footnotes
+
+
+def timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run_chain_build(paths: dict, docx_out: str) -> float:
+    elapsed = 0.0
+    elapsed += timed(keep_caption_next, paths["docx"], docx_out)
+    elapsed += timed(add_figure, docx_out, docx_out, paths["figure_dir"], paths["config"])
+    elapsed += timed(tag_figures_with_magic, docx_out, docx_out)
+    elapsed += timed(
+        add_figure_footnotes,
+        docx_out,
+        docx_out,
+        paths["figure_dir"],
+        paths["footnotes"],
+        paths["config"],
+    )
+    elapsed += timed(
+        add_table_footnotes,
+        docx_out,
+        docx_out,
+        paths["table_dir"],
+        paths["footnotes"],
+        paths["config"],
+    )
+    return elapsed
+
+
+def run_chain_strip(docx_in: str, docx_out: str, config: str) -> float:
+    elapsed = 0.0
+    elapsed += timed(remove_footnotes, docx_in, docx_out)
+    elapsed += timed(remove_tables, docx_out, docx_out)
+    elapsed += timed(remove_figures, docx_out, docx_out, config)
+    return elapsed
+
+
+def run_pipeline(paths: dict, docx_in: str, docx_out: str, stages: list[str]) -> float:
+    return timed(
+        pipeline.build_report,
+        docx_in,
+        docx_out,
+        stages,
+        paths["figure_dir"],
+        paths["table_dir"],
+        paths["footnotes"],
+        paths["config"],
+    )
+
+
+def main(scales: list[int], repeats: int):
+    print(f"{'figures':>8} {'tables':>7} {'half':>6} {'chain (s)':>10} {'pipeline (s)':>13} {'speedup':>8}")
+    for n in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = make_synthetic_report(
+                tmp, paragraphs=n * 10, figures=n, tables=n // 2, image_size=(300, 200)
+            )
+            draft = os.path.join(tmp, "draft.docx")
+            chain_out = os.path.join(tmp, "chain.docx")
+            pipe_out = os.path.join(tmp, "pipe.docx")
+
+            chain_build = min(run_chain_build(paths, chain_out) for _ in range(repeats))
+            pipe_build = min(
+                run_pipeline(paths, paths["docx"], draft, ["figures", "footnotes"])
+                for _ in range(repeats)
+            )
+            chain_strip = min(
+                run_chain_strip(draft, chain_out, paths["config"]) for _ in range(repeats)
+            )
+            pipe_strip = min(
+                run_pipeline(paths, draft, pipe_out, ["strip"]) for _ in range(repeats)
+            )
+
+            for half, chain, pipe in [
+                ("build", chain_build, pipe_build),
+                ("strip", chain_strip, pipe_strip),
+            ]:
+                print(
+                    f"{n:>8} {n // 2:>7} {half:>6} {chain:>10.3f} {pipe:>13.3f} {chain / pipe:>7.2f}x"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chained scripts vs pipeline")
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[10, 50, 200],
+        help="comma separated figure counts",
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.scales, args.repeats)
@@ -0,0 +1,92 @@
+"""
+Removing footnotes from drafts with an increasing number of footnotes.
+
+"xpath" is the previous implementation, kept here for reference: a
+document-wide //w:bookmarkEnd XPath query for every fp_ bookmark, which
+makes stripping footnotes quadratic in the size of the report. "range
+index" is remove_footnotes_in_document(), pairing the bookmarks in a
+single pass. Both are checked to leave the same document behind.
+"""
+import time
+import argparse
+import tempfile
+
+from run_benchmarks import prepare_report
+
+import helper
+from remove_footnotes import remove_footnotes_in_document
+
+NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def remove_footnotes_xpath(doc):
+    for bookmark in doc.element.xpath("//w:bookmarkStart"):
+        name = bookmark.get(NAMESPACE + "name")
+        if name.startswith("fp_"):
+            bookmark_id = bookmark.get(NAMESPACE + "id")
+            end_bookmark = doc.element.xpath(
+                f'//w:bookmarkEnd[@w:id="{bookmark_id}"]'
+            )[0]
+
+            elements_to_remove = []
+            current_element = bookmark.getnext()
+            while current_element is not end_bookmark:
+                elements_to_remove.append(current_element)
+                current_element = current_element.getnext()
+
+            for element in elements_to_remove:
+                element.getparent().remove(element)
+
+            parent_element = bookmark.getparent()
+
+            bookmark.getparent().remove(bookmark)
+            end_bookmark.getparent().remove(end_bookmark)
+
+            if len(parent_element) == 0:
+                parent_element.getparent().remove(parent_element)
+            elif parent_element.tag.endswith("p") and not any(
+                child.tag.endswith("r") for child in parent_element
+            ):
+                parent_element.getparent().remove(parent_element)
+
+
+def main(scales: list[int], repeats: int):
+    print(f"{'footnotes':>10} {'xpath (s)':>10} {'range index (s)':>16}")
+    for figures in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            _, docs = prepare_report(tmp, figures, 3, 0.0, 0.0, 3, (60, 40))
+
+            results = {}
+            for name, remove in [
+                ("xpath", remove_footnotes_xpath),
+                ("range index", remove_footnotes_in_document),
+            ]:
+                best = float("inf")
+                for _ in range(repeats):
+                    document = helper.open_document(docs["draft"])
+                    start = time.perf_counter()
+                    remove(document)
+                    best = min(best, time.perf_counter() - start)
+                results[name] = (best, document.element.xml)
+
+            if results["xpath"][1] != results["range index"][1]:
+                raise AssertionError(f"Documents differ at {figures} footnotes")
+            print(
+                f"{figures:>10} {results['xpath'][0]:>10.3f} "
+                f"{results['range index'][0]:>16.3f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark footnote removal")
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[250, 500, 1000, 2000],
+        help="comma separated footnote counts",
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.scales, args.repeats)
@@ -0,0 +1,63 @@
+"""
+Save cost of a document whose media did not change.
+
+A report with many large figures is built once, then reopened, edited
+(one paragraph appended) and saved both with document.save() and with
+helper.save_document(), which copies the unchanged media entries of the
+source package instead of recompressing them.
+"""
+import os
+import time
+import argparse
+import tempfile
+import contextlib
+
+from synthetic_report import make_synthetic_report
+
+import helper
+import add_figure
+
+
+def main(figures: int, image_size: tuple[int, int], repeats: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_synthetic_report(
+            tmp, paragraphs=figures * 5, figures=figures, tables=0, image_size=image_size
+        )
+        with_figures = os.path.join(tmp, "figures.docx")
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            add_figure.add_figure(
+                paths["docx"], with_figures, paths["figure_dir"], paths["config"]
+            )
+        size = os.path.getsize(with_figures) / 1e6
+
+        print(f"{'save':>16} {'figures':>8} {'docx (MB)':>10} {'time (s)':>9}")
+        savers = {
+            "document.save": lambda document, path: document.save(path),
+            "save_document": helper.save_document,
+        }
+        for name, save in savers.items():
+            best = float("inf")
+            for r in range(repeats):
+                document = helper.open_document(with_figures)
+                document.add_paragraph(f"edit {r}")
+                out = os.path.join(tmp, f"out-{name}.docx")
+                start = time.perf_counter()
+                save(document, out)
+                best = min(best, time.perf_counter() - start)
+
+            print(f"{name:>16} {figures:>8} {size:>10.1f} {best:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark saving documents")
+    parser.add_argument("-n", "--figures", type=int, default=100)
+    parser.add_argument(
+        "--image_size",
+        type=lambda x: tuple(int(v) for v in x.split("x")),
+        default=(2400, 1600),
+        help="figure size in pixels, e.g. 2400x1600",
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.figures, args.image_size, args.repeats)
@@ -0,0 +1,106 @@
+"""
+Validating the magic strings of reports with an increasing number of
+paragraphs.
+
+"document" is the approach validate_docx() took in R, loading the whole
+document (officer::docx_summary() in R, python-docx here) and searching
+the text of every paragraph. "stream" is validate_docx.py, streaming
+word/document.xml and clearing each paragraph once read. Each runs in a
+fresh process, and its time and peak RSS above the RSS it started with
+are reported. Both are checked to find the same magic strings.
+"""
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+from run_benchmarks import prepare_report
+from run_memory import MB, RSSSampler, current_rss
+
+
+def find_magic_strings(approach: str, docx_in: str) -> list[str]:
+    if approach == "stream":
+        from validate_docx import validate_docx
+
+        return [m["text"] for m in validate_docx(docx_in)["magic_strings"]]
+
+    from docx import Document
+    from parse_magic_string import lex_magic_strings
+    from validate_docx import W_P, W_T
+
+    document = Document(docx_in)
+    found = []
+    for p in document.element.body.iter(W_P):
+        text = "".join(t.text for t in p.iter(W_T) if t.text)
+        found.extend(token.text for token in lex_magic_strings(text))
+    return found
+
+
+def child(approach: str, docx_in: str) -> dict:
+    import docx  # noqa: F401, imported before measuring like the scripts
+    import validate_docx  # noqa: F401
+
+    before = current_rss()
+    sampler = RSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    found = find_magic_strings(approach, docx_in)
+    seconds = time.perf_counter() - start
+    peak = sampler.stop()
+    return {"seconds": seconds, "peak": peak - before, "found": found}
+
+
+def measure(approach: str, docx_in: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, __file__, "--child", approach, docx_in],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def main(scales: list[int], paragraphs: int):
+    print(
+        f"{'figures':>8} {'paragraphs':>10} {'document (s)':>13} {'peak MB':>8} "
+        f"{'stream (s)':>11} {'peak MB':>8}"
+    )
+    for figures in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            _, docs = prepare_report(tmp, figures, paragraphs, 0.25, 0.0, 3, (60, 40))
+
+            document = measure("document", docs["draft"])
+            stream = measure("stream", docs["draft"])
+            if document["found"] != stream["found"]:
+                raise AssertionError(f"Magic strings differ at {figures} figures")
+            total = int(figures * 1.25) * paragraphs
+            print(
+                f"{figures:>8} {total:>10} {document['seconds']:>13.3f} "
+                f"{document['peak'] / MB:>8.1f} {stream['seconds']:>11.3f} "
+                f"{stream['peak'] / MB:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark validating magic strings")
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[100, 400, 1600],
+        help="comma separated figure counts",
+    )
+    parser.add_argument(
+        "-p", "--paragraphs", type=int, default=20, help="paragraphs per artifact"
+    )
+    parser.add_argument(
+        "--child", nargs=2, metavar=("APPROACH", "DOCX"), help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(child(*args.child)))
+    else:
+        main(args.scales, args.paragraphs)
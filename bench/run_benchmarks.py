@@ -0,0 +1,343 @@
+"""
+Regression benchmarks of every document script at several report sizes.
+
+For each scale a synthetic report is generated from
+inst/extdata/template.docx (see synthetic_report.py) together with the
+documents the later steps start from: the report with figures inserted
+and the fully built draft. Every script is then run through
+worker.run_script() like the R wrappers call it, and the best of
+--repeats runs is compared with bench/baseline.json.
+
+Baseline timings are scaled by how much faster or slower this machine
+opens and saves a fixed document with python-docx than the machine the
+baseline was recorded on. A script regresses when it is more than
+--tolerance slower than its scaled baseline and by at least
+--min_seconds. The run exits with status 1 if any script regressed or
+failed. Record a new baseline with --update after checking out the
+reference commit.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+
+from docx import Document
+
+from synthetic_report import make_synthetic_report
+
+import pipeline
+from worker import run_script
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def calibrate(repeats: int) -> float:
+    """Seconds to open and save a fixed document, a measure of machine speed."""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_synthetic_report(tmp, paragraphs=2000, figures=0, tables=50)
+        out = os.path.join(tmp, "out.docx")
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            Document(paths["docx"]).save(out)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+
+def script_args(paths: dict[str, str], docs: dict[str, str], out: str) -> dict:
+    """Arguments of every benchmarked script, keyed by script."""
+    figure_dir = ["-d", paths["figure_dir"]]
+    config = ["-c", paths["config"]]
+    footnotes = ["-f", paths["footnotes"], "-b", "false", "-m", "true"]
+    return {
+        "keep_caption_next.py": ["-i", docs["report"], "-o", out],
+        "add_figure.py": ["-i", docs["report"], "-o", out, *figure_dir, *config],
+        "add_figure_alt_text.py": ["-i", docs["figures"], "-o", out],
+        "add_figure_footnotes.py": [
+            "-i",
+            docs["figures"],
+            "-o",
+            out,
+            *figure_dir,
+            *config,
+            *footnotes,
+        ],
+        "add_table_footnotes.py": [
+            "-i",
+            docs["report"],
+            "-o",
+            out,
+            "-d",
+            paths["table_dir"],
+            *config,
+            *footnotes,
+        ],
+        "add_table_alt_text.py": ["-i", docs["report"], "-o", out],
+        "check_alt_text_magic.py": ["-i", docs["draft"]],
+        "alt_text.py": [
+            "-i",
+            docs["figures"],
+            "-o",
+            out,
+            "--tag",
+            "figures,tables",
+            "--verify",
+        ],
+        "remove_footnotes.py": ["-i", docs["draft"], "-o", out],
+        "remove_tables.py": ["-i", docs["draft"], "-o", out],
+        "remove_figures.py": ["-i", docs["draft"], "-o", out, *config],
+        "remove_bookmarks.py": ["-i", docs["draft"], "-o", out],
+        "remove_magic_strings.py": ["-i", docs["draft"], "-o", out],
+        "finalize.py": ["-i", docs["draft"], "-o", out],
+        "validate_docx.py": [
+            "-i",
+            docs["draft"],
+            "-d",
+            paths["figure_dir"],
+            "-t",
+            paths["table_dir"],
+        ],
+    }
+
+
+def prepare_report(
+    tmp: str,
+    figures: int,
+    paragraphs_per_artifact: int,
+    table_fraction: float,
+    multi_fraction: float,
+    panels: int,
+    image_size: tuple[int, int],
+) -> tuple[dict[str, str], dict[str, str]]:
+    """
+    Generate a synthetic report under tmp, returning its paths and the
+    documents the scripts start from: the report, the report with
+    figures inserted, and the fully built draft.
+    """
+    tables = max(int(figures * table_fraction), 1)
+    multi = int(figures * multi_fraction) // panels
+    paths = make_synthetic_report(
+        tmp,
+        paragraphs=(figures + tables) * paragraphs_per_artifact,
+        figures=figures - multi * panels,
+        tables=tables,
+        multi_figures=multi,
+        panels=panels,
+        image_size=image_size,
+    )
+    docs = {
+        "report": paths["docx"],
+        "figures": os.path.join(tmp, "figures.docx"),
+        "draft": os.path.join(tmp, "draft.docx"),
+    }
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        pipeline.build_report(
+            docs["report"],
+            docs["figures"],
+            ["figures"],
+            paths["figure_dir"],
+            paths["table_dir"],
+            paths["footnotes"],
+            paths["config"],
+        )
+        pipeline.build_report(
+            docs["figures"],
+            docs["draft"],
+            ["footnotes"],
+            paths["figure_dir"],
+            paths["table_dir"],
+            paths["footnotes"],
+            paths["config"],
+        )
+    return paths, docs
+
+
+def run_scale(
+    figures: int,
+    paragraphs_per_artifact: int,
+    table_fraction: float,
+    multi_fraction: float,
+    panels: int,
+    image_size: tuple[int, int],
+    repeats: int,
+) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        paths, docs = prepare_report(
+            tmp,
+            figures,
+            paragraphs_per_artifact,
+            table_fraction,
+            multi_fraction,
+            panels,
+            image_size,
+        )
+
+        out = os.path.join(tmp, "out.docx")
+        results = {}
+        for script, args in script_args(paths, docs, out).items():
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                result = run_script(script, args)
+                elapsed = time.perf_counter() - start
+                if result["status"] != 0:
+                    print(f"{script} failed:\n{result['stderr']}", file=sys.stderr)
+                    best = None
+                    break
+                best = min(best, elapsed)
+            results[script] = best
+            if os.path.exists(out):
+                os.remove(out)
+        return results
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    tolerance: float,
+    min_seconds: float,
+    speed: float = 1.0,
+) -> list[str]:
+    """
+    Print a table of results against the baseline scaled by speed,
+    returning the regressions.
+    """
+    regressions = []
+    print(f"{'script':<26} {'scale':>6} {'baseline':>9} {'now':>9} {'change':>8}")
+    for scale, timings in results.items():
+        for script, seconds in timings.items():
+            reference = baseline.get(scale, {}).get(script)
+            if reference is not None:
+                reference *= speed
+            if seconds is None:
+                regressions.append(f"{script} at {scale} figures failed")
+                print(f"{script:<26} {scale:>6} {'':>9} {'failed':>9}")
+                continue
+            if reference is None:
+                print(f"{script:<26} {scale:>6} {'-':>9} {seconds:>9.3f}")
+                continue
+
+            change = seconds / reference - 1
+            flag = ""
+            if change > tolerance and seconds - reference >= min_seconds:
+                flag = "  REGRESSION"
+                regressions.append(
+                    f"{script} at {scale} figures: {reference:.3f}s -> {seconds:.3f}s"
+                )
+            print(
+                f"{script:<26} {scale:>6} {reference:>9.3f} {seconds:>9.3f} "
+                f"{change:>+8.0%}{flag}"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time every script on synthetic reports and compare with a baseline"
+    )
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[50, 200, 800],
+        help="comma separated figure counts",
+    )
+    parser.add_argument(
+        "-p",
+        "--paragraphs",
+        type=int,
+        default=5,
+        help="filler paragraphs per figure and table",
+    )
+    parser.add_argument(
+        "--table_fraction",
+        type=float,
+        default=0.25,
+        help="table magic strings per figure",
+    )
+    parser.add_argument(
+        "--multi_fraction",
+        type=float,
+        default=0.3,
+        help="fraction of figures placed in multi figure magic strings",
+    )
+    parser.add_argument("--panels", type=int, default=3)
+    parser.add_argument(
+        "--image_size",
+        type=lambda x: tuple(int(v) for v in x.split("x")),
+        default=(300, 200),
+        help="figure size in pixels, e.g. 300x200",
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=5)
+    parser.add_argument("--baseline", type=str, default=BASELINE)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="allowed slowdown relative to the baseline",
+    )
+    parser.add_argument(
+        "--min_seconds",
+        type=float,
+        default=0.05,
+        help="slowdowns smaller than this are never regressions",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="write the results as the new baseline instead of comparing",
+    )
+    args = parser.parse_args(argv)
+
+    calibration = calibrate(args.repeats)
+    results = {
+        str(figures): run_scale(
+            figures,
+            args.paragraphs,
+            args.table_fraction,
+            args.multi_fraction,
+            args.panels,
+            args.image_size,
+            args.repeats,
+        )
+        for figures in args.scales
+    }
+
+    if args.update:
+        with open(args.baseline, "w") as b:
+            json.dump(
+                {
+                    "machine": f"{platform.machine()} {platform.python_version()}",
+                    "calibration": calibration,
+                    "results": results,
+                },
+                b,
+                indent=2,
+            )
+        compare(results, {}, args.tolerance, args.min_seconds)
+        print(f"Baseline saved at '{args.baseline}'.")
+        return
+
+    baseline = {}
+    speed = 1.0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as b:
+            recorded = json.load(b)
+        baseline = recorded["results"]
+        speed = calibration / recorded["calibration"]
+        print(f"machine speed relative to the baseline: {1 / speed:.2f}x\n")
+
+    regressions = compare(
+        results, baseline, args.tolerance, args.min_seconds, speed
+    )
+    if regressions:
+        print("\nRegressions:\n" + "\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Import time and startup time of every script, compared with a baseline.
+
+Every script run with `uv run` pays for Python startup and its imports
+before it reads the document, once per build step without the worker.
+For each script in worker.SCRIPTS, a fresh interpreter imports it under
+`python -X importtime` and the cumulative import time of the script
+module is taken, along with the wall time of `python script.py --help`
+(startup, imports, and argument parsing). The best of --repeats runs is
+compared with bench/import_baseline.json, scaled by machine speed like
+run_benchmarks.py. A script regresses when it is more than --tolerance
+slower than its scaled baseline and by at least --min_ms. The run exits
+with status 1 if any script regressed or failed. --top lists the slowest
+packages each script imports.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+from synthetic_report import SCRIPTS_DIR
+
+from worker import SCRIPTS
+
+BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "import_baseline.json"
+)
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    Cumulative import time in microseconds of module and every package
+    it imports, from one `python -X importtime` run.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPTS_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr)
+
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        name = name.strip()
+        # a package imported again by a later module is reported once
+        times.setdefault(name, int(cumulative))
+    return times
+
+
+def startup_seconds(script: str) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(SCRIPTS_DIR, script), "--help"],
+        cwd=SCRIPTS_DIR,
+        capture_output=True,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def measure(script: str, repeats: int, top: int) -> dict:
+    module = os.path.splitext(script)[0]
+    # the first run writes the bytecode of anything not yet compiled
+    import_times(module)
+
+    best_import = float("inf")
+    best_startup = float("inf")
+    slowest = []
+    for _ in range(repeats):
+        times = import_times(module)
+        if times[module] < best_import:
+            best_import = times[module]
+            packages = {
+                name: us
+                for name, us in times.items()
+                if "." not in name and name != module
+            }
+            slowest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+        best_startup = min(best_startup, startup_seconds(script))
+
+    return {
+        "import_ms": best_import / 1000,
+        "startup_ms": best_startup * 1000,
+        "slowest": [[name, us / 1000] for name, us in slowest],
+    }
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    tolerance: float,
+    min_ms: float,
+    speed: float = 1.0,
+) -> list[str]:
+    """
+    Print import and startup times against the baseline scaled by speed,
+    returning the regressions.
+    """
+    regressions = []
+    print(
+        f"{'script':<26} {'import ms':>10} {'baseline':>9} "
+        f"{'startup ms':>11} {'baseline':>9}"
+    )
+    for script, result in results.items():
+        reference = baseline.get(script, {})
+        columns = []
+        for key in ["import_ms", "startup_ms"]:
+            now = result[key]
+            before = reference.get(key)
+            if before is None:
+                columns.append(f"{now:>10.1f} {'-':>9}")
+                continue
+            before *= speed
+            columns.append(f"{now:>10.1f} {before:>9.1f}")
+            if now / before - 1 > tolerance and now - before >= min_ms:
+                regressions.append(
+                    f"{script} {key}: {before:.1f} ms -> {now:.1f} ms"
+                )
+        print(f"{script:<26} {' '.join(columns)}")
+        if result["slowest"]:
+            print(
+                " " * 4
+                + ", ".join(f"{name} {ms:.1f}" for name, ms in result["slowest"])
+            )
+    return regressions
+
+
+def calibrate(repeats: int) -> float:
+    """Seconds to start an interpreter that imports nothing, a measure of machine speed."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the imports and startup of every script and compare with a baseline"
+    )
+    parser.add_argument("-r", "--repeats", type=int, default=5)
+    parser.add_argument(
+        "--scripts",
+        type=lambda x: x.split(","),
+        default=SCRIPTS,
+        help="comma separated scripts, all of worker.SCRIPTS by default",
+    )
+    parser.add_argument("--top", type=int, default=3, help="slowest packages to show")
+    parser.add_argument("--baseline", type=str, default=BASELINE)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="allowed slowdown relative to the baseline",
+    )
+    parser.add_argument(
+        "--min_ms",
+        type=float,
+        default=10,
+        help="slowdowns smaller than this are never regressions",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="write the results as the new baseline instead of comparing",
+    )
+    args = parser.parse_args(argv)
+
+    calibration = calibrate(args.repeats)
+    results = {}
+    failures = []
+    for script in args.scripts:
+        try:
+            results[script] = measure(script, args.repeats, args.top)
+        except (RuntimeError, subprocess.CalledProcessError) as e:
+            failures.append(f"{script} failed to start: {e}")
+
+    if args.update:
+        with open(args.baseline, "w") as b:
+            json.dump(
+                {
+                    "machine": f"{platform.machine()} {platform.python_version()}",
+                    "calibration": calibration,
+                    "results": {
+                        script: {k: v for k, v in result.items() if k != "slowest"}
+                        for script, result in results.items()
+                    },
+                },
+                b,
+                indent=2,
+            )
+        compare(results, {}, args.tolerance, args.min_ms)
+        print(f"Baseline saved at '{args.baseline}'.")
+        return
+
+    baseline = {}
+    speed = 1.0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as b:
+            recorded = json.load(b)
+        baseline = recorded["results"]
+        speed = calibration / recorded["calibration"]
+        print(f"machine speed relative to the baseline: {1 / speed:.2f}x\n")
+
+    regressions = failures + compare(
+        results, baseline, args.tolerance, args.min_ms, speed
+    )
+    if regressions:
+        print("\nRegressions:\n" + "\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Peak memory of every document script and pipeline stage on synthetic
+reports of increasing size, checked against a memory budget.
+
+Each script runs in a fresh Python process (see --child) so its peak is
+not hidden by an earlier, larger one. The child samples its RSS while
+the script runs and reports the peak above the RSS it had before the
+script started. With --trace the script is run a second time under
+tracemalloc, and the allocation sites holding the most memory when the
+document is saved (usually the peak, with every image blob loaded) are
+reported. tracemalloc only sees Python allocations, not the XML trees
+lxml keeps in C, so RSS is what the budget is checked against.
+
+The budget of a script is --rss_factor times the size of the document
+it writes (or reads, for check_alt_text_magic) plus --floor_mb. The run
+exits with status 1 if any script is over budget or failed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import synthetic_report  # noqa: F401, puts inst/scripts on sys.path
+
+MB = 1024 * 1024
+SAMPLE_INTERVAL = 0.005
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # ru_maxrss is KB on Linux and bytes on macOS, a peak not the current size
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class RSSSampler(threading.Thread):
+    """Records the peak RSS of this process while running."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = current_rss()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(SAMPLE_INTERVAL):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+        return self.peak
+
+
+def child(script: str, args: list[str], trace: bool, top: int) -> dict:
+    """Run one script and measure it, the body of a --child process."""
+    import helper
+    from worker import run_script
+
+    run_script(script, ["--help"])  # import the script and its dependencies first
+
+    before = current_rss()
+    sampler = RSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    result = run_script(script, args)
+    seconds = time.perf_counter() - start
+    peak = sampler.stop()
+
+    measurement = {
+        "status": result["status"],
+        "stderr": result["stderr"],
+        "seconds": seconds,
+        "rss_before": before,
+        "rss_peak": peak,
+    }
+
+    if trace:
+        import tracemalloc
+
+        snapshots = []
+
+        def snapshot_before(function):
+            def wrapper(document, path):
+                snapshots.append(tracemalloc.take_snapshot())
+                return function(document, path)
+
+            return wrapper
+
+        helper.save_document = snapshot_before(helper.save_document)
+        helper.release_document = snapshot_before(helper.release_document)
+        tracemalloc.start()
+        run_script(script, args)
+        measurement["traced_peak"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        if snapshots:
+            stats = snapshots[-1].statistics("lineno")
+            measurement["sites"] = [
+                [str(stat.traceback[0]), stat.size] for stat in stats[:top]
+            ]
+
+    return measurement
+
+
+def measure(script: str, args: list[str], trace: bool, top: int) -> dict:
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--child",
+        script,
+        json.dumps(args),
+        "--top",
+        str(top),
+    ]
+    if trace:
+        command.append("--trace")
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"status": completed.returncode, "stderr": completed.stderr}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def stage_args(paths: dict[str, str], docs: dict[str, str], out: str) -> dict:
+    """Arguments of each pipeline stage run on its own."""
+    shared = [
+        "-d",
+        paths["figure_dir"],
+        "-t",
+        paths["table_dir"],
+        "-f",
+        paths["footnotes"],
+        "-c",
+        paths["config"],
+    ]
+    return {
+        "pipeline.py strip": ["-i", docs["draft"], "-o", out, "-s", "strip", *shared],
+        "pipeline.py figures": ["-i", docs["report"], "-o", out, "-s", "figures", *shared],
+        "pipeline.py footnotes": [
+            "-i",
+            docs["figures"],
+            "-o",
+            out,
+            "-s",
+            "footnotes",
+            *shared,
+        ],
+    }
+
+
+def run_scale(args, figures: int) -> list[dict]:
+    from run_benchmarks import prepare_report, script_args
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths, docs = prepare_report(
+            tmp,
+            figures,
+            args.paragraphs,
+            args.table_fraction,
+            args.multi_fraction,
+            args.panels,
+            args.image_size,
+        )
+        out = os.path.join(tmp, "out.docx")
+        runs = {**script_args(paths, docs, out), **stage_args(paths, docs, out)}
+
+        rows = []
+        for name, script_argv in runs.items():
+            if os.path.exists(out):
+                os.remove(out)
+            measurement = measure(name.split()[0], script_argv, args.trace, args.top)
+            written = out if os.path.exists(out) else script_argv[1]
+            measurement.update(
+                name=name,
+                figures=figures,
+                document_bytes=os.path.getsize(written),
+            )
+            rows.append(measurement)
+        return rows
+
+
+def report(rows: list[dict], rss_factor: float, floor_mb: float) -> list[str]:
+    """Print peak memory against the budget, returning the scripts over it."""
+    failures = []
+    print(
+        f"{'script':<24} {'figures':>7} {'docx MB':>8} {'peak MB':>8} "
+        f"{'budget MB':>9} {'traced MB':>9}"
+    )
+    for row in rows:
+        if row["status"] != 0:
+            failures.append(f"{row['name']} at {row['figures']} figures failed")
+            print(f"{row['name']:<24} {row['figures']:>7} failed\n{row['stderr']}")
+            continue
+
+        peak = (row["rss_peak"] - row["rss_before"]) / MB
+        document = row["document_bytes"] / MB
+        budget = rss_factor * document + floor_mb
+        traced = f"{row['traced_peak'] / MB:>9.1f}" if "traced_peak" in row else ""
+        flag = ""
+        if peak > budget:
+            flag = "  OVER BUDGET"
+            failures.append(
+                f"{row['name']} at {row['figures']} figures: "
+                f"{peak:.1f} MB peak, budget {budget:.1f} MB"
+            )
+        print(
+            f"{row['name']:<24} {row['figures']:>7} {document:>8.1f} {peak:>8.1f} "
+            f"{budget:>9.1f} {traced:>9}{flag}"
+        )
+
+    largest = max(
+        (row for row in rows if row["status"] == 0),
+        key=lambda row: row["rss_peak"] - row["rss_before"],
+        default=None,
+    )
+    if largest is not None:
+        print(f"\nLargest peak: {largest['name']} at {largest['figures']} figures")
+        for site, size in largest.get("sites", []):
+            print(f"  {size / MB:>8.1f} MB  {site}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure peak memory of every script and check it against a budget"
+    )
+    parser.add_argument(
+        "-s",
+        "--scales",
+        type=lambda x: [int(v) for v in x.split(",")],
+        default=[50, 200, 800],
+        help="comma separated figure counts",
+    )
+    parser.add_argument("-p", "--paragraphs", type=int, default=5)
+    parser.add_argument("--table_fraction", type=float, default=0.25)
+    parser.add_argument("--multi_fraction", type=float, default=0.3)
+    parser.add_argument("--panels", type=int, default=3)
+    parser.add_argument(
+        "--image_size",
+        type=lambda x: tuple(int(v) for v in x.split("x")),
+        default=(1200, 800),
+        help="figure size in pixels, e.g. 1200x800",
+    )
+    parser.add_argument(
+        "--rss_factor",
+        type=float,
+        default=2.0,
+        help="allowed peak RSS as a multiple of the document size",
+    )
+    parser.add_argument(
+        "--floor_mb",
+        type=float,
+        default=64,
+        help="peak RSS allowed on top of rss_factor, for parsed XML and buffers",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="also run each script under tracemalloc and report allocation sites",
+    )
+    parser.add_argument("--top", type=int, default=5, help="allocation sites to show")
+    parser.add_argument("--json", type=str, default=None, help="save measurements to")
+    parser.add_argument("--child", nargs=2, metavar=("SCRIPT", "ARGS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        script, script_argv = args.child
+        print(json.dumps(child(script, json.loads(script_argv), args.trace, args.top)))
+        return
+
+    rows = [row for figures in args.scales for row in run_scale(args, figures)]
+    if args.json is not None:
+        with open(args.json, "w") as j:
+            json.dump(rows, j, indent=2)
+
+    failures = report(rows, args.rss_factor, args.floor_mb)
+    if failures:
+        print("\nOver budget:\n" + "\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Synthetic report generator used by the benchmarks in this directory.
+
+Builds a .docx from inst/extdata/template.docx with a configurable number
+of filler paragraphs, figure and table magic strings, and writes matching
+figure/table artifacts and metadata sidecars next to it.
+"""
+import os
+import sys
+import json
+import argparse
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "inst", "scripts")
+EXTDATA_DIR = os.path.join(os.path.dirname(__file__), "..", "inst", "extdata")
+sys.path.insert(0, os.path.abspath(SCRIPTS_DIR))
+
+from docx import Document
+from PIL import Image, ImageDraw
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetuer adipiscing elit. Maecenas "
+    "porttitor congue massa. Fusce posuere, magna sed pulvinar ultricies."
+)
+
+
+def write_metadata(artifact_path: str, meta_type: str = "NA"):
+    """Write a minimal `<name>_<ext>_metadata.json` sidecar for an artifact."""
+    object_name, extension = os.path.splitext(artifact_path)
+    metadata = {
+        "system_meta": {"platform": "synthetic", "software": {"version": "bench"}},
+        "source_meta": {
+            "creation_author": "bench",
+            "latest_author": "bench",
+            "path": "scripts/synthetic.R",
+            "creation_time": "2025-01-01 00:00:00",
+            "latest_time": "2025-01-01 00:00:00",
+        },
+        "object_meta": {
+            "author": "bench",
+            "path": os.path.basename(artifact_path),
+            "creation_time": "2025-01-01 00:00:00",
+            "file_type": extension[1:],
+            "meta_type": meta_type,
+            "hash": "",
+            "table1": False,
+            "footnotes": {
+                "equations": [],
+                "notes": ["Synthetic artifact_{1} for benchmarking"],
+                "abbreviations": ["AUC", "BID"],
+            },
+        },
+    }
+    with open(f"{object_name}_{extension[1:]}_metadata.json", "w") as m:
+        json.dump(metadata, m)
+
+
+def write_figure(path: str, index: int, image_size: tuple[int, int]):
+    """Write a PNG whose pixels differ per index so parts are not deduplicated."""
+    img = Image.new("RGB", image_size, (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    width, height = image_size
+    for k in range(0, width, max(width // 20, 1)):
+        draw.line([(k, 0), (width - k, height)], fill=(k % 256, index % 256, 128))
+    draw.text((10, 10), f"figure {index}", fill=(0, 0, 0))
+    img.save(path, dpi=(150, 150))
+
+
+def add_table(document, anchor, rows: int = 4, cols: int = 3):
+    """Insert a small table directly after an anchor paragraph."""
+    table = document.add_table(rows=rows, cols=cols)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"{r}.{c}"
+    anchor._element.addnext(table._tbl)
+
+
+def make_synthetic_report(
+    out_dir: str,
+    paragraphs: int = 200,
+    figures: int = 20,
+    tables: int = 10,
+    multi_figures: int = 0,
+    panels: int = 2,
+    image_size: tuple[int, int] = (600, 400),
+    insert_tables: bool = True,
+    seed_docx: str = os.path.join(EXTDATA_DIR, "template.docx"),
+) -> dict[str, str]:
+    """
+    Generate a synthetic report and its artifacts under out_dir.
+
+    figures single-figure and multi_figures multi-figure magic strings (each
+    with `panels` figures) are spread evenly over the filler paragraphs, as
+    are the table magic strings. If insert_tables is True a table is placed
+    after each table magic string, mirroring the document after add_tables().
+    Returns the paths used by the scripts.
+    """
+    figure_dir = os.path.join(out_dir, "figures")
+    table_dir = os.path.join(out_dir, "tables")
+    os.makedirs(figure_dir, exist_ok=True)
+    os.makedirs(table_dir, exist_ok=True)
+
+    document = Document(seed_docx)
+
+    anchors = []
+    for f in range(figures):
+        anchors.append(("figure", [f"figure-{f:05d}.png"]))
+    for m in range(multi_figures):
+        anchors.append(("figure", [f"multi-{m:05d}-{p}.png" for p in range(panels)]))
+    for t in range(tables):
+        anchors.append(("table", [f"table-{t:05d}.csv"]))
+
+    # interleave figure and table anchors
+    anchors.sort(key=lambda a: int(a[1][0].split("-")[1].split(".")[0]))
+    spacing = max(paragraphs // max(len(anchors), 1), 1)
+
+    fig_count = 0
+    anchor_idx = 0
+    for p in range(max(paragraphs, len(anchors) * spacing)):
+        document.add_paragraph(LOREM)
+        if p % spacing != 0 or anchor_idx >= len(anchors):
+            continue
+
+        kind, names = anchors[anchor_idx]
+        anchor_idx += 1
+        caption = "Figure" if kind == "figure" else "Table"
+        document.add_paragraph(f"{caption} {anchor_idx} synthetic", style="Caption")
+        if len(names) > 1:
+            magic = "{rpfy}:[" + ", ".join(names) + "]"
+        else:
+            magic = "{rpfy}:" + names[0]
+        anchor = document.add_paragraph(magic)
+
+        for name in names:
+            if kind == "figure":
+                path = os.path.join(figure_dir, name)
+                write_figure(path, fig_count, image_size)
+                fig_count += 1
+            else:
+                path = os.path.join(table_dir, name)
+                with open(path, "w") as t:
+                    t.write("a,b,c\n1,2,3\n")
+                if insert_tables:
+                    add_table(document, anchor)
+            write_metadata(path)
+
+    docx = os.path.join(out_dir, "synthetic.docx")
+    document.save(docx)
+
+    return {
+        "docx": docx,
+        "figure_dir": figure_dir,
+        "table_dir": table_dir,
+        "footnotes": os.path.join(EXTDATA_DIR, "standard_footnotes.yaml"),
+        "config": os.path.join(EXTDATA_DIR, "config.yaml"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic report")
+    parser.add_argument("-o", "--out_dir", type=str, required=True)
+    parser.add_argument("-p", "--paragraphs", type=int, default=200)
+    parser.add_argument("-f", "--figures", type=int, default=20)
+    parser.add_argument("-t", "--tables", type=int, default=10)
+    parser.add_argument("-m", "--multi_figures", type=int, default=0)
+    parser.add_argument("--panels", type=int, default=2)
+    parser.add_argument("--width", type=int, default=600)
+    parser.add_argument("--height", type=int, default=400)
+    args = parser.parse_args()
+
+    paths = make_synthetic_report(
+        args.out_dir,
+        args.paragraphs,
+        args.figures,
+        args.tables,
+        args.multi_figures,
+        args.panels,
+        (args.width, args.height),
+    )
+    print(json.dumps(paths, indent=2))
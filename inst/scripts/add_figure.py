@@ -1,18 +1,34 @@
+import io
 import os
-import re
 
 import helper
+import timings
 import tempfile
 import argparse
-from typing import Optional
-
-from docx import Document
-from docx.shared import Inches
+import functools
+from itertools import repeat
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Optional
+
+from docx.image.image import Image as DocxImage
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.oxml import OxmlElement
+from docx.oxml.shape import CT_Inline
+from docx.parts.image import ImagePart
+from docx.shared import Inches, Length
+from docx.text.paragraph import Paragraph
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
-from PIL import Image, ImageDraw, ImageFont
+from artifact_index import get_artifact_index
+from image_cache import ImageCache
+from image_downsampling import ImageDownsampler
+from magic_index import MagicIndex
+
+# PIL and the process pool are imported when first used, most builds
+# label no images and prepare them in this process
+if TYPE_CHECKING:
+    from PIL import ImageFont
 
-from parse_magic_string import parse_magic_string
 
 def add_figure(
     docx_in: str,
@@ -22,7 +38,7 @@ def add_figure(
     fig_width: Optional[float] = None,
     fig_height: Optional[float] = None,
 ):
-    document = Document(docx_in)
+    document = helper.open_document(docx_in)
 
     # load config.yaml or set empty dict for defaults.
     if config_yaml is not None:
@@ -30,30 +46,54 @@ def add_figure(
     else:
         config = {}
 
-    # Define magic string pattern
-    # Matches "{rpfy}:" and any directory structure following it
-    start_pattern = r"\{rpfy\}\:"  
-    end_pattern = r"\.[^.]+$"
-    magic_pattern = re.compile(start_pattern + ".*?" + end_pattern)
+    add_figure_in_document(document, figure_dir, config, fig_width, fig_height)
+    helper.save_document(document, docx_out)
+    print(f"Processed file saved at '{docx_out}'.") 
 
+
+def add_figure_in_document(
+    document,
+    figure_dir: str,
+    config: dict,
+    fig_width: Optional[float] = None,
+    fig_height: Optional[float] = None,
+    anchors: Optional[set[int]] = None,
+):
+    """
+    Insert the figures of every magic string, or only of the anchors at
+    the given positions of MagicIndex.anchors.
+    """
+    index = MagicIndex(document)
+    artifacts = get_artifact_index(figure_dir)
     found_magic_strings = []
 
-    # Process paragraphs in reverse order to avoid index shifting issues
-    for i, par in enumerate(reversed(document.paragraphs)):
-        # Calculate the actual index in the original document
-        actual_index = len(document.paragraphs) - 1 - i
-        
-        matches = magic_pattern.findall(par.text)
+    # labeled panels are reused across builds from the image cache
+    label_cache = None
+    if config.get("label_multi_figures", False):
+        label_cache = ImageCache.from_config(config, "labeled_images")
+    downsampler = ImageDownsampler.from_config(config)
+
+    # Plan every placement first: (anchor, image, width, height), where
+    # image is the (path, label index, rendered size) the figure is
+    # prepared from. The size only matters when images are downsampled.
+    # Anchors, their magic strings and the figures of each magic string
+    # are visited in reverse and each figure is spliced directly after its
+    # anchor, so figures end up in the order they are listed.
+    placements = []
+    for position in reversed(range(len(index.anchors))):
+        if anchors is not None and position not in anchors:
+            continue
+        anchor = index.anchors[position]
+        matches = anchor.matches
         if matches:
             if len(matches) > len(set(matches)):
-                print(f"Duplicate figure names found in paragraph {actual_index+1}.")
+                print(f"Duplicate figure names found in paragraph {anchor.ordinal+1}.")
 
-            for match in matches:
-                # Extract the image directory from the match
-                # figure_name now contains potentially a list
+            for token in reversed(anchor.tokens):
+                # the magic string potentially contains a list
                 # of file names and args. like
-                # [file.ext, file2.ext]<width: 4, height: 6>
-                figure_args = parse_magic_string(match)
+                # [file.ext<width: 4, height: 6>, file2.ext]
+                figure_args = token.args()
 
                 if len(figure_args) > 1:
                     figures = list(reversed(figure_args.keys()))
@@ -72,107 +112,274 @@ def add_figure(
 
                     found_magic_strings.append(figure)
                     image_path = os.path.join(figure_dir, figure)
-                    if os.path.exists(image_path):
+                    if artifacts.exists(figure):
                         if add_label:
                             # since list is reversed need to use correct
                             # index, index 0 corresponds to the last
                             # element in list so len(figures) - 1 for 1-index
-                            labeled_image = add_label_to_image(
-                                image_path, len(figures) - fig_idx - 1
-                            )
+                            label_index = len(figures) - fig_idx - 1
                         else:
-                            labeled_image = image_path
-
-                        # Insert new paragraph after the current paragraph
-                        new_par = document.add_paragraph()
-                        run = new_par.add_run()
-                        # can only use embedded_size if the args are there
-                        # args = {
-                        #    'file.ext': {'width': '5', 'height': '8'},
-                        #    'file2.ext': {'height': '8'},
-                        #    'file3.ext': {'width': '5'},
-                        #    'file4.ext': {}
-                        # }
-                        
-                        # Move paragraph to correct position (after current paragraph)
-                        parent = par._element.getparent()
-                        new_par._element.getparent().remove(new_par._element)
-                        target_index = list(parent).index(par._element)
-                        parent.insert(target_index + 1, new_par._element)
-
-                        # Configure image size
-                        if config.get("use_embedded_size", True) and set(
-                            figure_args[figure].keys()
-                        ).intersection(["width", "height"]):
-                            run.add_picture(
-                                labeled_image,
-                                width=(
-                                    Inches(float(figure_args[figure].get("width")))
-                                    if "width" in figure_args[figure]
-                                    else None
-                                ),
-                                height=(
-                                    Inches(float(figure_args[figure].get("height")))
-                                    if "height" in figure_args[figure]
-                                    else None
-                                ),
-                            )
-
-                        elif config.get("use_artifact_size", False):
-                            run.add_picture(labeled_image)
-
-                        else:
-                            default_width = config.get("default_fig_width", 6)
-                            if set(figure_args[figure].keys()).intersection(["width", "height"]):
-                                run.add_picture(
-                                    labeled_image,
-                                    width=(
-                                        Inches(float(figure_args[figure].get("width")))
-                                        if "width" in figure_args[figure]
-                                        else None
-                                    ),
-                                    height=(
-                                        Inches(float(figure_args[figure].get("height")))
-                                        if "height" in figure_args[figure]
-                                        else None
-                                    ),
-                                )
-
-                            elif fig_width is not None and fig_height is not None:
-                                run.add_picture(
-                                    labeled_image,
-                                    width=Inches(fig_width),
-                                    height=Inches(fig_height),
-                                )
-                            elif fig_width is not None:
-                                run.add_picture(labeled_image, width=Inches(fig_width))
-                            elif fig_height is not None:
-                                run.add_picture(
-                                    labeled_image, height=Inches(fig_height)
-                                )
-                            else:
-                                run.add_picture(
-                                    labeled_image, width=Inches(default_width)
-                                )
-
-                        # Set alignment
-                        match config.get("fig_alignment", "center").lower():
-                            case "center":
-                                new_par.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                            case "left":
-                                new_par.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                            case "right":
-                                new_par.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-                            case _:
-                                new_par.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                            label_index = None
+
+                        width, height = get_figure_size(
+                            figure_args[figure], config, fig_width, fig_height
+                        )
+                        size = (width, height) if downsampler is not None else None
+                        image = (image_path, label_index, size)
+                        placements.append((anchor, image, width, height))
+
+    # Label and read every image before touching the document,
+    # in parallel if image_workers allows it
+    with timings.phase("image prep"):
+        prepared = prepare_images(
+            [image for _, image, _, _ in placements],
+            label_cache,
+            downsampler,
+            get_image_workers(config),
+        )
+
+        if downsampler is not None:
+            report_downsampling(prepared.values())
+
+    # Set alignment
+    match config.get("fig_alignment", "center").lower():
+        case "center":
+            alignment = WD_ALIGN_PARAGRAPH.CENTER
+        case "left":
+            alignment = WD_ALIGN_PARAGRAPH.LEFT
+        case "right":
+            alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        case _:
+            alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # part.next_id scans every id in the document, read it once and count up
+    with timings.phase("insert"):
+        shape_id = document.part.next_id
+        images = ImageRegistry(document)
+        for anchor, image, width, height in placements:
+            new_par = new_figure_paragraph(
+                document, images, prepared[image].image, width, height, shape_id
+            )
+            new_par.alignment = alignment
+            anchor.element.addnext(new_par._element)
+            shape_id += 1
+    timings.count("figures", len(placements))
+
+    if label_cache is not None:
+        label_cache.evict()
+    if downsampler is not None:
+        downsampler.cache.evict()
 
     if len(set(found_magic_strings)) != len(found_magic_strings):
         print("Duplicate figure names found in the document.")
-    document.save(docx_out)
-    print(f"Processed file saved at '{docx_out}'.") 
 
 
-def add_label_to_image(image_path: str, index: int) -> str:
+def get_figure_size(
+    args: dict[str, str],
+    config: dict,
+    fig_width: Optional[float] = None,
+    fig_height: Optional[float] = None,
+) -> tuple[Optional[Length], Optional[Length]]:
+    """
+    Return the (width, height) a figure is inserted with, None keeps the
+    dimension proportional (or native if both are None).
+    args are the figure's magic string args, e.g. {'width': '5', 'height': '8'}
+    """
+    # can only use embedded_size if the args are there
+    has_size_args = bool(set(args.keys()).intersection(["width", "height"]))
+    args_size = (
+        Inches(float(args["width"])) if "width" in args else None,
+        Inches(float(args["height"])) if "height" in args else None,
+    )
+
+    if config.get("use_embedded_size", True) and has_size_args:
+        return args_size
+
+    elif config.get("use_artifact_size", False):
+        return None, None
+
+    default_width = config.get("default_fig_width", 6)
+    if has_size_args:
+        return args_size
+    elif fig_width is not None and fig_height is not None:
+        return Inches(fig_width), Inches(fig_height)
+    elif fig_width is not None:
+        return Inches(fig_width), None
+    elif fig_height is not None:
+        return None, Inches(fig_height)
+    else:
+        return Inches(default_width), None
+
+
+class ImageRegistry:
+    """
+    Indexed stand-in for the python-docx image bookkeeping of one document.
+
+    python-docx finds an existing image part by sha1, the next free
+    /word/media/imageN name, and the relationship to an image by scanning
+    every image part or relationship on each add_picture(). This keeps
+    those lookups in dicts and counters so adding many figures stays
+    linear. It assigns the same parts, names, and rIds as python-docx.
+    """
+
+    def __init__(self, document):
+        self.part = document.part
+        self.image_parts = self.part.package.image_parts
+
+        self._by_sha1 = {}
+        for image_part in self.image_parts:
+            self._by_sha1.setdefault(image_part.sha1, image_part)
+        self._used_numbers = {image_part.partname.idx for image_part in self.image_parts}
+        self._next_number = 1
+
+        self._rIds = {}
+        for rId, rel in self.part.rels.items():
+            if rel.reltype == RT.IMAGE and not rel.is_external:
+                self._rIds.setdefault(rel.target_part, rId)
+        self._next_rId = 1
+
+    def get_or_add_image(self, image: DocxImage) -> tuple[str, DocxImage]:
+        """Return (rId, image) like StoryPart.get_or_add_image()."""
+        image_part = self._by_sha1.get(image.sha1)
+        if image_part is None:
+            while self._next_number in self._used_numbers:
+                self._next_number += 1
+            partname = PackURI(f"/word/media/image{self._next_number}.{image.ext}")
+            image_part = ImagePart.from_image(image, partname)
+            self.image_parts.append(image_part)
+            self._by_sha1[image.sha1] = image_part
+            self._used_numbers.add(self._next_number)
+
+        rId = self._rIds.get(image_part)
+        if rId is None:
+            while f"rId{self._next_rId}" in self.part.rels:
+                self._next_rId += 1
+            rId = f"rId{self._next_rId}"
+            self.part.rels.add_relationship(RT.IMAGE, image_part, rId)
+            self._rIds[image_part] = rId
+
+        return rId, image_part.image
+
+
+def new_figure_paragraph(
+    document,
+    images: ImageRegistry,
+    image: DocxImage,
+    width: Optional[Length],
+    height: Optional[Length],
+    shape_id: int,
+) -> Paragraph:
+    """
+    Create a detached paragraph holding a single inline picture.
+
+    This is run.add_picture() with the image lookups and the shape id
+    supplied by the caller, so inserting many figures does not rescan the
+    package or the document for each one.
+    """
+    rId, docx_image = images.get_or_add_image(image)
+    cx, cy = docx_image.scaled_dimensions(width, height)
+    # named after the figure even when an existing image part is reused
+    inline = CT_Inline.new_pic_inline(shape_id, rId, image.filename, cx, cy)
+
+    new_par = Paragraph(OxmlElement("w:p"), document._body)
+    new_par.add_run()._r.add_drawing(inline)
+    return new_par
+
+
+def get_image_workers(config: dict) -> int:
+    """Number of processes preparing images, image_workers: 0 uses every core."""
+    workers = int(config.get("image_workers", 1))
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+class PreparedImage(NamedTuple):
+    image: DocxImage
+    # size of the image before downsampling
+    original_bytes: int
+
+
+def prepare_image(
+    image_path: str,
+    label_index: Optional[int],
+    size: Optional[tuple[Optional[Length], Optional[Length]]],
+    cache: Optional[ImageCache],
+    downsampler: Optional[ImageDownsampler],
+) -> PreparedImage:
+    """
+    Label the image if label_index is given, downsample it to its
+    rendered size if a downsampler is given, then read and probe it.
+    The image keeps the file name of image_path in the document.
+    """
+    filename = os.path.basename(image_path)
+    if label_index is not None:
+        image_path = add_label_to_image(image_path, label_index, cache)
+    original_bytes = os.path.getsize(image_path)
+    if downsampler is not None:
+        image_path = downsampler.downsample(image_path, *size)
+    return PreparedImage(read_image(image_path, filename), original_bytes)
+
+
+def read_image(image_path: str, filename: str) -> DocxImage:
+    """
+    DocxImage.from_file() named filename instead of the name of image_path,
+    which is a temp or cache file once the image is labeled or downsampled.
+    """
+    with open(image_path, "rb") as f:
+        blob = f.read()
+    return DocxImage._from_stream(io.BytesIO(blob), blob, filename)
+
+
+def prepare_images(
+    images: list[tuple[str, Optional[int], Optional[tuple]]],
+    cache: Optional[ImageCache],
+    downsampler: Optional[ImageDownsampler],
+    workers: int,
+) -> dict[tuple, PreparedImage]:
+    """
+    Prepare each distinct (image path, label index, size) once. With more
+    than one worker the images are prepared in a process pool and the
+    parsed images (blob included) are sent back for insertion.
+    """
+    images = list(dict.fromkeys(images))
+    if workers > 1 and len(images) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = min(workers, len(images))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            prepared = executor.map(
+                prepare_image,
+                *zip(*images),
+                repeat(cache),
+                repeat(downsampler),
+                chunksize=max(1, len(images) // (4 * workers)),
+            )
+            return dict(zip(images, prepared))
+
+    return {image: prepare_image(*image, cache, downsampler) for image in images}
+
+
+def report_downsampling(prepared: Iterable[PreparedImage]):
+    resampled = [p for p in prepared if len(p.image.blob) < p.original_bytes]
+    before = sum(p.original_bytes for p in resampled)
+    after = sum(len(p.image.blob) for p in resampled)
+    print(
+        f"Downsampled {len(resampled)} figure images: {before / 1e6:.1f} MB -> "
+        f"{after / 1e6:.1f} MB, saved {(before - after) / 1e6:.1f} MB."
+    )
+
+
+# label geometry, part of the labeled image cache key
+LABEL_FONT_SIZE = 56
+LABEL_POSITION = (20, 20)
+LABEL_PADDING = 5
+LABEL_BOX_FRACTION = 0.025
+
+
+def add_label_to_image(
+    image_path: str, index: int, cache: Optional[ImageCache] = None
+) -> str:
     """
     This function takes in a path to an image and an index
     and adds the corresponding letter to the image upper
@@ -181,47 +388,81 @@ def add_label_to_image(image_path: str, index: int) -> str:
     26 = AA
     27 = AB, etc.
 
-    This function saves the updated image to tmp and returns
-    the path to the temp image.
+    With a cache the labeled image is taken from (or saved to)
+    the cache and its path is returned, otherwise it is saved
+    to tmp and the path to the temp image is returned.
     """
 
     label = helper.create_label(index)
 
+    if cache is not None:
+        import PIL
+
+        params = (
+            "label",
+            label,
+            LABEL_FONT_SIZE,
+            LABEL_POSITION,
+            LABEL_PADDING,
+            LABEL_BOX_FRACTION,
+            PIL.__version__,
+        )
+        return cache.get_or_create(
+            image_path,
+            params,
+            lambda out_path: draw_label(image_path, label, out_path),
+        )
+
+    temp_file = tempfile.NamedTemporaryFile(
+        delete=False, suffix=os.path.splitext(image_path)[1]
+    )
+    temp_path = temp_file.name
+    temp_file.close()
+
+    draw_label(image_path, label, temp_path)
+    return temp_path
+
+
+@functools.cache
+def label_font() -> "ImageFont.FreeTypeFont":
+    """Label font, loaded once per process."""
+    from PIL import ImageFont
+
+    return ImageFont.load_default(size=LABEL_FONT_SIZE)
+
+
+def draw_label(image_path: str, label: str, out_path: str):
+    """Draw label in the upper left corner of image_path and save it to out_path."""
+    from PIL import Image, ImageDraw
+
     # load in image and create draw object
     # and set font
     img = Image.open(image_path)
     draw = ImageDraw.Draw(img)
-    font = ImageFont.load_default(size=56)
+    font = label_font()
 
     img_width, img_height = img.size
     original_format = img.format or os.path.splitext(image_path)[1][1:].upper()
     original_dpi = img.info.get("dpi", (72, 72)) # word default
     # aspect_ratio = img_width / img_height
 
-    left_corner_position = (20, 20)
+    left_corner_position = LABEL_POSITION
 
     draw.rectangle(
         xy=[
-            left_corner_position[0] - 5,
-            left_corner_position[1] - 5,
-            left_corner_position[0] + img_width * 0.025,
-            left_corner_position[1] + img_height * 0.025,
+            left_corner_position[0] - LABEL_PADDING,
+            left_corner_position[1] - LABEL_PADDING,
+            left_corner_position[0] + img_width * LABEL_BOX_FRACTION,
+            left_corner_position[1] + img_height * LABEL_BOX_FRACTION,
         ],
         fill=(255, 255, 255),
     )
 
     draw.text(left_corner_position, label, fill=(0, 0, 0), font=font)
-    temp_file = tempfile.NamedTemporaryFile(
-        delete=False, suffix=os.path.splitext(image_path)[1]
-    )
-    temp_path = temp_file.name
-    temp_file.close()
+    img.save(out_path, format=original_format, dpi=original_dpi)
 
-    img.save(temp_path, format=original_format, dpi=original_dpi)
-    return temp_path
 
-
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Add figures to input docx document")
     parser.add_argument(
         "-i", "--input", type=str, required=True, help="input docx file path"
@@ -235,8 +476,14 @@ if __name__ == "__main__":
     )
     parser.add_argument("-w", "--width", type=str, default=None, help="Figure width")
     parser.add_argument("-g", "--height", type=str, default=None, help="Figure height")
-    args = parser.parse_args()
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
 
-    add_figure(
-        args.input, args.output, args.figure_dir, args.config, args.width, args.height
-    )
+    with timings.record("add_figure.py", args):
+        add_figure(
+            args.input, args.output, args.figure_dir, args.config, args.width, args.height
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,21 @@
-import re
 import argparse
-from docx import Document
+import helper
+import timings
+from alt_text import alt_text_in_document
 
 
 def tag_figures_with_magic(docx_in: str, docx_out: str):
-    # Define magic string pattern
-    start_pattern = r"\{rpfy\}\:"
-    end_pattern = r"\.[^.]+$"
-    magic_pattern = re.compile(start_pattern + ".*?" + end_pattern)
+    doc = helper.open_document(docx_in)
+    tag_figures_with_magic_in_document(doc)
+    helper.save_document(doc, docx_out)
 
-    doc = Document(docx_in)
 
-    body = doc._element.body
-    paragraphs = list(body)
+def tag_figures_with_magic_in_document(doc):
+    """Set the alt text of figures after a magic string to the magic string."""
+    return alt_text_in_document(doc, tag=["figures"])
 
-    # Find magic paragraphs and process the next paragraph for images
-    for idx, para in enumerate(paragraphs):
-        if not para.tag.endswith("}p"):
-            continue
 
-        text_elements = para.xpath(".//w:t")
-        para_text = "".join([t.text for t in text_elements if t.text])
-
-        if magic_pattern.search(para_text) and idx + 1 < len(paragraphs):
-            next_para = paragraphs[idx + 1]
-
-            drawings = next_para.xpath(".//w:drawing")
-            for drawing in drawings:
-                inlines = drawing.xpath(".//wp:inline")
-                for inline in inlines:
-                    doc_pr = inline.xpath(".//wp:docPr")
-                    if doc_pr:
-                        doc_pr[0].set("descr", para_text)
-
-    doc.save(docx_out)
-
-
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Add magic string alt text to figures in docx"
     )
@@ -44,6 +23,12 @@ if __name__ == "__main__":
         "-i", "--input", type=str, required=True, help="input docx file path"
     )
     parser.add_argument("-o", "--output", type=str, required=True, help="output docx")
-    args = parser.parse_args()
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("add_figure_alt_text.py", args):
+        tag_figures_with_magic(args.input, args.output)
 
-    tag_figures_with_magic(args.input, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,11 @@
-import os
-import re
 import sys
 import helper
+import timings
 import argparse
 from typing import Optional
-from docx import Document
-from parse_magic_string import parse_magic_string
+from artifact_index import get_artifact_index
+from magic_index import MagicIndex
+from metadata_catalog import preload_metadata
 
 def add_figure_footnotes(
     docx_in: str,
@@ -25,41 +25,86 @@ def add_figure_footnotes(
     else:
         config = {}
 
-    document = Document(docx_in)
+    document = helper.open_document(docx_in)
+    missing_metadata = add_figure_footnotes_in_document(
+        document, figure_dir, footnotes, config, include_object_path
+    )
+
+    # save the processed document
+    if missing_metadata and fail_on_missing_metadata:
+        print(
+            "output not created due to missing metadata. please check logs for missing metadata files."
+        )
+        sys.exit(1)
+    else:
+        helper.save_document(document, docx_out)
+        print(f"processed file saved at '{docx_out}'.")
 
-    # define magic string pattern
-    # matches "{rpfy}:" and any directory structure following it
-    start_pattern = r"\{rpfy\}\:"
-    end_pattern = r"\.[^.]+$"
-    magic_pattern = re.compile(start_pattern + ".*?" + end_pattern)
 
-    paragraphs = document.paragraphs
+@timings.timed("footnotes")
+def add_figure_footnotes_in_document(
+    document,
+    figure_dir: str,
+    footnotes: dict,
+    config: dict,
+    include_object_path: bool = False,
+    anchors: Optional[set[int]] = None,
+) -> bool:
+    """
+    Insert figure footnotes, returning True if any metadata was missing.
+    anchors limits this to the given positions of MagicIndex.anchors.
+    """
+    index = MagicIndex(document)
+    artifacts = get_artifact_index(figure_dir)
+    paragraphs = index.paragraphs
+    renderer = helper.FootnoteRenderer(
+        config, footnotes, include_object_path, document
+    )
     missing_metadata = False
 
-    for i, par in enumerate(paragraphs):
-        matches = magic_pattern.findall(par.text)
+    preloaded = {}
+    if config.get("use_metadata_catalog", False):
+        preloaded = preload_metadata(
+            artifacts,
+            [
+                figure_name
+                for position, anchor in enumerate(index)
+                if anchors is None or position in anchors
+                for token in anchor.tokens
+                for figure_name in token.file_names
+            ],
+        )
+
+    for position, anchor in enumerate(index):
+        if anchors is not None and position not in anchors:
+            continue
+        i = anchor.ordinal
+        matches = anchor.matches
         if not matches:
             continue
 
         if len(matches) > len(set(matches)):
             print(f"duplicate figure names found in paragraph {i+1}")
 
-        for match in matches:
-            # generalized extraction of the figure name
-            figure_args = parse_magic_string(match)
+        # figures of the magic strings before this one in the paragraph,
+        # they come first after the anchor
+        preceding = 0
+        for token in anchor.tokens:
+            # file names and args of the magic string
+            figure_args = token.args()
 
             # create empty dict for combining all metadata
             combined_footnotes: dict[str, list[str]] = {}
             # enumerating here so i can use f to get label for
             # helper.create_label(f)
             for f, figure_name in enumerate(figure_args.keys()):
-                if figure_name in os.listdir(figure_dir):
-                    metadata = helper.load_metadata(figure_dir, figure_name)
+                if figure_name in artifacts:
+                    metadata = preloaded.get(figure_name) or artifacts.load_metadata(
+                        figure_name
+                    )
 
                     if metadata is not None:
-                        meta_text_dict = helper.create_meta_text_lines(
-                            footnotes, metadata, include_object_path, "figure", config
-                        )
+                        meta_text_dict = renderer.meta_text_lines(metadata, "figure")
                     else:
                         missing_metadata = True
 
@@ -95,42 +140,30 @@ def add_figure_footnotes(
 
                     if f == len(figure_args) - 1:
                         footnote_inserted = False
-                        figure_paragraphs = []
-
-                        # Find the paragraphs containing the figures
-                        for j in range(i + 1, len(paragraphs)):
-                            paragraph = paragraphs[j]
-                            if any(
-                                run.element.xpath(".//pic:pic")
-                                for run in paragraph.runs
-                            ):
-                                figure_paragraphs.append((j, paragraph))
-                                # For single-figure or if we've collected enough figures for multi-figure
-                                if len(figure_paragraphs) >= len(figure_args):
-                                    break
+
+                        # Find the paragraphs containing the figures, one
+                        # per figure for multi-figure magic strings
+                        figure_paragraphs = index.pictures_after(
+                            i, preceding + len(figure_args)
+                        )[preceding:]
 
                         # Insert footnote after the last figure paragraph if we found any
                         if figure_paragraphs and not footnote_inserted:
                             # Get the last figure paragraph found
-                            _, fig_paragraph = figure_paragraphs[-1]
-                            new_paragraph = helper.create_footnote_paragraph(
-                                combined_footnotes, "".join(figure_args.keys()), i, config
+                            fig_paragraph = paragraphs[figure_paragraphs[-1]]
+                            new_paragraph = renderer.footnote_paragraph(
+                                combined_footnotes, "".join(figure_args.keys()), i
                             )
-                            fig_paragraph._element.addnext(new_paragraph)
+                            fig_paragraph.addnext(new_paragraph)
+                            timings.count("footnotes")
                             footnote_inserted = True
 
-    # save the processed document
-    if missing_metadata and fail_on_missing_metadata:
-        print(
-            "output not created due to missing metadata. please check logs for missing metadata files."
-        )
-        sys.exit(1)
-    else:
-        document.save(docx_out)
-        print(f"processed file saved at '{docx_out}'.")
+            preceding += len(figure_args)
 
+    return missing_metadata
 
-if __name__ == "__main__":
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Add figure footnotes to input docx document"
     )
@@ -165,14 +198,20 @@ if __name__ == "__main__":
         type=lambda x: x.lower() in ["true", "t"],
         help="Allow missing metadata files",
     )
-    args = parser.parse_args()
-
-    add_figure_footnotes(
-        args.input,
-        args.output,
-        args.figure_dir,
-        args.footnotes,
-        args.config,
-        args.object,
-        args.fail_metadata,
-    )
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("add_figure_footnotes.py", args):
+        add_figure_footnotes(
+            args.input,
+            args.output,
+            args.figure_dir,
+            args.footnotes,
+            args.config,
+            args.object,
+            args.fail_metadata,
+        )
+
+
+if __name__ == "__main__":
+    main()
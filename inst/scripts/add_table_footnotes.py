@@ -1,11 +1,11 @@
-import os
-import re
 import sys
 import helper
+import timings
 import argparse
 from typing import Optional
-from docx import Document
-from docx.oxml.ns import qn
+from artifact_index import get_artifact_index
+from magic_index import MagicIndex, W_TBL
+from metadata_catalog import preload_metadata
 
 
 def add_table_footnotes(
@@ -26,69 +26,89 @@ def add_table_footnotes(
     else:
         config = {}
 
-    document = Document(docx_in)
+    document = helper.open_document(docx_in)
+    missing_metadata = add_table_footnotes_in_document(
+        document, table_dir, footnotes, config, include_object_path
+    )
+
+    # Save the processed document
+    if missing_metadata and fail_on_missing_metadata:
+        print(
+            "Output not created due to missing metadata. Please check logs for missing metadata files."
+        )
+        sys.exit(1)
+    else:
+        helper.save_document(document, docx_out)
+        print(f"Processed file saved at '{docx_out}'.")
 
-    # Define magic string pattern that allows for flexible paths
-    start_pattern = (
-        r"\{rpfy\}\:"  # Matches "{rpfy}:" and any directory structure following it
+
+@timings.timed("footnotes")
+def add_table_footnotes_in_document(
+    document,
+    table_dir: str,
+    footnotes: dict,
+    config: dict,
+    include_object_path: bool = False,
+) -> bool:
+    """Insert table footnotes, returning True if any metadata was missing."""
+    index = MagicIndex(document)
+    artifacts = get_artifact_index(table_dir)
+    renderer = helper.FootnoteRenderer(
+        config, footnotes, include_object_path, document
     )
-    end_pattern = r"\.[^.]+$"
-    magic_pattern = re.compile(start_pattern + ".*?" + end_pattern)
-    paragraphs = document.paragraphs
     missing_metadata = False
 
-    for i, par in enumerate(paragraphs):
-        matches = magic_pattern.findall(par.text)
+    preloaded = {}
+    if config.get("use_metadata_catalog", False):
+        preloaded = preload_metadata(
+            artifacts,
+            [
+                token.value
+                for anchor in index
+                for token in anchor.tokens
+            ],
+        )
+
+    for anchor in index:
+        i = anchor.ordinal
+        matches = anchor.matches
         if not matches:
             continue
 
         if len(matches) > len(set(matches)):
             print(f"Duplicate table names found in paragraph {i+1}")
 
-        for match in matches:
-            # Generalized extraction of the table name
-            table_name = match.replace("{rpfy}:", "").strip()
+        for token in anchor.tokens:
+            # the table name is the whole magic string
+            table_name = token.value
 
-            if table_name in os.listdir(table_dir):
-                metadata = helper.load_metadata(table_dir, table_name)
+            if table_name in artifacts:
+                metadata = preloaded.get(table_name) or artifacts.load_metadata(
+                    table_name
+                )
 
                 add_footnote = False
                 if metadata is None:
                     missing_metadata = True
                 else:
                     add_footnote = True
-                    meta_text_dict = helper.create_meta_text_lines(
-                        footnotes, metadata, include_object_path, "table", config
-                    )
+                    meta_text_dict = renderer.meta_text_lines(metadata, "table")
 
                 if add_footnote:
-                    # this gets xml index rather than paragraph index
-                    current_p = par._p
-                    body_elements = list(document.element.body)
-                    p_index = body_elements.index(current_p)
-
                     # w:tbl is directly after matching magic string
-                    table = body_elements[p_index + 1]
-                    if table.tag == qn("w:tbl"):
-                        new_paragraph = helper.create_footnote_paragraph(
-                            meta_text_dict, table_name, i, config
-                        )
-                        document.element.body.insert(
-                            document.element.body.index(table) + 1, new_paragraph
+                    table = anchor.next_element
+                    if table is not None and table.tag == W_TBL:
+                        new_paragraph = renderer.footnote_paragraph(
+                            meta_text_dict, table_name, i
                         )
+                        table.addnext(new_paragraph)
+                        timings.count("tables")
+                        timings.count("footnotes")
 
-    # Save the processed document
-    if missing_metadata and fail_on_missing_metadata:
-        print(
-            "Output not created due to missing metadata. Please check logs for missing metadata files."
-        )
-        sys.exit(1)
-    else:
-        document.save(docx_out)
-        print(f"Processed file saved at '{docx_out}'.")
+    return missing_metadata
 
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Add table footnotes to input docx document"
     )
@@ -123,14 +143,20 @@ if __name__ == "__main__":
         type=lambda x: x.lower() in ["true", "t"],
         help="Allow missing metadata files",
     )
-    args = parser.parse_args()
-
-    add_table_footnotes(
-        args.input,
-        args.output,
-        args.table_dir,
-        args.footnotes,
-        args.config,
-        args.object,
-        args.fail_metadata,
-    )
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("add_table_footnotes.py", args):
+        add_table_footnotes(
+            args.input,
+            args.output,
+            args.table_dir,
+            args.footnotes,
+            args.config,
+            args.object,
+            args.fail_metadata,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Tags figures and tables with the magic string before them as alt text, and
+verifies alt text against the magic strings, in one pass.
+"""
+import sys
+import json
+import argparse
+import helper
+import timings
+from typing import Optional
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from magic_index import MagicIndex, W_TBL
+from parse_magic_string import has_magic_string
+
+# add_figure_alt_text.py, add_table_alt_text.py, and check_alt_text_magic.py
+# run one kind of tagging or verification each
+TAG_TYPES = ["figures", "tables"]
+
+WP_INLINE = qn("wp:inline")
+WP_DOC_PR = qn("wp:docPr")
+W_TBL_DESCRIPTION = qn("w:tblDescription")
+W_VAL = qn("w:val")
+
+
+def figure_descriptions(element) -> list:
+    """The first wp:docPr of every inline drawing in element."""
+    doc_prs = []
+    for inline in element.iter(WP_INLINE):
+        doc_pr = next(inline.iter(WP_DOC_PR), None)
+        if doc_pr is not None:
+            doc_prs.append(doc_pr)
+    return doc_prs
+
+
+def table_description(tbl, create: bool = False):
+    """The w:tblDescription of a table, added if missing and create is True."""
+    tbl_pr = tbl.tblPr
+    description = tbl_pr.find(W_TBL_DESCRIPTION)
+    if description is None and create:
+        description = OxmlElement("w:tblDescription")
+        tbl_pr.append(description)
+    return description
+
+
+@timings.timed("alt text")
+def alt_text_in_document(
+    doc, tag: list[str] = TAG_TYPES, verify: bool = False
+) -> dict:
+    """
+    Tag the figures and tables in tag with their magic strings and, if
+    verify is True, report the ones whose alt text differs:
+
+        {"tagged": {"figures": 12, "tables": 3},
+         "checked": {"figures": 12, "tables": 3},
+         "mismatches": [{"type": "table", "paragraph": 40,
+                         "magic_string": "{rpfy}:pk.csv",
+                         "alt_text": null, "status": "missing"}]}
+
+    Figures are the drawings in the element after a magic string paragraph
+    (wp:docPr/@descr) and tables are a w:tbl right after one
+    (w:tblPr/w:tblDescription). paragraph is the position of the magic
+    string paragraph in document.paragraphs. status is "untagged" for a
+    table with no description, "missing" when there is no alt text, and
+    "mismatch" when it differs from the magic string. Verifying reports the
+    alt text found before any tagging.
+    """
+    unknown = set(tag) - set(TAG_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown alt text types: {', '.join(sorted(unknown))}")
+
+    tagged = {"figures": 0, "tables": 0}
+    checked = {"figures": 0, "tables": 0}
+    mismatches = []
+
+    def check(artifact_type, paragraph, magic_string, alt_text, status=None):
+        checked[f"{artifact_type}s"] += 1
+        if alt_text != magic_string:
+            mismatches.append(
+                {
+                    "type": artifact_type,
+                    "paragraph": paragraph,
+                    "magic_string": magic_string,
+                    "alt_text": alt_text,
+                    "status": status
+                    or ("missing" if alt_text is None else "mismatch"),
+                }
+            )
+
+    for anchor in MagicIndex(doc):
+        next_el = anchor.next_element
+        if next_el is None or not has_magic_string(anchor.xml_text):
+            continue
+
+        # figures are tagged with the paragraph text as is, tables with
+        # the stripped text
+        for doc_pr in figure_descriptions(next_el):
+            if verify:
+                check("figure", anchor.ordinal, anchor.xml_text, doc_pr.get("descr"))
+            if "figures" in tag:
+                doc_pr.set("descr", anchor.xml_text)
+                tagged["figures"] += 1
+
+        if next_el.tag == W_TBL:
+            magic_string = anchor.xml_text.strip()
+            description = table_description(next_el, create="tables" in tag)
+            if verify and description is None:
+                check("table", anchor.ordinal, magic_string, None, "untagged")
+            elif verify:
+                check("table", anchor.ordinal, magic_string, description.get(W_VAL))
+            if "tables" in tag:
+                description.set(W_VAL, magic_string)
+                tagged["tables"] += 1
+
+    timings.count("alt text", sum(tagged.values()))
+    return {"tagged": tagged, "checked": checked, "mismatches": mismatches}
+
+
+def describe(result: dict) -> str:
+    """A line describing a mismatch, as check_alt_text_magic.py prints it."""
+    if result["status"] == "untagged":
+        return "Table found but it has no alt text description or title."
+    if result["status"] == "missing":
+        return f"Magic mismatch! Alt text MISSING for magic string: {result['magic_string']}"
+    return (
+        f"Magic mismatch! Magic string: {result['magic_string']} "
+        f"!= alt text: {result['alt_text']}"
+    )
+
+
+def alt_text(
+    docx_in: str,
+    docx_out: Optional[str] = None,
+    tag: list[str] = TAG_TYPES,
+    verify: bool = False,
+) -> dict:
+    doc = helper.open_document(docx_in)
+    results = alt_text_in_document(doc, tag, verify)
+    if tag:
+        helper.save_document(doc, docx_out)
+    else:
+        # nothing was modified so the parsed document can be reused
+        helper.release_document(doc, docx_in)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tag figures and tables in docx with their magic strings as alt text and verify it"
+    )
+    parser.add_argument(
+        "-i", "--input", type=str, required=True, help="input docx file path"
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, default=None, help="output docx file path, required with --tag"
+    )
+    parser.add_argument(
+        "--tag",
+        type=lambda x: [t.strip() for t in x.split(",") if t.strip()],
+        default=[],
+        help=f"comma separated types to tag, any of: {', '.join(TAG_TYPES)}",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="report figures and tables whose alt text differs from their magic string",
+    )
+    parser.add_argument(
+        "--results",
+        type=str,
+        default=None,
+        help="path to write the JSON results to, printed to stdout if not given",
+    )
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.tag and args.output is None:
+        parser.error("--output is required with --tag")
+
+    with timings.record("alt_text.py", args):
+        results = alt_text(args.input, args.output, args.tag, args.verify)
+
+        if args.results is not None:
+            with open(args.results, "w") as r:
+                json.dump(results, r, indent=2)
+        else:
+            json.dump(results, sys.stdout)
+            print()
+
+
+if __name__ == "__main__":
+    main()
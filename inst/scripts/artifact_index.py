@@ -0,0 +1,115 @@
+"""
+Artifact directory listings and metadata sidecars, read once and shared by
+every stage in the process.
+"""
+import os
+import sys
+import json
+from typing import Iterable, Optional
+
+METADATA_SUFFIX = "_metadata.json"
+
+# Parsed sidecars keyed by path, with the (mtime_ns, size) they were read at
+_metadata_cache: dict[str, tuple[tuple[int, int], dict]] = {}
+
+
+def metadata_file_name(artifact_file: str) -> str:
+    """Name of the sidecar for an artifact, e.g. fig.png -> fig_png_metadata.json"""
+    object_name, extension = os.path.splitext(artifact_file)
+    return f"{object_name}_{extension[1::]}{METADATA_SUFFIX}"
+
+
+class ArtifactEntry:
+    def __init__(self, entry: os.DirEntry):
+        self._entry = entry
+        self.name = entry.name
+        self.path = entry.path
+        self.metadata_path: Optional[str] = None
+
+    # stat is only fetched on first use and then cached by the DirEntry
+    @property
+    def size(self) -> int:
+        return self._entry.stat().st_size
+
+    @property
+    def mtime_ns(self) -> int:
+        return self._entry.stat().st_mtime_ns
+
+
+class ArtifactIndex:
+    """Entries of an artifact directory, listed once with os.scandir."""
+
+    def __init__(self, artifact_dir: str):
+        self.artifact_dir = artifact_dir
+        self.signature = os.stat(artifact_dir).st_mtime_ns
+        self.entries: dict[str, ArtifactEntry] = {}
+
+        with os.scandir(artifact_dir) as it:
+            for entry in it:
+                self.entries[entry.name] = ArtifactEntry(entry)
+
+        for name, artifact in self.entries.items():
+            if name.endswith(METADATA_SUFFIX):
+                continue
+            sidecar = self.entries.get(metadata_file_name(name))
+            if sidecar is not None:
+                artifact.metadata_path = sidecar.path
+
+    def __contains__(self, name: str) -> bool:
+        """True if name is an entry of the directory, like name in os.listdir()."""
+        return name in self.entries
+
+    def get(self, name: str) -> Optional[ArtifactEntry]:
+        return self.entries.get(name)
+
+    def exists(self, name: str) -> bool:
+        """
+        Like os.path.exists(os.path.join(artifact_dir, name)), names with a
+        subdirectory are not indexed and are checked on disk.
+        """
+        if name in self.entries:
+            return True
+        if os.sep in name or "/" in name:
+            return os.path.exists(os.path.join(self.artifact_dir, name))
+        return False
+
+    def load_metadata(self, artifact_file: str) -> dict | None:
+        """
+        Load the metadata sidecar of an artifact, see helper.load_metadata.
+        The parsed sidecar is shared between calls and must not be modified.
+        """
+        artifact = self.entries.get(artifact_file)
+        metadata_path = artifact.metadata_path if artifact is not None else None
+        if metadata_path is None:
+            missing = os.path.join(self.artifact_dir, metadata_file_name(artifact_file))
+            print(f"Metadata file not found: {missing}", file=sys.stderr)
+            return None
+
+        stat = os.stat(metadata_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = _metadata_cache.get(metadata_path)
+        if cached is None or cached[0] != signature:
+            with open(metadata_path, "r") as m:
+                cached = (signature, json.load(m))
+            _metadata_cache[metadata_path] = cached
+        return cached[1]
+
+    def preload_metadata(self, names: Iterable[str]):
+        """Parse the metadata sidecars of names into the shared cache."""
+        for name in names:
+            artifact = self.entries.get(name)
+            if artifact is not None and artifact.metadata_path is not None:
+                self.load_metadata(name)
+
+
+_artifact_indexes: dict[str, ArtifactIndex] = {}
+
+
+def get_artifact_index(artifact_dir: str) -> ArtifactIndex:
+    """Return the index of artifact_dir, rescanning it only if it changed."""
+    key = os.path.abspath(artifact_dir)
+    index = _artifact_indexes.get(key)
+    if index is None or index.signature != os.stat(key).st_mtime_ns:
+        index = ArtifactIndex(artifact_dir)
+        _artifact_indexes[key] = index
+    return index
@@ -0,0 +1,231 @@
+"""
+Builds many reports that share one artifact tree, config.yaml and
+standard_footnotes.yaml in a pool of pipeline.py runs.
+"""
+import os
+import sys
+import json
+import time
+import zipfile
+import helper
+import timings
+import argparse
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+
+from artifact_index import get_artifact_index
+from metadata_catalog import preload_metadata
+from parse_magic_string import MAGIC_SENTINEL, lex_magic_strings
+from validate_docx import iter_paragraph_texts
+from worker import run_script
+
+
+def referenced_artifacts(jobs: list[dict]) -> list[str]:
+    """File names in the magic strings of every job's docx_in, streamed."""
+    names = {}
+    for job in jobs:
+        try:
+            for text in iter_paragraph_texts(job["docx_in"]):
+                if MAGIC_SENTINEL not in text:
+                    continue
+                for token in lex_magic_strings(text):
+                    names.update(dict.fromkeys(token.file_names))
+                    # table footnotes look metadata up by the whole magic string
+                    names[token.value] = None
+        except (OSError, KeyError, SyntaxError, zipfile.BadZipFile):
+            # the job reports the unreadable document when it runs
+            continue
+    return list(names)
+
+
+def warm_caches(
+    figure_dir: Optional[str],
+    table_dir: Optional[str],
+    footnotes_yaml: Optional[str],
+    config_yaml: Optional[str],
+    names: list[str],
+    sync_catalog: bool = True,
+):
+    """
+    Load what every report shares into this process's caches, before the
+    pool starts and in the initializer of spawned workers. With the
+    metadata catalog enabled nothing is parsed; its rows for names are
+    synced if sync_catalog is True.
+    """
+    for yaml_file in (footnotes_yaml, config_yaml):
+        if yaml_file is not None:
+            helper.load_yaml(yaml_file)
+    config = helper.load_yaml(config_yaml) if config_yaml is not None else {}
+    use_catalog = config.get("use_metadata_catalog", False)
+
+    for artifact_dir in (figure_dir, table_dir):
+        if artifact_dir is None or not os.path.isdir(artifact_dir):
+            continue
+        artifacts = get_artifact_index(artifact_dir)
+        if not use_catalog:
+            artifacts.preload_metadata(names)
+        elif sync_catalog:
+            preload_metadata(artifacts, names)
+
+
+def run_job(job: dict, shared_args: list[str]) -> dict:
+    """Run one report as pipeline.py would, a failing report does not stop the others."""
+    args = ["-i", job["docx_in"], "-o", job["docx_out"]]
+    if job.get("stages"):
+        args += ["-s", ",".join(job["stages"])]
+
+    start = time.perf_counter()
+    result = run_script("pipeline.py", args + shared_args)
+    return {
+        "docx_in": job["docx_in"],
+        "docx_out": job["docx_out"],
+        "seconds": round(time.perf_counter() - start, 3),
+        **result,
+    }
+
+
+def run_batch(
+    jobs: list[dict],
+    shared_args: list[str],
+    max_workers: int,
+    figure_dir: Optional[str] = None,
+    table_dir: Optional[str] = None,
+    footnotes_yaml: Optional[str] = None,
+    config_yaml: Optional[str] = None,
+) -> dict:
+    """
+    Build every job, a dict with the docx_in and docx_out of a report and
+    optionally its own stages, with at most max_workers processes. Returns
+    the summary:
+
+        {"workers": 4, "seconds": 12.5, "succeeded": 9, "failed": 1,
+         "jobs": [{"docx_in": ..., "docx_out": ..., "seconds": 1.2,
+                   "status": 0, "stdout": ..., "stderr": ...}, ...]}
+    """
+    start = time.perf_counter()
+    caches = (figure_dir, table_dir, footnotes_yaml, config_yaml)
+    names = referenced_artifacts(jobs)
+    warm_caches(*caches, names)
+
+    workers = max(1, min(max_workers, len(jobs)))
+    if workers == 1:
+        results = [run_job(job, shared_args) for job in jobs]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=warm_caches,
+            # the catalog was synced above, workers only parse sidecars
+            initargs=(*caches, names, False),
+        ) as executor:
+            futures = [executor.submit(run_job, job, shared_args) for job in jobs]
+            results = [future.result() for future in futures]
+
+    failed = sum(1 for result in results if result["status"] != 0)
+    return {
+        "workers": workers,
+        "seconds": round(time.perf_counter() - start, 3),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "jobs": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the report build stages for many documents in a process pool"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=str,
+        required=True,
+        help="JSON file with a list of {docx_in, docx_out} jobs",
+    )
+    parser.add_argument(
+        "-s",
+        "--stages",
+        type=str,
+        default=None,
+        help="comma separated stages to run for every job, see pipeline.py",
+    )
+    parser.add_argument(
+        "-d", "--figure_dir", type=str, default=None, help="Path to figures directory"
+    )
+    parser.add_argument(
+        "-t", "--table_dir", type=str, default=None, help="Path to tables directory"
+    )
+    parser.add_argument(
+        "-f",
+        "--footnotes",
+        type=str,
+        default=None,
+        help="path to standard footnotes yaml",
+    )
+    parser.add_argument(
+        "-c", "--config", type=str, default=None, help="Path to config.yaml file"
+    )
+    parser.add_argument("-b", "--object", type=str, default=None, help="include object path")
+    parser.add_argument(
+        "-m", "--fail_metadata", type=str, default=None, help="Fail on missing metadata files"
+    )
+    parser.add_argument("-w", "--width", type=str, default=None, help="Figure width")
+    parser.add_argument("-g", "--height", type=str, default=None, help="Figure height")
+    parser.add_argument(
+        "-n",
+        "--max_workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="maximum number of reports built at the same time",
+    )
+    parser.add_argument(
+        "--summary",
+        type=str,
+        default=None,
+        help="path to write the JSON summary to, printed to stdout if not given",
+    )
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("batch.py", args):
+        with open(args.jobs, "r") as j:
+            jobs = json.load(j)
+
+        # passed through to pipeline.py as given
+        shared_args = []
+        for flag, value in [
+            ("-s", args.stages),
+            ("-d", args.figure_dir),
+            ("-t", args.table_dir),
+            ("-f", args.footnotes),
+            ("-c", args.config),
+            ("-b", args.object),
+            ("-m", args.fail_metadata),
+            ("-w", args.width),
+            ("-g", args.height),
+        ]:
+            if value is not None:
+                shared_args += [flag, value]
+
+        summary = run_batch(
+            jobs,
+            shared_args,
+            args.max_workers,
+            args.figure_dir,
+            args.table_dir,
+            args.footnotes,
+            args.config,
+        )
+
+        if args.summary is not None:
+            with open(args.summary, "w") as s:
+                json.dump(summary, s, indent=2)
+            print(
+                f"Built {summary['succeeded']} of {len(jobs)} reports in "
+                f"{summary['seconds']}s, summary saved at '{args.summary}'."
+            )
+        else:
+            json.dump(summary, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Removes what ties a draft to reportifyr in a single walk of the document
+and a single save.
+"""
+import argparse
+import helper
+import timings
+from typing import Optional
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.styles import BabelFish
+
+from parse_magic_string import MAGIC_SENTINEL, has_magic_string
+
+# remove_bookmarks.py and remove_magic_strings.py run one step each
+STEPS = ["bookmarks", "magic_strings", "captions"]
+CAPTION_STYLE = "Caption"
+SEQ_FIELDS = ("SEQ Table", "SEQ Figure")
+
+W_P = qn("w:p")
+W_T = qn("w:t")
+W_STYLE = qn("w:style")
+W_KEEP_NEXT = qn("w:keepNext")
+W_FLD_SIMPLE = qn("w:fldSimple")
+W_INSTR = qn("w:instr")
+W_INSTR_TEXT = qn("w:instrText")
+W_BOOKMARK_START = qn("w:bookmarkStart")
+W_BOOKMARK_END = qn("w:bookmarkEnd")
+W_ID = qn("w:id")
+W_NAME = qn("w:name")
+PIC_PIC = qn("pic:pic")
+
+
+class ParagraphInfo:
+    """What the finalize steps need to know about a body paragraph."""
+
+    __slots__ = ("element", "xml_text", "style_id", "seq_field", "seq_instr_text")
+
+    def __init__(self, element):
+        self.element = element
+        # w:pStyle id, None for the default paragraph style
+        self.style_id = element.style
+        # joined w:t text, the paragraph may hold a magic string if it
+        # contains the sentinel
+        self.xml_text = ""
+        # a w:fldSimple SEQ Table/Figure field
+        self.seq_field = False
+        # a SEQ Table/Figure field code in w:instrText
+        self.seq_instr_text = False
+
+    @property
+    def has_sentinel(self) -> bool:
+        return MAGIC_SENTINEL in self.xml_text
+
+
+def scan_document(
+    doc, bookmarks: bool = True
+) -> tuple[list[ParagraphInfo], list, list]:
+    """
+    Walk the document once, returning the body paragraphs, the fp_
+    bookmarkStarts, and every bookmarkEnd. With bookmarks False only the
+    body paragraphs are walked and no bookmarks are returned.
+    """
+    paragraphs = []
+    fp_starts = []
+    ends = []
+    body = doc.element.body
+    tags = (W_T, W_FLD_SIMPLE, W_INSTR_TEXT)
+    if bookmarks:
+        tags += (W_BOOKMARK_START, W_BOOKMARK_END)
+
+    def bookmark(element):
+        if element.tag == W_BOOKMARK_END:
+            ends.append(element)
+        elif (element.get(W_NAME) or "").startswith("fp_"):
+            fp_starts.append(element)
+
+    for part_child in doc.element.iterchildren():
+        if part_child is not body:
+            if bookmarks:
+                for element in part_child.iter(W_BOOKMARK_START, W_BOOKMARK_END):
+                    bookmark(element)
+            continue
+
+        for child in body.iterchildren():
+            if child.tag != W_P:
+                if bookmarks:
+                    for element in child.iter(W_BOOKMARK_START, W_BOOKMARK_END):
+                        bookmark(element)
+                continue
+
+            info = ParagraphInfo(child)
+            texts = []
+            for element in child.iter(*tags):
+                tag = element.tag
+                if tag == W_T:
+                    if element.text:
+                        texts.append(element.text)
+                elif tag == W_FLD_SIMPLE:
+                    instr = element.get(W_INSTR)
+                    if instr and any(field in instr for field in SEQ_FIELDS):
+                        info.seq_field = True
+                elif tag == W_INSTR_TEXT:
+                    if any(field in (element.text or "") for field in SEQ_FIELDS):
+                        info.seq_instr_text = True
+                else:
+                    bookmark(element)
+            info.xml_text = "".join(texts)
+            paragraphs.append(info)
+
+    return paragraphs, fp_starts, ends
+
+
+def paragraph_style_resolver(doc):
+    """
+    Return a function giving the name of a paragraph style from its pStyle
+    id the way python-docx Paragraph.style.name does: the style with that
+    id, or the default paragraph style if there is no such paragraph
+    style. The styles are read once instead of once per paragraph.
+    """
+    by_id = {}
+    default = None
+    for style in doc.styles.element.iterchildren(W_STYLE):
+        by_id.setdefault(style.styleId, style)
+        if style.type == WD_STYLE_TYPE.PARAGRAPH and style.default:
+            default = style
+
+    def style_name(style) -> Optional[str]:
+        if style is None or style.name_val is None:
+            return None
+        return BabelFish.internal2ui(style.name_val)
+
+    names = {
+        style_id: style_name(style)
+        for style_id, style in by_id.items()
+        if style.type == WD_STYLE_TYPE.PARAGRAPH
+    }
+    default_name = style_name(default)
+
+    def resolve(style_id: Optional[str]) -> Optional[str]:
+        if style_id is None:
+            return default_name
+        return names.get(style_id, default_name)
+
+    return resolve
+
+
+def add_keep_next(paragraph):
+    pPr = paragraph.get_or_add_pPr()
+    if pPr.find(W_KEEP_NEXT) is None:
+        pPr.append(OxmlElement("w:keepNext"))
+
+
+def caption_anchors(
+    doc, paragraphs: list[ParagraphInfo]
+) -> list[tuple[ParagraphInfo, Optional[ParagraphInfo]]]:
+    """
+    Find every caption (Caption style or SEQ field code) and the first
+    paragraph with a magic string after it, in one pass from the end of
+    the document.
+    """
+    style_name = paragraph_style_resolver(doc)
+    is_caption = {}
+
+    captions = []
+    following = None
+    for info in reversed(paragraphs):
+        style_id = info.style_id
+        if style_id not in is_caption:
+            is_caption[style_id] = style_name(style_id) == CAPTION_STYLE
+        if is_caption[style_id] or info.seq_instr_text:
+            captions.append((info, following))
+        if info.has_sentinel and has_magic_string(info.xml_text):
+            following = info
+    captions.reverse()
+    return captions
+
+
+def keep_captions_next(doc, paragraphs: list[ParagraphInfo]) -> int:
+    """
+    Keep every caption with the next paragraph, and the first paragraph
+    with a magic string after it with its artifact. Returns the number
+    of captions.
+    """
+    captions = caption_anchors(doc, paragraphs)
+    for caption, anchor in captions:
+        add_keep_next(caption.element)
+        if anchor is not None:
+            add_keep_next(anchor.element)
+    return len(captions)
+
+
+def remove_fp_bookmarks(fp_starts: list, ends: list) -> int:
+    """Remove fp_ bookmarkStarts and the bookmarkEnds sharing their ids."""
+    fp_bookmark_ids = set()
+    for element in fp_starts:
+        fp_bookmark_ids.add(element.get(W_ID))
+        element.getparent().remove(element)
+
+    for element in ends:
+        if element.get(W_ID) in fp_bookmark_ids:
+            element.getparent().remove(element)
+    return len(fp_starts)
+
+
+def remove_magic_string_paragraphs(paragraphs: list[ParagraphInfo]) -> int:
+    """
+    Remove paragraphs with a magic string, or clear their text runs if
+    they hold a figure, and keep SEQ field captions with the next
+    paragraph. Returns the number of magic string paragraphs.
+    """
+    removed = 0
+    for info in paragraphs:
+        p = info.element
+        # python-docx Paragraph.text, checked only where the sentinel is
+        if info.has_sentinel and MAGIC_SENTINEL in p.text:
+            removed += 1
+            runs = p.r_lst
+            contains_pic = [next(r.iter(PIC_PIC), None) is not None for r in runs]
+            if any(contains_pic):
+                # Clear only the text runs in the paragraph, preserving the picture
+                for r, pic in zip(runs, contains_pic):
+                    if not pic:
+                        r.text = ""
+            else:
+                # Remove the paragraph if it doesn't contain an image
+                p.getparent().remove(p)
+        elif info.seq_field:
+            add_keep_next(p)
+    return removed
+
+
+@timings.timed("finalize")
+def finalize_in_document(doc, steps: list[str] = STEPS) -> dict[str, int]:
+    """
+    Run the finalize steps on a document in a single walk, returning the
+    number of captions, bookmarks, and magic strings processed:
+    - bookmarks: remove fp_ bookmarks, keeping the footnote text
+    - magic_strings: remove magic string paragraphs, or clear their text if
+      they hold a figure, and keep SEQ field captions with the next paragraph
+    - captions: keep captions (Caption style or SEQ field) with the next
+      paragraph and the first magic string paragraph after them with its
+      artifact
+    """
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise ValueError(f"Unknown finalize steps: {', '.join(sorted(unknown))}")
+
+    paragraphs, fp_starts, ends = scan_document(doc)
+    counts = {}
+
+    # captions first, they are kept with magic string paragraphs
+    if "captions" in steps:
+        counts["captions"] = keep_captions_next(doc, paragraphs)
+    if "bookmarks" in steps:
+        counts["bookmarks"] = remove_fp_bookmarks(fp_starts, ends)
+    if "magic_strings" in steps:
+        counts["magic strings"] = remove_magic_string_paragraphs(paragraphs)
+
+    for name, n in counts.items():
+        timings.count(name, n)
+    return counts
+
+
+def finalize(docx_in: str, docx_out: str, steps: list[str] = STEPS):
+    doc = helper.open_document(docx_in)
+    finalize_in_document(doc, steps)
+    helper.save_document(doc, docx_out)
+    print(f"Processed file saved at '{docx_out}'.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Remove fp_ bookmarks and magic strings and keep captions with their artifacts"
+    )
+    parser.add_argument(
+        "-i", "--input", type=str, required=True, help="input docx file path"
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, required=True, help="output docx file path"
+    )
+    parser.add_argument(
+        "-s",
+        "--steps",
+        type=lambda x: [s.strip() for s in x.split(",")],
+        default=STEPS,
+        help=f"comma separated steps to run, any of: {', '.join(STEPS)}",
+    )
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("finalize.py", args):
+        finalize(args.input, args.output, args.steps)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
 import os
 import re
 import sys
+import copy
 import json
-import yaml
 import string
+from typing import Optional
+from collections import OrderedDict
+from docx import Document
 from docx.oxml.text import run, paragraph
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 
+import timings
+from ooxml_package import save_package, track_source
+
 def create_label(index: int) -> str:
     """
     This function takes in an index and returns
@@ -25,10 +31,96 @@ def create_label(index: int) -> str:
     return label
 
 
+# Parsed YAML files keyed by absolute path, reused while the file is unchanged.
+_yaml_cache: dict[str, tuple[tuple[int, int], dict]] = {}
+
+# Documents saved by this process keyed by absolute path. Only enabled in
+# long running processes (see worker.py), None otherwise.
+_document_cache: Optional[OrderedDict] = None
+_document_cache_size = 0
+
+
+def file_signature(path: str) -> tuple[int, int]:
+    """Return (mtime_ns, size) used to detect changes to a file on disk."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
 def load_yaml(yaml_file: str) -> dict:
     """Load contents from a YAML file."""
-    with open(yaml_file, "r") as y:
-        return yaml.safe_load(y)
+    key = os.path.abspath(yaml_file)
+    signature = file_signature(key)
+    cached = _yaml_cache.get(key)
+    if cached is None or cached[0] != signature:
+        # yaml is only imported by the scripts that read a config or footnotes
+        import yaml
+
+        with open(yaml_file, "r") as y:
+            cached = (signature, yaml.safe_load(y))
+        _yaml_cache[key] = cached
+
+    # callers are free to modify what they get back
+    return copy.deepcopy(cached[1])
+
+
+def enable_document_cache(max_documents: int = 4):
+    """
+    Keep up to max_documents saved documents in memory so that a following
+    open_document() on the same, unchanged path skips parsing the package.
+    """
+    global _document_cache, _document_cache_size
+    _document_cache = OrderedDict()
+    _document_cache_size = max_documents
+
+
+def clear_document_cache():
+    if _document_cache is not None:
+        _document_cache.clear()
+
+
+def _cache_document(document, path: str):
+    key = os.path.abspath(path)
+    _document_cache[key] = (file_signature(key), document)
+    _document_cache.move_to_end(key)
+    while len(_document_cache) > _document_cache_size:
+        _document_cache.popitem(last=False)
+
+
+@timings.timed("load")
+def open_document(path: str):
+    """
+    Open a docx file. If the document cache is enabled and this process last
+    saved the file, the in-memory document is handed over instead of parsing
+    the file again. The caller owns the document until it is saved or released.
+    """
+    if _document_cache is not None:
+        key = os.path.abspath(path)
+        cached = _document_cache.pop(key, None)
+        if cached is not None and cached[0] == file_signature(key):
+            return cached[1]
+
+    document = Document(path)
+    track_source(document, path)
+    timings.add_bytes(read=os.path.getsize(path))
+    return document
+
+
+@timings.timed("save")
+def save_document(document, path: str):
+    """
+    Save a document and, if the cache is enabled, keep it for reuse. Parts
+    unchanged since the document was opened are copied without recompressing.
+    """
+    save_package(document, path)
+    timings.add_bytes(written=os.path.getsize(path))
+    if _document_cache is not None:
+        _cache_document(document, path)
+
+
+def release_document(document, path: str):
+    """Return an unmodified document opened from path to the cache."""
+    if _document_cache is not None:
+        _cache_document(document, path)
 
 
 def load_metadata(artifact_dir: str, artifact_file: str) -> dict | None:
@@ -148,127 +240,238 @@ def format_metadata_line(meta_key, meta_value, config):
             return f"{meta_key}: {meta_value}"
 
 
-def create_formatted_run(
-    text: str, config: dict, subscript: bool = False, superscript: bool = False
-) -> run.CT_R:
-    """Create a single formatted run with specified text."""
-    run_element = OxmlElement("w:r")
+# Splits footnote text into plain, _{subscript} and ^{superscript} parts.
+SCRIPT_PATTERN = re.compile(r"(_\{[^}]*\}|\^\{[^}]*\})")
 
-    # Asserting that text is not both sub and super-script
-    # shouldn't happen, but if it does...
-    assert not (subscript and superscript)
+DEFAULT_FOOTNOTE_ORDER = ["Source", "Object", "Notes", "Abbreviations"]
 
-    # Set formatting properties
-    rPr = OxmlElement("w:rPr")
-    rFonts = OxmlElement("w:rFonts")
-    rFonts.set(qn("w:ascii"), config.get("footnotes_font", "Arial Narrow"))
-    sz = OxmlElement("w:sz")
-    sz.set(qn("w:val"), str(2 * config.get("footnotes_font_size", "10")))
-    rPr.append(rFonts)
-    rPr.append(sz)
+# Character styles registered with footnotes_character_style, (styleId, name)
+# keyed by the vertical alignment of the text they format.
+FOOTNOTE_STYLES = {
+    None: ("reportifyrFootnote", "reportifyr Footnote"),
+    "subscript": ("reportifyrFootnoteSubscript", "reportifyr Footnote Subscript"),
+    "superscript": (
+        "reportifyrFootnoteSuperscript",
+        "reportifyr Footnote Superscript",
+    ),
+}
 
-    # Add subscript or superscript property if needed
-    vertAlign = OxmlElement("w:vertAlign")
-    if subscript:
-        vertAlign.set(qn("w:val"), "subscript")
-        rPr.append(vertAlign)
 
-    elif superscript:
-        vertAlign.set(qn("w:val"), "superscript")
-        rPr.append(vertAlign)
+class FootnoteRenderer:
+    """
+    Builds footnote paragraphs for one config and set of standard footnotes.
 
-    run_element.append(rPr)
+    The run properties of normal, subscript and superscript text are built
+    once and copied into new runs. Metadata text lines are kept by the
+    metadata fields they are made from, and the runs of each formatted line
+    by its text, so artifacts sharing footnote text only copy elements.
 
-    # Set text
-    text_element = OxmlElement("w:t")
+    With footnotes_character_style in the config and a document given, the
+    font and size are registered once as character styles of the document
+    and runs only reference them, instead of carrying them inline.
+    """
 
-    # Preserve spaces if text starts or ends with space
-    if text.startswith(" ") or text.endswith(" "):
-        text_element.set(qn("xml:space"), "preserve")
+    def __init__(
+        self,
+        config: dict,
+        footnotes: Optional[dict] = None,
+        include_object_path: bool = False,
+        document=None,
+    ):
+        self.config = config
+        self.footnotes = footnotes
+        self.include_object_path = include_object_path
+        self.footnote_order = config.get("footnote_order", DEFAULT_FOOTNOTE_ORDER)
+        if config.get("footnotes_character_style", False) and document is not None:
+            self.run_properties = self._register_character_styles(document)
+        else:
+            self.run_properties = {
+                vert_align: self._create_run_properties(vert_align)
+                for vert_align in FOOTNOTE_STYLES
+            }
+        self.line_break = OxmlElement("w:r")
+        self.line_break.append(OxmlElement("w:br"))
+        self._meta_text_lines: dict[str, dict[str, str]] = {}
+        self._line_runs: dict[str, list[run.CT_R]] = {}
+
+    def _create_run_properties(self, vert_align: Optional[str]):
+        rPr = OxmlElement("w:rPr")
+        rFonts = OxmlElement("w:rFonts")
+        rFonts.set(qn("w:ascii"), self.config.get("footnotes_font", "Arial Narrow"))
+        sz = OxmlElement("w:sz")
+        sz.set(qn("w:val"), str(2 * self.config.get("footnotes_font_size", "10")))
+        rPr.append(rFonts)
+        rPr.append(sz)
+
+        if vert_align is not None:
+            vertAlign = OxmlElement("w:vertAlign")
+            vertAlign.set(qn("w:val"), vert_align)
+            rPr.append(vertAlign)
+
+        return rPr
+
+    def _register_character_styles(self, document) -> dict:
+        """Add (or replace) the footnote character styles, returning rPr referencing them."""
+        styles = document.styles.element
+        base_style_id = FOOTNOTE_STYLES[None][0]
+        run_properties = {}
+        for vert_align, (style_id, style_name) in FOOTNOTE_STYLES.items():
+            for existing in styles.xpath(f'w:style[@w:styleId="{style_id}"]'):
+                styles.remove(existing)
+
+            style = OxmlElement(
+                "w:style",
+                {
+                    qn("w:type"): "character",
+                    qn("w:customStyle"): "1",
+                    qn("w:styleId"): style_id,
+                },
+            )
+            style.append(OxmlElement("w:name", {qn("w:val"): style_name}))
+            if vert_align is None:
+                style.append(self._create_run_properties(None))
+            else:
+                # variants only add the vertical alignment to the base style
+                style.append(OxmlElement("w:basedOn", {qn("w:val"): base_style_id}))
+                rPr = OxmlElement("w:rPr")
+                rPr.append(OxmlElement("w:vertAlign", {qn("w:val"): vert_align}))
+                style.append(rPr)
+            styles.append(style)
+
+            rPr = OxmlElement("w:rPr")
+            rPr.append(OxmlElement("w:rStyle", {qn("w:val"): style_id}))
+            run_properties[vert_align] = rPr
+
+        return run_properties
+
+    def meta_text_lines(self, metadata: dict, artifact_type: str) -> dict[str, str]:
+        """create_meta_text_lines() for metadata, reused for identical metadata fields."""
+        source_meta = metadata["source_meta"]
+        object_meta = metadata["object_meta"]
+        key = json.dumps(
+            [
+                artifact_type,
+                source_meta["path"],
+                source_meta["latest_time"],
+                object_meta["path"],
+                object_meta["creation_time"],
+                object_meta["meta_type"],
+                object_meta["footnotes"],
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        lines = self._meta_text_lines.get(key)
+        if lines is None:
+            lines = create_meta_text_lines(
+                self.footnotes,
+                metadata,
+                self.include_object_path,
+                artifact_type,
+                self.config,
+            )
+            self._meta_text_lines[key] = lines
+
+        return dict(lines)
+
+    def formatted_run(self, text: str, vert_align: Optional[str] = None) -> run.CT_R:
+        """Create a single formatted run with specified text."""
+        run_element = OxmlElement("w:r")
+        run_element.append(copy.deepcopy(self.run_properties[vert_align]))
+
+        # Set text
+        text_element = OxmlElement("w:t")
+
+        # Preserve spaces if text starts or ends with space
+        if text.startswith(" ") or text.endswith(" "):
+            text_element.set(qn("xml:space"), "preserve")
+
+        text_element.text = text
+        run_element.append(text_element)
+
+        return run_element
+
+    def formatted_runs(self, text: str) -> list[run.CT_R]:
+        """Create the runs of a line, splitting out _{sub} and ^{super}script text."""
+        runs = self._line_runs.get(text)
+        if runs is None:
+            if "_{" not in text and "^{" not in text:
+                runs = [self.formatted_run(text)]
+            else:
+                runs = []
+                for part in SCRIPT_PATTERN.split(text):
+                    if not part:
+                        continue
+
+                    if part.startswith("_{") and part.endswith("}"):
+                        runs.append(self.formatted_run(part[2:-1], "subscript"))
+                    elif part.startswith("^{") and part.endswith("}"):
+                        runs.append(self.formatted_run(part[2:-1], "superscript"))
+                    else:
+                        runs.append(self.formatted_run(part))
+            self._line_runs[text] = runs
+
+        return [copy.deepcopy(r) for r in runs]
+
+    def footnote_paragraph(
+        self, meta_text_dict: dict[str, list], name: str, paragraph_id: int
+    ) -> paragraph.CT_P:
+        """Create a paragraph element containing formatted footnote text with bookmarks."""
+        new_paragraph = OxmlElement("w:p")
+
+        # Create the bookmark start
+        bookmark_start = OxmlElement("w:bookmarkStart")
+        bookmark_start.set(qn("w:id"), str(paragraph_id))
+        bookmark_start.set(qn("w:name"), f"fp_{name}")
+        new_paragraph.append(bookmark_start)
+
+        # Add metadata lines in the configured order
+        lines = list(
+            dict.fromkeys(key for key in self.footnote_order if key in meta_text_dict)
+        )
 
-    text_element.text = text
-    run_element.append(text_element)
+        for line_idx, meta in enumerate(lines):
+            # Format the line based on metadata type
+            formatted_line = format_metadata_line(
+                meta, "".join(meta_text_dict[meta]), self.config
+            )
 
-    return run_element
+            for r in self.formatted_runs(formatted_line):
+                new_paragraph.append(r)
 
+            # Add line break if needed
+            if line_idx != len(lines) - 1:
+                new_paragraph.append(copy.deepcopy(self.line_break))
 
-def create_formatted_runs(text: str, config: dict) -> list[run.CT_R]:
-    """Create a formatted run with specified text."""
-    if "_{" not in text and "^{" not in text:
-        return [create_formatted_run(text, config)]
-
-    # here text has _{text} or ^{text} so we'll split
-    # with re and then add a bunch of runs
-    # based on the split
-    parts = re.split(r"(_\{[^}]*\}|\^\{[^}]*\})", text)
-    runs = []
-
-    for part in parts:
-        if not part:
-            continue
-
-        if part.startswith("_{") and part.endswith("}"):
-            # Extract subscript text (remove _{} notation)
-            subscript_text = part[2:-1]
-            # Create subscript run
-            sub_run = create_formatted_run(subscript_text, config, subscript=True)
-            runs.append(sub_run)
-
-        elif part.startswith("^{") and part.endswith("}"):
-            # Extract superscript text (remove ^{})
-            superscript_text = part[2:-1]
-            # create superscript run
-            sup_run = create_formatted_run(superscript_text, config, superscript=True)
-            runs.append(sup_run)
+        # Create the bookmark end
+        bookmark_end = OxmlElement("w:bookmarkEnd")
+        bookmark_end.set(qn("w:id"), str(paragraph_id))
+        new_paragraph.append(bookmark_end)
 
-        else:
-            # Regular text run
-            reg_run = create_formatted_run(part, config)
-            runs.append(reg_run)
+        return new_paragraph
 
-    return runs
+
+def create_formatted_run(
+    text: str, config: dict, subscript: bool = False, superscript: bool = False
+) -> run.CT_R:
+    """Create a single formatted run with specified text."""
+    # Asserting that text is not both sub and super-script
+    # shouldn't happen, but if it does...
+    assert not (subscript and superscript)
+
+    vert_align = "subscript" if subscript else "superscript" if superscript else None
+    return FootnoteRenderer(config).formatted_run(text, vert_align)
+
+
+def create_formatted_runs(text: str, config: dict) -> list[run.CT_R]:
+    """Create a formatted run with specified text."""
+    return FootnoteRenderer(config).formatted_runs(text)
 
 
 def create_footnote_paragraph(
     meta_text_dict: dict[str, list], name: str, paragraph_id: int, config: dict
 ) -> paragraph.CT_P:
     """Create a paragraph element containing formatted footnote text with bookmarks."""
-    new_paragraph = OxmlElement("w:p")
-
-    # Create the bookmark start
-    bookmark_start = OxmlElement("w:bookmarkStart")
-    bookmark_start.set(qn("w:id"), str(paragraph_id))
-    bookmark_start.set(qn("w:name"), f"fp_{name}")
-    new_paragraph.append(bookmark_start)
-
-    # Add metadata lines - this assumes ordered dict which should be fine
-    meta_text_dict = {
-        key: meta_text_dict[key]
-        for key in config.get(
-            "footnote_order", ["Source", "Object", "Notes", "Abbreviations"]
-        )
-        if key in meta_text_dict.keys()
-    }
-
-    for line_idx, (meta, value) in enumerate(meta_text_dict.items()):
-        # Format the line based on metadata type
-        formatted_line = format_metadata_line(meta, "".join(value), config)
-        
-        # Create run with formatted text
-        runs = create_formatted_runs(formatted_line, config)
-        for run in runs:
-            new_paragraph.append(run)
-
-        # Add line break if needed
-        if line_idx != len(meta_text_dict) - 1:
-            run_break = OxmlElement("w:r")
-            br = OxmlElement("w:br")
-            run_break.append(br)
-            new_paragraph.append(run_break)
-
-    # Create the bookmark end
-    bookmark_end = OxmlElement("w:bookmarkEnd")
-    bookmark_end.set(qn("w:id"), str(paragraph_id))
-    new_paragraph.append(bookmark_end)
-
-    return new_paragraph
+    return FootnoteRenderer(config).footnote_paragraph(
+        meta_text_dict, name, paragraph_id
+    )
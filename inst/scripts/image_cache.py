@@ -0,0 +1,127 @@
+"""
+Content-addressed cache of derived images, such as the labeled panels of
+multi figures, shared by every build on the machine.
+"""
+import os
+import time
+import hashlib
+import tempfile
+from typing import Callable, Optional
+
+CACHE_VERSION = "1"
+DEFAULT_MAX_MB = 256
+
+# entries used within this window are never evicted, they may belong to
+# a build that has not embedded them yet
+EVICTION_GRACE_SECONDS = 600
+TEMP_SUFFIX = ".tmp"
+
+
+def default_cache_dir() -> str:
+    """REPORTIFYR_CACHE_DIR, otherwise reportifyr/ in the user cache directory."""
+    cache_root = os.environ.get("REPORTIFYR_CACHE_DIR")
+    if cache_root is None:
+        cache_root = os.path.join(
+            os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+            "reportifyr",
+        )
+    return cache_root
+
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class ImageCache:
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict, name: str) -> "ImageCache":
+        """Cache in <image_cache_dir>/<name> sized by image_cache_size_mb."""
+        cache_dir = config.get("image_cache_dir") or default_cache_dir()
+        max_mb = config.get("image_cache_size_mb", DEFAULT_MAX_MB)
+        return cls(os.path.join(cache_dir, name), int(max_mb * 1024 * 1024))
+
+    def key(self, source_path: str, params: tuple) -> str:
+        """Hash of the source image bytes and the params it is derived with."""
+        sha = hashlib.sha256()
+        sha.update(CACHE_VERSION.encode())
+        sha.update(file_digest(source_path).encode())
+        sha.update(repr(params).encode())
+        return sha.hexdigest()
+
+    def get_or_create(
+        self, source_path: str, params: tuple, create: Callable[[str], None]
+    ) -> str:
+        """
+        Return the cached image derived from source_path with params, calling
+        create(path) to write it on a miss.
+        """
+        extension = os.path.splitext(source_path)[1]
+        path = os.path.join(self.cache_dir, self.key(source_path, params) + extension)
+
+        try:
+            # mark as recently used for eviction
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        # written next to the entry and moved in place, so concurrent
+        # builds never see a partial image
+        fd, temp_path = tempfile.mkstemp(
+            dir=self.cache_dir, suffix=extension + TEMP_SUFFIX
+        )
+        os.close(fd)
+        try:
+            create(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return path
+
+    def evict(self, now: Optional[float] = None):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        now = time.time() if now is None else now
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith(TEMP_SUFFIX):
+                    # left behind by a build that was killed
+                    if now - stat.st_mtime > EVICTION_GRACE_SECONDS:
+                        self._remove(entry.path)
+                    continue
+                total += stat.st_size
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if now - mtime <= EVICTION_GRACE_SECONDS:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # evicted by another build
+            pass
@@ -0,0 +1,140 @@
+"""
+Resamples figure images to the size they are shown at before they are
+embedded, so large plots are not stored at full resolution.
+"""
+import os
+import math
+from typing import Optional
+
+from docx.shared import Length
+
+from image_cache import ImageCache
+
+DEFAULT_TARGET_DPI = 300
+DEFAULT_MAX_PIXELS = 40_000_000
+DEFAULT_COMPRESS_LEVEL = 9
+EMU_PER_INCH = 914400
+
+
+class ImageDownsampler:
+    def __init__(self, settings: dict, cache: ImageCache):
+        self.target_dpi = float(settings.get("target_dpi", DEFAULT_TARGET_DPI))
+        self.max_pixels = int(settings.get("max_pixels", DEFAULT_MAX_PIXELS))
+        self.compress_level = int(
+            settings.get("png_compress_level", DEFAULT_COMPRESS_LEVEL)
+        )
+        self.quantize_colors = int(settings.get("png_quantize_colors", 0))
+        self.cache = cache
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["ImageDownsampler"]:
+        """
+        Downsampler for the image_downsampling block of config.yaml, None
+        if it is disabled:
+
+        image_downsampling:
+          enabled: TRUE
+          target_dpi: 300            # pixels per rendered inch to keep
+          max_pixels: 40000000       # cap on width * height of any image
+          png_compress_level: 9      # zlib level 0-9 of the re-saved PNG
+          png_quantize_colors: 0     # reduce to this many colors, 0 keeps all
+        """
+        settings = config.get("image_downsampling") or {}
+        if not settings.get("enabled", False):
+            return None
+        return cls(settings, ImageCache.from_config(config, "downsampled_images"))
+
+    def target_size(
+        self,
+        px_size: tuple[int, int],
+        dpi: tuple[float, float],
+        width: Optional[Length],
+        height: Optional[Length],
+    ) -> tuple[int, int]:
+        """
+        Pixel size for an image of px_size shown at width x height (None
+        keeps the dimension proportional, or native at dpi if both are None).
+        """
+        px_width, px_height = px_size
+        if width is not None or height is not None:
+            # enough pixels for the larger of the two rendered dimensions
+            scales = []
+            if width is not None:
+                scales.append(width / EMU_PER_INCH * self.target_dpi / px_width)
+            if height is not None:
+                scales.append(height / EMU_PER_INCH * self.target_dpi / px_height)
+            scale = max(scales)
+        else:
+            scale = self.target_dpi / max(min(dpi), 1)
+
+        scale = min(scale, math.sqrt(self.max_pixels / (px_width * px_height)), 1.0)
+        return max(1, round(px_width * scale)), max(1, round(px_height * scale))
+
+    def downsample(
+        self,
+        image_path: str,
+        width: Optional[Length],
+        height: Optional[Length],
+    ) -> str:
+        """
+        Return the path of image_path resampled for width x height, or
+        image_path itself if it is not a PNG or would not get smaller.
+        """
+        # PIL is only imported once downsampling is enabled
+        import PIL
+        from PIL import Image
+
+        with Image.open(image_path) as img:
+            if img.format != "PNG":
+                return image_path
+            px_size = img.size
+            dpi = img.info.get("dpi", (72, 72))  # word default
+
+        size = self.target_size(px_size, dpi, width, height)
+        if size == px_size and not self.quantize_colors:
+            return image_path
+
+        params = (
+            "downsample",
+            size,
+            self.compress_level,
+            self.quantize_colors,
+            PIL.__version__,
+        )
+        path = self.cache.get_or_create(
+            image_path, params, lambda out_path: self._resample(image_path, size, out_path)
+        )
+
+        if os.path.getsize(path) >= os.path.getsize(image_path):
+            return image_path
+        return path
+
+    def _resample(self, image_path: str, size: tuple[int, int], out_path: str):
+        from PIL import Image
+
+        with Image.open(image_path) as img:
+            px_width, _ = img.size
+            dpi = img.info.get("dpi", (72, 72))
+            scale = size[0] / px_width
+
+            # palette and other modes do not resample or quantize well
+            if img.mode not in ("RGB", "RGBA", "L"):
+                img = img.convert("RGBA")
+            if size != img.size:
+                img = img.resize(size, Image.Resampling.LANCZOS)
+            if self.quantize_colors:
+                method = (
+                    Image.Quantize.FASTOCTREE
+                    if img.mode == "RGBA"
+                    else Image.Quantize.MEDIANCUT
+                )
+                img = img.quantize(colors=self.quantize_colors, method=method)
+
+            # keep the physical size, same inches at fewer pixels
+            img.save(
+                out_path,
+                format="PNG",
+                dpi=(dpi[0] * scale, dpi[1] * scale),
+                optimize=self.compress_level >= 9,
+                compress_level=self.compress_level,
+            )
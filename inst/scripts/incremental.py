@@ -0,0 +1,414 @@
+"""
+Updates a draft built by build_report() in place, replacing only the
+figures and figure footnotes whose inputs changed since its last build.
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+from typing import Optional
+
+import helper
+import timings
+from lxml import etree
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.part import Part
+from docx.oxml.ns import qn
+
+from artifact_index import metadata_file_name
+from magic_index import MagicIndex, element_kind
+from add_figure import add_figure_in_document
+from add_figure_alt_text import tag_figures_with_magic_in_document
+from add_figure_footnotes import add_figure_footnotes_in_document
+
+MANIFEST_NAMESPACE = "urn:reportifyr:build-manifest"
+MANIFEST_VERSION = 1
+TABLE_EXTENSIONS = [".csv", ".rds"]
+HASH_CHUNK = 1 << 20
+
+
+def sha256_file(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class FileHashes:
+    """sha256 of files, reusing recorded hashes of files with the same size and mtime."""
+
+    def __init__(self, recorded: Optional[dict] = None):
+        self.recorded = recorded or {}
+        self.files: dict[str, list] = {}
+
+    def digest(self, path: str) -> Optional[str]:
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(key)
+        except FileNotFoundError:
+            return None
+
+        recorded = self.recorded.get(key)
+        if recorded is not None and recorded[:2] == [stat.st_size, stat.st_mtime_ns]:
+            digest = recorded[2]
+        else:
+            digest = sha256_file(key)
+        self.files[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+
+def settings_digest(
+    config: dict,
+    footnotes: Optional[dict],
+    include_object_path: bool,
+    fig_width: Optional[float],
+    fig_height: Optional[float],
+) -> str:
+    settings = [config, footnotes, include_object_path, fig_width, fig_height]
+    return hashlib.sha256(
+        json.dumps(settings, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def anchor_inputs(
+    index: MagicIndex, figure_dir: str, table_dir: str, hashes: FileHashes
+) -> list[dict]:
+    """Artifact and metadata hashes of every magic string, in document order."""
+    anchors = []
+    for anchor in index:
+        names = [name for token in anchor.tokens for name in token.file_names]
+        is_table = any(
+            os.path.splitext(name)[1].lower() in TABLE_EXTENSIONS for name in names
+        )
+        artifact_dir = table_dir if is_table else figure_dir
+        anchors.append(
+            {
+                "kind": "table" if is_table else "figure",
+                "names": names,
+                "inputs": [
+                    [
+                        hashes.digest(os.path.join(artifact_dir, name)),
+                        hashes.digest(
+                            os.path.join(artifact_dir, metadata_file_name(name))
+                        ),
+                    ]
+                    for name in names
+                ],
+            }
+        )
+    return anchors
+
+
+def find_manifest_part(document) -> Optional[Part]:
+    for rel in document.part.rels.values():
+        if rel.reltype == RT.CUSTOM_XML and not rel.is_external:
+            if MANIFEST_NAMESPACE.encode() in rel.target_part.blob[:256]:
+                return rel.target_part
+    return None
+
+
+def read_manifest(document) -> Optional[dict]:
+    part = find_manifest_part(document)
+    if part is None:
+        return None
+    try:
+        return json.loads(etree.fromstring(part.blob).text)
+    except (etree.XMLSyntaxError, TypeError, ValueError):
+        return None
+
+
+def write_manifest(document, manifest: dict):
+    root = etree.Element(f"{{{MANIFEST_NAMESPACE}}}manifest", nsmap={None: MANIFEST_NAMESPACE})
+    root.text = json.dumps(manifest, sort_keys=True)
+    blob = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+    part = find_manifest_part(document)
+    if part is not None:
+        part._blob = blob
+    else:
+        package = document.part.package
+        partname = package.next_partname("/customXml/item%d.xml")
+        part = Part(partname, CT.XML, blob, package)
+        document.part.relate_to(part, RT.CUSTOM_XML)
+
+
+def build_manifest(
+    document,
+    docx_in: str,
+    settings: str,
+    figure_dir: str,
+    table_dir: str,
+    recorded_files: Optional[dict] = None,
+) -> dict:
+    """
+    The build manifest kept in a custom XML part of the draft: a hash of
+    the input document, of the config, standard footnotes and build
+    options, and for every magic string the hashes of its artifacts and
+    their metadata files.
+    """
+    hashes = FileHashes(recorded_files)
+    source = hashes.digest(docx_in)
+    anchors = anchor_inputs(MagicIndex(document), figure_dir, table_dir, hashes)
+    return {
+        "version": MANIFEST_VERSION,
+        "source": source,
+        "settings": settings,
+        "anchors": anchors,
+        "files": hashes.files,
+    }
+
+
+def changed_figures(old: Optional[dict], new: dict) -> set[int] | str:
+    """
+    Positions (in MagicIndex.anchors) of the figure magic strings whose
+    inputs changed, or the reason the draft needs a full rebuild.
+    """
+    if old is None or old.get("version") != MANIFEST_VERSION:
+        return "no build manifest in the draft"
+    if old["source"] != new["source"]:
+        return "the input document changed"
+    if old["settings"] != new["settings"]:
+        return "the config, standard footnotes or build options changed"
+    if [a["names"] for a in old["anchors"]] != [a["names"] for a in new["anchors"]]:
+        return "the magic strings of the draft changed"
+
+    changed = set()
+    for position, (before, after) in enumerate(zip(old["anchors"], new["anchors"])):
+        if before["inputs"] == after["inputs"]:
+            continue
+        if after["kind"] == "table":
+            return f"table {', '.join(after['names'])} changed"
+        changed.add(position)
+    return changed
+
+
+def remove_figures_of_anchors(document, positions: set[int]):
+    """Remove the figure paragraphs and footnote of each magic string of each anchor."""
+    index = MagicIndex(document)
+    removed_rIds = set()
+    for position in positions:
+        anchor = index.anchors[position]
+        element = anchor.next_element
+        for token in anchor.tokens:
+            figures = len(token.args())
+            while figures and element_kind(element) == "drawing":
+                removed_rIds.update(element.xpath(".//a:blip/@r:embed"))
+                next_element = element.getnext()
+                index.remove(element)
+                element = next_element
+                figures -= 1
+
+            if element_kind(element) == "footnote":
+                next_element = element.getnext()
+                index.remove(element)
+                element = next_element
+
+    # drop images no other figure uses so they are not kept in the package
+    referenced = set(document.element.xpath("//a:blip/@r:embed"))
+    for rId in removed_rIds - referenced:
+        document.part.drop_rel(rId)
+
+
+def renumber_bookmarks(document, existing: set):
+    """Give bookmarks added since existing was taken ids no other bookmark uses."""
+    bookmarks = document.element.xpath("//w:bookmarkStart")
+    next_id = 1 + max(
+        (int(b.get(qn("w:id"))) for b in bookmarks if b in existing),
+        default=0,
+    )
+    for bookmark in bookmarks:
+        if bookmark in existing:
+            continue
+        old_id = bookmark.get(qn("w:id"))
+        for end in bookmark.getparent().xpath(f'.//w:bookmarkEnd[@w:id="{old_id}"]'):
+            end.set(qn("w:id"), str(next_id))
+        bookmark.set(qn("w:id"), str(next_id))
+        next_id += 1
+
+
+def update_draft(
+    docx_draft: str,
+    docx_in: str,
+    figure_dir: str,
+    table_dir: str,
+    footnotes_yaml: Optional[str],
+    config_yaml: Optional[str],
+    include_object_path: bool = False,
+    fail_on_missing_metadata: bool = True,
+    fig_width: Optional[float] = None,
+    fig_height: Optional[float] = None,
+    record: bool = False,
+) -> dict:
+    """
+    Compare the manifest of the draft with the current inputs, or only
+    record it if record is True. If only figures or figure metadata
+    changed, the figures and footnotes of those magic strings are inserted
+    again and the manifest is updated. If anything else changed (the input
+    document, settings, a table, or there is no manifest) the draft is left
+    alone, tables are only rendered by add_tables() in R. Returns:
+
+        {"updated": true, "full_rebuild": false, "reason": null,
+         "changed": 2, "magic_strings": 40}
+
+    updated is true when the draft was brought up to date and full_rebuild
+    is true when it was left alone, with the reason in reason. Both are
+    false when only the manifest was recorded.
+    """
+    # load config.yaml or set empty dict for defaults.
+    if config_yaml is not None:
+        config = helper.load_yaml(config_yaml)
+    else:
+        config = {}
+    footnotes = helper.load_yaml(footnotes_yaml) if footnotes_yaml is not None else None
+    settings = settings_digest(
+        config, footnotes, include_object_path, fig_width, fig_height
+    )
+
+    document = helper.open_document(docx_draft)
+    old = read_manifest(document)
+    new = build_manifest(
+        document,
+        docx_in,
+        settings,
+        figure_dir,
+        table_dir,
+        old.get("files") if old is not None else None,
+    )
+
+    results = {
+        "updated": False,
+        "full_rebuild": False,
+        "reason": None,
+        "changed": 0,
+        "magic_strings": len(new["anchors"]),
+    }
+
+    if record:
+        write_manifest(document, new)
+        helper.save_document(document, docx_draft)
+        print(f"Build manifest recorded in '{docx_draft}'.")
+        return results
+
+    changed = changed_figures(old, new)
+    if isinstance(changed, str):
+        helper.release_document(document, docx_draft)
+        print(f"Full rebuild required: {changed}.")
+        return {**results, "full_rebuild": True, "reason": changed}
+
+    missing_metadata = False
+    if changed:
+        remove_figures_of_anchors(document, changed)
+        existing = set(document.element.xpath("//w:bookmarkStart"))
+        add_figure_in_document(
+            document, figure_dir, config, fig_width, fig_height, anchors=changed
+        )
+        tag_figures_with_magic_in_document(document)
+        if footnotes is not None:
+            missing_metadata = add_figure_footnotes_in_document(
+                document,
+                figure_dir,
+                footnotes,
+                config,
+                include_object_path,
+                anchors=changed,
+            )
+        renumber_bookmarks(document, existing)
+
+    if missing_metadata and fail_on_missing_metadata:
+        print(
+            "Output not created due to missing metadata. Please check logs for missing metadata files."
+        )
+        sys.exit(1)
+
+    if changed or new["files"] != old.get("files"):
+        write_manifest(document, new)
+        helper.save_document(document, docx_draft)
+    else:
+        helper.release_document(document, docx_draft)
+
+    print(
+        f"Incremental build updated {len(changed)} of {len(new['anchors'])} magic strings in '{docx_draft}'."
+    )
+    return {**results, "updated": True, "changed": len(changed)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Update the changed figures of a report draft in place"
+    )
+    parser.add_argument(
+        "-i", "--input", type=str, required=True, help="input docx the draft was built from"
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, required=True, help="draft docx file path"
+    )
+    parser.add_argument(
+        "-d", "--figure_dir", type=str, required=True, help="Path to figures directory"
+    )
+    parser.add_argument(
+        "-t", "--table_dir", type=str, required=True, help="Path to tables directory"
+    )
+    parser.add_argument(
+        "-f",
+        "--footnotes",
+        type=str,
+        default=None,
+        help="path to standard footnotes yaml, no footnotes are added if not given",
+    )
+    parser.add_argument(
+        "-c", "--config", type=str, default=None, help="Path to config.yaml file"
+    )
+    parser.add_argument(
+        "-b",
+        "--object",
+        type=lambda x: x.lower() in ["true", "t"],
+        default=False,
+        help="include object path",
+    )
+    parser.add_argument(
+        "-m",
+        "--fail_metadata",
+        type=lambda x: x.lower() in ["true", "t"],
+        default=True,
+        help="Fail on missing metadata files",
+    )
+    parser.add_argument("-w", "--width", type=float, default=None, help="Figure width")
+    parser.add_argument("-g", "--height", type=float, default=None, help="Figure height")
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="only record the build manifest of a fully built draft",
+    )
+    parser.add_argument(
+        "--results",
+        type=str,
+        default=None,
+        help="path to write the JSON results to",
+    )
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("incremental.py", args):
+        results = update_draft(
+            args.output,
+            args.input,
+            args.figure_dir,
+            args.table_dir,
+            args.footnotes,
+            args.config,
+            args.object,
+            args.fail_metadata,
+            args.width,
+            args.height,
+            args.record,
+        )
+
+        if args.results is not None:
+            with open(args.results, "w") as r:
+                json.dump(results, r, indent=2)
+
+
+if __name__ == "__main__":
+    main()
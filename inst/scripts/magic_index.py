@@ -0,0 +1,151 @@
+"""
+Index of the body paragraphs holding magic strings, built in one pass
+over w:body.
+"""
+import bisect
+from typing import Iterator, Optional
+
+from docx.oxml.ns import qn
+
+import timings
+from parse_magic_string import MAGIC_SENTINEL, MagicToken, lex_magic_strings
+
+W_P = qn("w:p")
+W_R = qn("w:r")
+W_T = qn("w:t")
+W_TBL = qn("w:tbl")
+W_DRAWING = qn("w:drawing")
+W_BOOKMARK_START = qn("w:bookmarkStart")
+W_NAME = qn("w:name")
+PIC_PIC = qn("pic:pic")
+
+
+def element_kind(element) -> Optional[str]:
+    """
+    Classify a body element as "tbl", "drawing" (a paragraph holding a
+    picture), "footnote" (a paragraph in an fp_ bookmark), or "p".
+    """
+    if element is None:
+        return None
+    if element.tag == W_TBL:
+        return "tbl"
+    if element.tag != W_P:
+        return element.tag
+    if next(element.iter(W_DRAWING), None) is not None:
+        return "drawing"
+    for bookmark in element.iter(W_BOOKMARK_START):
+        if (bookmark.get(W_NAME) or "").startswith("fp_"):
+            return "footnote"
+    return "p"
+
+
+class Anchor:
+    """A body paragraph containing a magic string."""
+
+    def __init__(self, index: "MagicIndex", element, ordinal: int):
+        self._index = index
+        self.element = element
+        # position in document.paragraphs when the index was built
+        self.ordinal = ordinal
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the paragraph text after it has been modified."""
+        # python-docx Paragraph.text, tabs and breaks mapped to \t and \n
+        self.text = self.element.text
+        # joined w:t text, including runs nested in fields or revisions
+        self.xml_text = "".join(t.text for t in self.element.iter(W_T) if t.text)
+        # magic strings in runs python-docx skips are found in the w:t text
+        self.tokens: tuple[MagicToken, ...] = lex_magic_strings(
+            self.text
+        ) or lex_magic_strings(self.xml_text)
+        self.matches = [token.text for token in self.tokens]
+        self._args = None
+
+    @property
+    def args(self) -> dict[str, dict[str, str]]:
+        """Parsed arguments of the magic strings in the paragraph text."""
+        if self._args is None:
+            self._args = {}
+            for token in self.tokens:
+                self._args.update(token.args())
+        return self._args
+
+    @property
+    def next_element(self):
+        return self.element.getnext()
+
+    @property
+    def next_kind(self) -> Optional[str]:
+        return element_kind(self.element.getnext())
+
+
+class MagicIndex:
+    """
+    Anchors are direct w:p children of w:body, the same paragraphs
+    python-docx returns from document.paragraphs. Ordinals, paragraphs and
+    picture_ordinals are a snapshot taken when the index is built and are
+    not updated when paragraphs are inserted or removed. Remove magic
+    string paragraphs with remove() so anchors_after() skips them.
+    """
+
+    @timings.timed("scan")
+    def __init__(self, document):
+        self.body = document.element.body
+        # snapshot of document.paragraphs elements at build time
+        self.paragraphs = []
+        self.anchors: list[Anchor] = []
+
+        for element in self.body.iterchildren(W_P):
+            ordinal = len(self.paragraphs)
+            self.paragraphs.append(element)
+            if MAGIC_SENTINEL in "".join(t.text for t in element.iter(W_T) if t.text):
+                self.anchors.append(Anchor(self, element, ordinal))
+
+        timings.observe("anchors", len(self.anchors))
+        self._ordinals = [a.ordinal for a in self.anchors]
+        self._by_element = {a.element: a for a in self.anchors}
+        self._picture_ordinals: Optional[list[int]] = None
+
+    def __iter__(self):
+        return iter(self.anchors)
+
+    def __len__(self):
+        return len(self.anchors)
+
+    def anchors_after(self, ordinal: int) -> Iterator[Anchor]:
+        """Anchors after the paragraph at ordinal, in document order."""
+        for i in range(bisect.bisect_right(self._ordinals, ordinal), len(self.anchors)):
+            yield self.anchors[i]
+
+    @property
+    def picture_ordinals(self) -> list[int]:
+        """
+        Ordinals of the paragraphs with a picture in one of their runs,
+        found in a single pass over the paragraphs on first use.
+        """
+        if self._picture_ordinals is None:
+            self._picture_ordinals = [
+                ordinal
+                for ordinal, element in enumerate(self.paragraphs)
+                if any(
+                    next(r.iter(PIC_PIC), None) is not None
+                    for r in element.iterchildren(W_R)
+                )
+            ]
+        return self._picture_ordinals
+
+    def pictures_after(self, ordinal: int, n: int) -> list[int]:
+        """Ordinals of the next n picture paragraphs after the paragraph at ordinal."""
+        start = bisect.bisect_right(self.picture_ordinals, ordinal)
+        return self.picture_ordinals[start : start + n]
+
+    def remove(self, element):
+        """Remove element from the body, dropping its anchor if it had one."""
+        element.getparent().remove(element)
+        anchor = self._by_element.pop(element, None)
+        if anchor is not None:
+            # ordinals are unique and sorted, so the anchor is found by bisection
+            i = bisect.bisect_left(self._ordinals, anchor.ordinal)
+            del self._ordinals[i]
+            del self.anchors[i]
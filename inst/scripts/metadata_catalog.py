@@ -0,0 +1,212 @@
+"""
+SQLite catalog of the artifact metadata sidecars, so footnote stages load
+their records with a few bulk SELECTs. Enabled with
+`use_metadata_catalog: TRUE` in config.yaml.
+"""
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from typing import Optional
+
+from artifact_index import ArtifactIndex, get_artifact_index
+
+CATALOG_FILE = ".reportifyr_metadata.sqlite"
+METADATA_BLOCKS = ["system_meta", "source_meta", "object_meta"]
+
+# SQLite's default limit on host parameters in one statement
+MAX_VARIABLES = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    directory TEXT NOT NULL,
+    artifact TEXT NOT NULL,
+    sidecar_mtime_ns INTEGER NOT NULL,
+    sidecar_size INTEGER NOT NULL,
+    system_meta TEXT,
+    source_meta TEXT,
+    object_meta TEXT,
+    PRIMARY KEY (directory, artifact)
+)
+"""
+
+
+def catalog_path(artifact_dir: str) -> str:
+    """Catalog file for an artifact directory, kept in its parent directory."""
+    return os.path.join(os.path.dirname(os.path.abspath(artifact_dir)), CATALOG_FILE)
+
+
+class MetadataCatalog:
+    """
+    Copy of the sidecars, which stay the source of truth: a row is
+    re-imported when its sidecar's mtime or size changes and dropped when
+    the sidecar is gone.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.root = os.path.dirname(path)
+        # rollback journal, WAL does not work on network file systems
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def _directory_key(self, artifact_dir: str) -> str:
+        return os.path.relpath(os.path.abspath(artifact_dir), self.root)
+
+    def sync(
+        self, artifacts: ArtifactIndex, names: Optional[list[str]] = None
+    ) -> tuple[int, int]:
+        """
+        Bring the rows of one artifact directory in line with its sidecars,
+        only the rows of names if given. Returns the number of (imported,
+        removed) records.
+        """
+        directory = self._directory_key(artifacts.artifact_dir)
+        if names is None:
+            cataloged = {
+                artifact: (mtime_ns, size)
+                for artifact, mtime_ns, size in self.connection.execute(
+                    "SELECT artifact, sidecar_mtime_ns, sidecar_size FROM metadata WHERE directory = ?",
+                    (directory,),
+                )
+            }
+            entries = artifacts.entries
+        else:
+            names = list(dict.fromkeys(names))
+            cataloged = {}
+            for start in range(0, len(names), MAX_VARIABLES):
+                chunk = names[start : start + MAX_VARIABLES]
+                placeholders = ", ".join("?" * len(chunk))
+                for artifact, mtime_ns, size in self.connection.execute(
+                    "SELECT artifact, sidecar_mtime_ns, sidecar_size FROM metadata "
+                    f"WHERE directory = ? AND artifact IN ({placeholders})",
+                    (directory, *chunk),
+                ):
+                    cataloged[artifact] = (mtime_ns, size)
+            entries = {
+                name: artifacts.entries[name]
+                for name in names
+                if name in artifacts.entries
+            }
+
+        rows = []
+        current = set()
+        for name, artifact in entries.items():
+            if artifact.metadata_path is None:
+                continue
+            current.add(name)
+            try:
+                # stat again, sidecars can be rewritten in place without
+                # the directory (and so the artifact index) changing
+                stat = os.stat(artifact.metadata_path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if cataloged.get(name) == signature:
+                    continue
+
+                with open(artifact.metadata_path, "r") as m:
+                    metadata = json.load(m)
+            except (OSError, json.JSONDecodeError) as e:
+                print(
+                    f"Could not import metadata file {artifact.metadata_path}: {e}",
+                    file=sys.stderr,
+                )
+                continue
+
+            rows.append(
+                (directory, name, *signature)
+                + tuple(json.dumps(metadata.get(block)) for block in METADATA_BLOCKS)
+            )
+
+        removed = [(directory, name) for name in cataloged if name not in current]
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.connection.executemany(
+                "DELETE FROM metadata WHERE directory = ? AND artifact = ?", removed
+            )
+
+        return len(rows), len(removed)
+
+    def load_many(self, artifact_dir: str, names: list[str]) -> dict[str, dict]:
+        """Return the metadata records of names found in the catalog."""
+        directory = self._directory_key(artifact_dir)
+        names = list(dict.fromkeys(names))
+        records = {}
+        for start in range(0, len(names), MAX_VARIABLES):
+            chunk = names[start : start + MAX_VARIABLES]
+            placeholders = ", ".join("?" * len(chunk))
+            for artifact, *blocks in self.connection.execute(
+                "SELECT artifact, system_meta, source_meta, object_meta FROM metadata "
+                f"WHERE directory = ? AND artifact IN ({placeholders})",
+                (directory, *chunk),
+            ):
+                records[artifact] = {
+                    block: json.loads(value)
+                    for block, value in zip(METADATA_BLOCKS, blocks)
+                }
+        return records
+
+
+def preload_metadata(artifacts: ArtifactIndex, names: list[str]) -> dict[str, dict]:
+    """
+    Load the metadata of names from the catalog of the artifact directory,
+    syncing their rows first. Names missing from the result should be
+    read from their sidecar; nothing is returned if the catalog cannot be
+    used.
+    """
+    names = [n for n in names if n in artifacts]
+    if not names:
+        return {}
+
+    try:
+        catalog = MetadataCatalog(catalog_path(artifacts.artifact_dir))
+        try:
+            catalog.sync(artifacts, names)
+            records = catalog.load_many(artifacts.artifact_dir, names)
+        finally:
+            catalog.close()
+    except sqlite3.Error as e:
+        print(
+            f"Metadata catalog unavailable, reading metadata files instead: {e}",
+            file=sys.stderr,
+        )
+        return {}
+
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Import artifact metadata files into the SQLite metadata catalog"
+    )
+    parser.add_argument(
+        "-d",
+        "--artifact_dir",
+        type=str,
+        action="append",
+        required=True,
+        help="artifact directory to import, may be given more than once",
+    )
+    args = parser.parse_args(argv)
+
+    for artifact_dir in args.artifact_dir:
+        path = catalog_path(artifact_dir)
+        catalog = MetadataCatalog(path)
+        try:
+            imported, removed = catalog.sync(get_artifact_index(artifact_dir))
+        finally:
+            catalog.close()
+        print(
+            f"Synced '{artifact_dir}' into '{path}': {imported} imported, {removed} removed."
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Saves python-docx documents without recompressing the parts that did not
+change since the document was read.
+"""
+import os
+import time
+import zlib
+import struct
+import tempfile
+import zipfile
+
+from docx.opc.part import XmlPart
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.pkgwriter import _ContentTypesItem
+
+# entry and offset limits of a zip without zip64 extensions
+ZIP_LIMIT = 0xFFFFFFFF
+ZIP_ENTRY_LIMIT = 0xFFFF
+
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+END_RECORD = struct.Struct("<4s4H2LH")
+
+COPY_CHUNK = 1 << 20
+
+
+class PackageTooLarge(Exception):
+    pass
+
+
+class PackageSource:
+    """The file a document was read from and the non-XML part blobs read from it."""
+
+    def __init__(self, path: str, blobs: dict):
+        self.path = os.path.abspath(path)
+        stat = os.stat(self.path)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self.blobs = blobs
+
+    def unchanged(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) == self.signature
+
+
+def track_source(document, path: str):
+    """Remember that document matches the package at path."""
+    blobs = {
+        part.partname: part.blob
+        for part in document.part.package.iter_parts()
+        if not isinstance(part, XmlPart)
+    }
+    document._package_source = PackageSource(path, blobs)
+
+
+def _output_mode(path: str) -> int:
+    """Mode of the file at path, or the mode the umask gives a new file."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def save_package(document, path: str):
+    """
+    Save document to path, copying unchanged parts from its source package.
+
+    A non-XML part (media, customXml items, fonts, ...) whose blob is still
+    the one that was read has its compressed bytes streamed from the source
+    zip entry as they are. XML parts, relationships, [Content_Types].xml
+    and new or replaced parts are written like python-docx writes them.
+    Documents without a known source, whose source changed on disk, or that
+    would need zip64 are saved with document.save().
+    """
+    source = getattr(document, "_package_source", None)
+    if source is None or not source.unchanged():
+        document.save(path)
+    else:
+        # write next to the output and move it in place, path may be the source
+        out_dir = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=out_dir, suffix=".docx.tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                _write_package(document, out, source)
+            # mkstemp creates the file as 0600, keep the mode document.save() gives
+            os.chmod(temp_path, _output_mode(path))
+            os.replace(temp_path, path)
+        except PackageTooLarge:
+            os.remove(temp_path)
+            document.save(path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    track_source(document, path)
+
+
+def _write_package(document, out, source: PackageSource):
+    package = document.part.package
+    parts = list(package.iter_parts())
+    writer = _ZipWriter(out)
+
+    with open(source.path, "rb") as source_file, zipfile.ZipFile(source_file) as source_zip:
+        # same entries in the same order as docx.opc.pkgwriter.PackageWriter
+        writer.write(CONTENT_TYPES_URI.membername, _ContentTypesItem.from_parts(parts).blob)
+        writer.write(PACKAGE_URI.rels_uri.membername, package.rels.xml)
+        for part in parts:
+            membername = part.partname.membername
+            blob = part.blob
+            info = None
+            if source.blobs.get(part.partname) is blob:
+                try:
+                    info = source_zip.getinfo(membername)
+                except KeyError:
+                    pass
+            if info is not None:
+                writer.copy(membername, source_file, info)
+            else:
+                writer.write(membername, blob)
+            if len(part.rels):
+                writer.write(part.partname.rels_uri.membername, part.rels.xml)
+
+    writer.close()
+
+
+def _dos_date_time(date_time: tuple) -> tuple[int, int]:
+    year, month, day, hour, minute, second = date_time[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    dos_date = (year - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_date, dos_time
+
+
+class _ZipWriter:
+    """Minimal zip writer that can take already compressed entries."""
+
+    def __init__(self, out):
+        self.out = out
+        self.offset = 0
+        self.entries = []
+
+    def _write_header(
+        self,
+        membername: str,
+        method: int,
+        date_time: tuple,
+        crc: int,
+        compress_size: int,
+        file_size: int,
+        external_attr: int,
+    ):
+        if max(self.offset, compress_size, file_size) >= ZIP_LIMIT or (
+            len(self.entries) >= ZIP_ENTRY_LIMIT
+        ):
+            raise PackageTooLarge(membername)
+
+        name = membername.encode("utf-8")
+        flags = 0x800 if not membername.isascii() else 0
+        dos_date, dos_time = _dos_date_time(date_time)
+        fields = (method, dos_time, dos_date, crc, compress_size, file_size)
+
+        self.entries.append((name, flags, fields, external_attr, self.offset))
+        header = LOCAL_HEADER.pack(b"PK\x03\x04", 20, flags, *fields, len(name), 0)
+        self._emit(header + name)
+
+    def _emit(self, data: bytes):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def write(self, membername: str, data: bytes):
+        """Deflate data into a new entry, like ZipFile.writestr()."""
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        self._write_header(
+            membername,
+            zipfile.ZIP_DEFLATED,
+            time.localtime(),
+            zlib.crc32(data),
+            len(compressed),
+            len(data),
+            0o600 << 16,
+        )
+        self._emit(compressed)
+
+    def copy(self, membername: str, source_file, info: zipfile.ZipInfo):
+        """Stream the compressed bytes of a source entry into a new entry."""
+        source_file.seek(info.header_offset)
+        local = LOCAL_HEADER.unpack(source_file.read(LOCAL_HEADER.size))
+        name_length, extra_length = local[-2:]
+        source_file.seek(info.header_offset + LOCAL_HEADER.size + name_length + extra_length)
+
+        self._write_header(
+            membername,
+            info.compress_type,
+            info.date_time,
+            info.CRC,
+            info.compress_size,
+            info.file_size,
+            info.external_attr,
+        )
+        remaining = info.compress_size
+        while remaining:
+            chunk = source_file.read(min(COPY_CHUNK, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated entry {info.filename}")
+            self._emit(chunk)
+            remaining -= len(chunk)
+
+    def close(self):
+        directory_offset = self.offset
+        for name, flags, fields, external_attr, offset in self.entries:
+            header = CENTRAL_HEADER.pack(
+                b"PK\x01\x02",
+                20,
+                20,
+                flags,
+                *fields,
+                len(name),
+                0,
+                0,
+                0,
+                0,
+                external_attr,
+                offset,
+            )
+            self._emit(header + name)
+
+        if self.offset >= ZIP_LIMIT:
+            raise PackageTooLarge("central directory")
+        self._emit(
+            END_RECORD.pack(
+                b"PK\x05\x06",
+                0,
+                0,
+                len(self.entries),
+                len(self.entries),
+                self.offset - directory_offset,
+                directory_offset,
+                0,
+            )
+        )
@@ -1,84 +1,170 @@
 import re
 import json
 import argparse
+import timings
+from functools import lru_cache
+from typing import NamedTuple
 
-def parse_magic_string(input_string: str) -> dict[str, dict[str, str]]:
-    """
-    Parse the magic string format where arguments can be tied to individual files.
-    Returns a tuple of (list of files, arguments dictionary keyed by file name).
+MAGIC_SENTINEL = "{rpfy}:"
 
-    The function handles formats like:
-    - [file1.ext<width: 5, height: 8>, file2.ext<width: 4>, file3.ext]
-    - [file1.ext, file2.ext]
-    - file.ext<height: 6>
-    - file.ext
+# characters that open or close file args, or separate files in a list
+LIST_DELIMITERS = re.compile(r"[<>,]")
+
+# (file name, ((arg, value), ...)) of each file in a magic string
+MagicEntries = tuple[tuple[str, tuple[tuple[str, str], ...]], ...]
+
+
+class MagicToken(NamedTuple):
+    """A magic string found in a paragraph's text."""
+
+    # the magic string, from "{rpfy}:" up to the next one or the end of the text
+    text: str
+    # span of text in the paragraph text
+    start: int
+    end: int
+    entries: MagicEntries
+
+    @property
+    def value(self) -> str:
+        """The magic string without "{rpfy}:"."""
+        return self.text[len(MAGIC_SENTINEL) :].strip()
+
+    @property
+    def file_names(self) -> list[str]:
+        return [name for name, _ in self.entries]
+
+    def args(self) -> dict[str, dict[str, str]]:
+        """Arguments keyed by file name, a new dict callers are free to modify."""
+        return {name: dict(file_args) for name, file_args in self.entries}
+
+
+def _names_file(segment: str) -> bool:
     """
-    # Initialize structure to hold files and their arguments
-    args = {}
+    True if segment, from "{rpfy}:" on, ends in a file extension with no
+    line break before it.
+    """
+    dot = segment.rfind(".")
+    return 0 <= dot < len(segment) - 1 and "\n" not in segment[:dot]
+
 
-    magic_value = input_string.replace("{rpfy}:", "").strip()
+@lru_cache(maxsize=16384)
+def lex_magic_strings(text: str) -> tuple[MagicToken, ...]:
+    """
+    Find every magic string in a paragraph's text in one pass. Each runs
+    from its "{rpfy}:" to the next one or the end of the text and must
+    name a file with an extension. Results are cached by text.
+    """
+    tokens = []
+    start = text.find(MAGIC_SENTINEL)
+    while start >= 0:
+        following = text.find(MAGIC_SENTINEL, start + len(MAGIC_SENTINEL))
+        segment = text[start:] if following < 0 else text[start:following]
+        if _names_file(segment):
+            token_text = segment.rstrip()
+            tokens.append(
+                MagicToken(
+                    token_text,
+                    start,
+                    start + len(token_text),
+                    _parse_entries(token_text),
+                )
+            )
+        start = following
+
+    return tuple(tokens)
+
+
+def has_magic_string(text: str) -> bool:
+    return bool(lex_magic_strings(text))
+
+
+def _split_entries(content: str) -> list[str]:
+    """Split on commas outside of angle brackets."""
+    entries = []
+    entry_start = 0
+    bracket_depth = 0
+    for delimiter in LIST_DELIMITERS.finditer(content):
+        char = delimiter.group()
+        if char == "<":
+            bracket_depth += 1
+        elif char == ">":
+            bracket_depth -= 1
+        elif bracket_depth == 0:
+            entries.append(content[entry_start : delimiter.start()].strip())
+            entry_start = delimiter.end()
+
+    last_entry = content[entry_start:].strip()
+    if last_entry:
+        entries.append(last_entry)
+    return entries
+
+
+@lru_cache(maxsize=16384)
+def _parse_entries(input_string: str) -> MagicEntries:
+    magic_value = input_string.replace(MAGIC_SENTINEL, "").strip()
 
     # Check if it's a list of files
     if magic_value.startswith("[") and magic_value.endswith("]"):
-        # Multiple files within brackets
-        content = magic_value[1:-1].strip()
-
-        # Split by commas, but not those inside angle brackets
-        entries = []
-        current_entry = ""
-        bracket_depth = 0
-
-        for char in content:
-            if char == "<":
-                bracket_depth += 1
-                current_entry += char
-            elif char == ">":
-                bracket_depth -= 1
-                current_entry += char
-            elif char == "," and bracket_depth == 0:
-                # Only split on commas outside of angle brackets
-                entries.append(current_entry.strip())
-                current_entry = ""
-            else:
-                current_entry += char
-
-        if current_entry.strip():
-            entries.append(current_entry.strip())
+        entries = _split_entries(magic_value[1:-1].strip())
+    elif "<" not in magic_value:
+        # Single file without args
+        return ((magic_value, ()),)
     else:
         # Single file
         entries = [magic_value]
 
-    # Parse each file entry
+    parsed = {}
     for entry in entries:
-        file_match = re.match(r"^(.*?)(?:<|$)", entry)
-        file_name = file_match.group(1).strip() if file_match else ""
+        # file name is everything before the args
+        args_start = entry.find("<")
+        if args_start < 0:
+            parsed[entry.strip()] = ()
+            continue
 
-        args_match = re.search(r"<(.*?)>", entry)
         file_args = {}
-
-        if args_match:
-            args_str = args_match.group(1)
-            arg_pairs = args_str.split(",")
-
-            for pair in arg_pairs:
+        args_end = entry.find(">", args_start + 1)
+        if args_end >= 0:
+            for pair in entry[args_start + 1 : args_end].split(","):
                 if ":" in pair:
                     key, value = pair.split(":", 1)
                     file_args[key.strip()] = value.strip()
+        parsed[entry[:args_start].strip()] = tuple(file_args.items())
 
-        args[file_name] = file_args
+    return tuple(parsed.items())
 
-    return args
 
+def parse_magic_string(input_string: str) -> dict[str, dict[str, str]]:
+    """
+    Parse the magic string format where arguments can be tied to individual files.
+    Returns a dictionary of arguments keyed by file name.
 
-if __name__ == "__main__":
+    The function handles formats like:
+    - [file1.ext<width: 5, height: 8>, file2.ext<width: 4>, file3.ext]
+    - [file1.ext, file2.ext]
+    - file.ext<height: 6>
+    - file.ext
+    """
+    return {
+        file_name: dict(file_args)
+        for file_name, file_args in _parse_entries(input_string)
+    }
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Parse magic string into list of file names and dictionary of file specific options."
     )
     parser.add_argument(
         "-i", "--input", type=str, required=True, help="input magic string"
     )
-    args = parser.parse_args()
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("parse_magic_string.py", args):
+        result = parse_magic_string(args.input)
+        json_out = json.dumps(result)
+        print(json_out)
 
-    result = parse_magic_string(args.input)
-    json_out = json.dumps(result)
-    print(json_out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+import sys
+import helper
+import timings
+import argparse
+from typing import Optional
+
+from remove_footnotes import remove_footnotes_in_document
+from remove_tables import remove_tables_in_document
+from remove_figures import remove_figures_in_document
+from keep_caption_next import keep_caption_next_in_document
+from add_figure import add_figure_in_document
+from add_figure_alt_text import tag_figures_with_magic_in_document
+from add_figure_footnotes import add_figure_footnotes_in_document
+from add_table_footnotes import add_table_footnotes_in_document
+
+STAGES = ["strip", "figures", "footnotes"]
+
+
+def build_report(
+    docx_in: str,
+    docx_out: str,
+    stages: list[str],
+    figure_dir: Optional[str] = None,
+    table_dir: Optional[str] = None,
+    footnotes_yaml: Optional[str] = None,
+    config_yaml: Optional[str] = None,
+    include_object_path: bool = False,
+    fail_on_missing_metadata: bool = True,
+    fig_width: Optional[float] = None,
+    fig_height: Optional[float] = None,
+    debug_dir: Optional[str] = None,
+):
+    """
+    Run the build stages on a single in-memory copy of the document.
+
+    The document is loaded once, every requested stage operates on the
+    same lxml tree, and the result is saved once. Stages always run in
+    the order of STAGES:
+    - strip: remove footnotes, tables, and figures
+    - figures: keep captions with artifacts, insert figures and alt text
+    - footnotes: insert figure and table footnotes
+
+    If debug_dir is given, a copy of the document is saved there after
+    each stage.
+    """
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown pipeline stages: {', '.join(sorted(unknown))}")
+
+    # load config.yaml or set empty dict for defaults.
+    if config_yaml is not None:
+        config = helper.load_yaml(config_yaml)
+    else:
+        config = {}
+
+    document = helper.open_document(docx_in)
+    missing_metadata = False
+
+    for stage_idx, stage in enumerate(s for s in STAGES if s in stages):
+        match stage:
+            case "strip":
+                remove_footnotes_in_document(document)
+                remove_tables_in_document(document)
+                remove_figures_in_document(document, config)
+            case "figures":
+                keep_caption_next_in_document(document)
+                add_figure_in_document(
+                    document, figure_dir, config, fig_width, fig_height
+                )
+                tag_figures_with_magic_in_document(document)
+            case "footnotes":
+                footnotes = helper.load_yaml(footnotes_yaml)
+                missing_figure_metadata = add_figure_footnotes_in_document(
+                    document, figure_dir, footnotes, config, include_object_path
+                )
+                missing_table_metadata = add_table_footnotes_in_document(
+                    document, table_dir, footnotes, config, include_object_path
+                )
+                missing_metadata = missing_figure_metadata or missing_table_metadata
+
+        if debug_dir is not None:
+            os.makedirs(debug_dir, exist_ok=True)
+            stem = os.path.splitext(os.path.basename(docx_out))[0]
+            stage_docx = os.path.join(debug_dir, f"{stem}-{stage_idx}-{stage}.docx")
+            document.save(stage_docx)
+            print(f"Stage '{stage}' saved at '{stage_docx}'.")
+
+    if missing_metadata and fail_on_missing_metadata:
+        print(
+            "Output not created due to missing metadata. Please check logs for missing metadata files."
+        )
+        sys.exit(1)
+
+    helper.save_document(document, docx_out)
+    print(f"Processed file saved at '{docx_out}'.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the report build stages on a single load of the input docx document"
+    )
+    parser.add_argument(
+        "-i", "--input", type=str, required=True, help="input docx file path"
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, required=True, help="output docx file path"
+    )
+    parser.add_argument(
+        "-s",
+        "--stages",
+        type=lambda x: [s.strip() for s in x.split(",")],
+        default=STAGES,
+        help=f"comma separated stages to run, any of: {', '.join(STAGES)}",
+    )
+    parser.add_argument(
+        "-d", "--figure_dir", type=str, default=None, help="Path to figures directory"
+    )
+    parser.add_argument(
+        "-t", "--table_dir", type=str, default=None, help="Path to tables directory"
+    )
+    parser.add_argument(
+        "-f",
+        "--footnotes",
+        type=str,
+        default=None,
+        help="path to standard footnotes yaml",
+    )
+    parser.add_argument(
+        "-c", "--config", type=str, default=None, help="Path to config.yaml file"
+    )
+    parser.add_argument(
+        "-b",
+        "--object",
+        type=lambda x: x.lower() in ["true", "t"],
+        default=False,
+        help="include object path",
+    )
+    parser.add_argument(
+        "-m",
+        "--fail_metadata",
+        type=lambda x: x.lower() in ["true", "t"],
+        default=True,
+        help="Fail on missing metadata files",
+    )
+    parser.add_argument("-w", "--width", type=float, default=None, help="Figure width")
+    parser.add_argument("-g", "--height", type=float, default=None, help="Figure height")
+    parser.add_argument(
+        "--debug_dir",
+        type=str,
+        default=None,
+        help="Directory to save a copy of the document after each stage",
+    )
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("pipeline.py", args):
+        build_report(
+            args.input,
+            args.output,
+            args.stages,
+            args.figure_dir,
+            args.table_dir,
+            args.footnotes,
+            args.config,
+            args.object,
+            args.fail_metadata,
+            args.width,
+            args.height,
+            args.debug_dir,
+        )
+
+
+if __name__ == "__main__":
+    main()
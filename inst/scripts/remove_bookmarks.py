@@ -1,37 +1,13 @@
 import argparse
-from docx import Document
-from docx.oxml.ns import qn
+import timings
+from finalize import finalize
 
 
 def remove_bookmarks(docx_in, docx_out):
-    doc = Document(docx_in)
+    finalize(docx_in, docx_out, ["bookmarks"])
 
-    fp_bookmark_ids = set()
 
-    for element in doc.element.findall(
-        ".//w:bookmarkStart", namespaces=doc.element.nsmap
-    ):
-        bookmark_name = element.get(qn("w:name"))
-        if bookmark_name and bookmark_name.startswith("fp_"):
-            fp_bookmark_ids.add(
-                element.get(qn("w:id"))
-            )  # Store ID of removed bookmarks
-            parent = element.getparent()
-            parent.remove(element)
-
-    for element in doc.element.findall(
-        ".//w:bookmarkEnd", namespaces=doc.element.nsmap
-    ):
-        bookmark_id = element.get(qn("w:id"))
-        if bookmark_id in fp_bookmark_ids:  # Remove only matching bookmarkEnd
-            parent = element.getparent()
-            parent.remove(element)
-
-    doc.save(docx_out)
-    print(f"Processed file saved at '{docx_out}'.")
-
-
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Remove only bookmarks that start with 'fp_' from a Word document"
     )
@@ -41,6 +17,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "-o", "--output", type=str, required=True, help="Output docx file path"
     )
-    args = parser.parse_args()
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("remove_bookmarks.py", args):
+        remove_bookmarks(args.input, args.output)
 
-    remove_bookmarks(args.input, args.output)
+
+if __name__ == "__main__":
+    main()
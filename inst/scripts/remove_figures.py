@@ -1,9 +1,10 @@
 import argparse
 import helper
-from docx import Document
+import timings
 
 from typing import Optional
-from parse_magic_string import parse_magic_string
+from docx.text.paragraph import Paragraph
+from magic_index import MagicIndex
 
 
 def remove_figures(
@@ -11,8 +12,7 @@ def remove_figures(
     docx_out: str,
     config_yaml: Optional[str],
 ):
-    doc = Document(docx_in)
-    paragraphs = doc.paragraphs
+    doc = helper.open_document(docx_in)
 
     # load config.yaml or set empty dict for defaults.
     if config_yaml is not None:
@@ -20,10 +20,21 @@ def remove_figures(
     else:
         config = {}
 
-    for i, paragraph in enumerate(paragraphs):
-        text = paragraph.text.strip()
-        if text.startswith("{rpfy}:"):
-            figure_args = parse_magic_string(text)
+    remove_figures_in_document(doc, config)
+    helper.save_document(doc, docx_out)
+    print(f"Processed file saved at '{docx_out}'.")
+
+
+@timings.timed("strip")
+def remove_figures_in_document(doc, config: dict):
+    index = MagicIndex(doc)
+    paragraphs = index.paragraphs
+
+    for anchor in list(index):
+        if anchor.text.strip().startswith("{rpfy}:"):
+            i = anchor.ordinal
+            paragraph = Paragraph(anchor.element, doc._body)
+            figure_args = anchor.args
             update_magic_string = False
 
             # if config.get("use_
@@ -32,7 +43,7 @@ def remove_figures(
             paragraphs_to_remove = []
             for j, args in enumerate(figure_args.values()):
                 if i + j + 1 < len(paragraphs):
-                    next_par = paragraphs[i + j + 1]
+                    next_par = Paragraph(paragraphs[i + j + 1], doc._body)
                     if not next_par.text.strip() and next_par._element.xpath(
                         ".//w:drawing"
                     ):
@@ -74,12 +85,10 @@ def remove_figures(
 
                 new_magic_string += ending_string
                 paragraph.text = new_magic_string
+                anchor.refresh()
 
             for _, par in reversed(paragraphs_to_remove):
-                par._element.getparent().remove(par._element)
-
-    doc.save(docx_out)
-    print(f"Processed file saved at '{docx_out}'.")
+                index.remove(par._element)
 
 
 def get_figure_dimensions(paragraph) -> dict[str, Optional[int]]:
@@ -126,7 +135,7 @@ def get_figure_dimensions(paragraph) -> dict[str, Optional[int]]:
     return {"width": width, "height": height}
 
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Remove figures from input docx document"
     )
@@ -139,6 +148,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "-c", "--config", type=str, default=None, help="Path to config.yaml"
     )
-    args = parser.parse_args()
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("remove_figures.py", args):
+        remove_figures(args.input, args.output, args.config)
 
-    remove_figures(args.input, args.output, args.config)
+
+if __name__ == "__main__":
+    main()
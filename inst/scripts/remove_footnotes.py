@@ -1,49 +1,88 @@
-import os
 import argparse
-from docx import Document
+from collections import defaultdict, deque
+
+import helper
+import timings
+
+from docx.oxml.ns import qn
+
+W_BOOKMARK_START = qn("w:bookmarkStart")
+W_BOOKMARK_END = qn("w:bookmarkEnd")
+W_ID = qn("w:id")
+W_NAME = qn("w:name")
 
 
 # This still uses the bookmark approach via fp_
 def remove_footnotes(docx_in, docx_out):
-    namespace = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+    doc = helper.open_document(docx_in)
+    remove_footnotes_in_document(doc)
+    helper.save_document(doc, docx_out)
+    print(f"Processed file saved at '{docx_out}'.")
+
 
-    doc = Document(docx_in)
+def in_tree(element, root) -> bool:
+    """Whether element is still in the tree of root."""
+    while element is not None and element is not root:
+        element = element.getparent()
+    return element is root
+
+
+@timings.timed("strip")
+def remove_footnotes_in_document(doc):
+    root = doc.element
+
+    # A single pass pairs bookmarks by id: every fp_ bookmarkStart in
+    # document order, and the bookmarkEnds of each id in document order.
+    # Footnote paragraph ids are not unique, so the end of a footnote is
+    # the first end with its id that is still in the document.
+    starts = []
+    ends = defaultdict(deque)
+    for bookmark in root.iter(W_BOOKMARK_START, W_BOOKMARK_END):
+        if bookmark.tag == W_BOOKMARK_END:
+            ends[bookmark.get(W_ID)].append(bookmark)
+        elif (bookmark.get(W_NAME) or "").startswith("fp_"):
+            starts.append(bookmark)
 
     # Remove footnotes with 'fp_' in the bookmark name
-    for bookmark in doc.element.xpath("//w:bookmarkStart"):
-        name = bookmark.get(namespace + "name")
-        if name.startswith("fp_"):
-            bookmark_id = bookmark.get(namespace + "id")
-            end_bookmark = doc.element.xpath(f'//w:bookmarkEnd[@w:id="{bookmark_id}"]')[
-                0
-            ]
-
-            elements_to_remove = []
-            current_element = bookmark.getnext()
-            while current_element is not end_bookmark:
-                elements_to_remove.append(current_element)
-                current_element = current_element.getnext()
-
-            for element in elements_to_remove:
-                element.getparent().remove(element)
-
-            parent_element = bookmark.getparent()
-
-            bookmark.getparent().remove(bookmark)
-            end_bookmark.getparent().remove(end_bookmark)
-
-            if len(parent_element) == 0:
-                parent_element.getparent().remove(parent_element)
-            elif parent_element.tag.endswith("p") and not any(
-                child.tag.endswith("r") for child in parent_element
-            ):
-                parent_element.getparent().remove(parent_element)
-
-    doc.save(docx_out)
-    print(f"Processed file saved at '{docx_out}'.")
+    for bookmark in starts:
+        if not in_tree(bookmark, root):
+            # removed with an earlier footnote
+            continue
 
+        candidates = ends[bookmark.get(W_ID)]
+        while candidates and not in_tree(candidates[0], root):
+            candidates.popleft()
+        if not candidates:
+            continue
+        end_bookmark = candidates[0]
 
-if __name__ == "__main__":
+        elements_to_remove = []
+        current_element = bookmark.getnext()
+        while current_element is not None and current_element is not end_bookmark:
+            elements_to_remove.append(current_element)
+            current_element = current_element.getnext()
+        if current_element is None:
+            # the end is not in the same paragraph after the start
+            continue
+        candidates.popleft()
+
+        for element in elements_to_remove:
+            element.getparent().remove(element)
+
+        parent_element = bookmark.getparent()
+
+        bookmark.getparent().remove(bookmark)
+        end_bookmark.getparent().remove(end_bookmark)
+
+        if len(parent_element) == 0:
+            parent_element.getparent().remove(parent_element)
+        elif parent_element.tag.endswith("p") and not any(
+            child.tag.endswith("r") for child in parent_element
+        ):
+            parent_element.getparent().remove(parent_element)
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Add figures to input docx document")
     parser.add_argument(
         "-i", "--input", type=str, required=True, help="input docx file path"
@@ -51,6 +90,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "-o", "--output", type=str, required=True, help="Output docx file"
     )
-    args = parser.parse_args()
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("remove_footnotes.py", args):
+        remove_footnotes(args.input, args.output)
 
-    remove_footnotes(args.input, args.output)
+
+if __name__ == "__main__":
+    main()
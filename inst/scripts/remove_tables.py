@@ -1,26 +1,30 @@
 import argparse
-from docx import Document
+import helper
+import timings
+from magic_index import MagicIndex, W_P, W_TBL
 
 
 def remove_tables(docx_in, docx_out):
-    doc = Document(docx_in)
-    namespace = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
-
-    for paragraph in doc.paragraphs:
-        if paragraph.text.startswith("{rpfy}:"):
-            p_element = paragraph._element
-            for next_elem in p_element.itersiblings():
-                if next_elem.tag.endswith("tbl"):
-                    next_elem.getparent().remove(next_elem)
+    doc = helper.open_document(docx_in)
+    remove_tables_in_document(doc)
+    helper.save_document(doc, docx_out)
+    print(f"Processed file saved at '{docx_out}'.")
+
+
+@timings.timed("strip")
+def remove_tables_in_document(doc):
+    index = MagicIndex(doc)
+    for anchor in index:
+        if anchor.text.startswith("{rpfy}:"):
+            for next_elem in anchor.element.itersiblings():
+                if next_elem.tag == W_TBL:
+                    index.remove(next_elem)
                     break
-                elif next_elem.tag.endswith("p"):
+                elif next_elem.tag == W_P:
                     break
 
-    doc.save(docx_out)
-    print(f"Processed file saved at '{docx_out}'.")
-
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Add figures to input docx document")
     parser.add_argument(
         "-i", "--input", type=str, required=True, help="input docx file path"
@@ -28,6 +32,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "-o", "--output", type=str, required=True, help="output docx file path"
     )
-    args = parser.parse_args()
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("remove_tables.py", args):
+        remove_tables(args.input, args.output)
 
-    remove_tables(args.input, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Records where a script spends its time for --timings_json and --profile.
+Without either flag nothing is recorded and phase() and count() do nothing.
+"""
+import sys
+import json
+import time
+import argparse
+import contextlib
+import functools
+from collections import Counter
+from typing import Optional
+
+# order of the phases in the JSON, any others come after them
+PHASES = [
+    "load",
+    "scan",
+    "strip",
+    "captions",
+    "image prep",
+    "insert",
+    "alt text",
+    "footnotes",
+    "finalize",
+    "save",
+]
+
+
+class Timings:
+    def __init__(self, script: str):
+        self.script = script
+        self.phases: dict[str, dict] = {}
+        self.counts: Counter = Counter()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        # wall and cpu time of the phases nested in each open phase
+        self._stack: list[list[float]] = []
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self._stack.append([0.0, 0.0])
+        try:
+            yield
+        finally:
+            nested_wall, nested_cpu = self._stack.pop()
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            if self._stack:
+                self._stack[-1][0] += wall
+                self._stack[-1][1] += cpu
+
+            entry = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            entry["wall"] += wall - nested_wall
+            entry["cpu"] += cpu - nested_cpu
+            entry["calls"] += 1
+
+    def to_dict(self, status: int) -> dict:
+        """
+        The JSON written to --timings_json:
+
+            {"script": "pipeline.py", "status": 0,
+             "wall": 1.52, "cpu": 1.48,
+             "phases": {"load": {"wall": 0.31, "cpu": 0.30, "calls": 1}, ...},
+             "counts": {"anchors": 120, "figures": 80, ...},
+             "bytes_read": 5242880, "bytes_written": 6291456}
+
+        Phase times are exclusive: a scan run inside the footnotes phase is
+        timed as scan only. Time outside every phase is reported as "other".
+        """
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        phases = {
+            name: {
+                "wall": round(entry["wall"], 6),
+                "cpu": round(entry["cpu"], 6),
+                "calls": entry["calls"],
+            }
+            for name, entry in sorted(
+                self.phases.items(),
+                key=lambda item: (
+                    PHASES.index(item[0]) if item[0] in PHASES else len(PHASES)
+                ),
+            )
+        }
+        phases["other"] = {
+            "wall": round(max(wall - sum(e["wall"] for e in self.phases.values()), 0), 6),
+            "cpu": round(max(cpu - sum(e["cpu"] for e in self.phases.values()), 0), 6),
+            "calls": 1,
+        }
+        return {
+            "script": self.script,
+            "status": status,
+            "wall": round(wall, 6),
+            "cpu": round(cpu, 6),
+            "phases": phases,
+            "counts": dict(self.counts),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+
+# recorder of the script being run, None unless it asked for timings
+_active: Optional[Timings] = None
+
+
+def phase(name: str):
+    """Context manager timing a phase of the running script."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.phase(name)
+
+
+def timed(name: str):
+    """Decorator timing every call of a function as a phase."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name: str, n: int = 1):
+    """Add n to a count of things processed."""
+    if _active is not None:
+        _active.counts[name] += n
+
+
+def observe(name: str, n: int):
+    """
+    Keep the largest n seen for a count, for things like anchors that
+    are found again by every step but only exist once.
+    """
+    if _active is not None:
+        _active.counts[name] = max(_active.counts[name], n)
+
+
+def add_bytes(read: int = 0, written: int = 0):
+    if _active is not None:
+        _active.bytes_read += read
+        _active.bytes_written += written
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add --timings_json and --profile to a script's arguments."""
+    parser.add_argument(
+        "--timings_json",
+        "--timings-json",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="save wall and CPU time per phase, counts, and bytes read and written to PATH",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="run under cProfile, saving the stats to PATH or printing the slowest calls",
+    )
+
+
+@contextlib.contextmanager
+def record(script: str, args: argparse.Namespace):
+    """
+    Record the timings of the script's work run in this context, saving
+    them to args.timings_json even if the script exits with an error.
+    """
+    global _active
+
+    if args.timings_json is None and args.profile is None:
+        yield
+        return
+
+    previous = _active
+    _active = Timings(script)
+    profiler = None
+    if args.profile is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    status = 0
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        raise
+    except BaseException:
+        status = 1
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        timings, _active = _active, previous
+
+        if args.timings_json is not None:
+            with open(args.timings_json, "w") as t:
+                json.dump(timings.to_dict(status), t, indent=2)
+
+        if profiler is not None:
+            if args.profile:
+                profiler.dump_stats(args.profile)
+            else:
+                import pstats
+
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats(
+                    "cumulative"
+                ).print_stats(25)
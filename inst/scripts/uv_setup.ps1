@@ -103,6 +103,10 @@ if (-not (Test-Path $VenvPath)) {
     Write-Host "venv already exists at $VenvPath"
 }
 
+# Compile the bytecode of packages as they are installed, so the first
+# script run does not compile them
+$env:UV_COMPILE_BYTECODE = "1"
+
 # Activate virtual environment (for uv pip commands)
 # Note: We don't need to source activate script, uv pip works with --python flag
 
@@ -166,4 +170,16 @@ Install-PythonPackage -PackageName "pyyaml" -ImportName "yaml" -RequestedVersion
 # Install/update Pillow
 Install-PythonPackage -PackageName "Pillow" -ImportName "PIL" -RequestedVersion $PillowVersion -DefaultVersion "11.1.0"
 
+# Precompile the reportifyr scripts, and packages installed before bytecode
+# was compiled on install, so the modules scripts import load from bytecode
+# even where the package library is read-only later
+$PythonExe = Join-Path $VenvPath "Scripts\python.exe"
+$SitePackages = & $PythonExe -c "import sysconfig; print(sysconfig.get_paths()['purelib'])"
+& $PythonExe -m compileall -q -j 0 $PSScriptRoot $SitePackages | Out-Null
+if ($LASTEXITCODE -eq 0) {
+    Write-Host "Compiled Python bytecode"
+} else {
+    Write-Warning "Could not compile all Python bytecode, it is compiled on first use instead"
+}
+
 Write-Host "Python environment setup completed successfully"
@@ -52,6 +52,10 @@ fi
 
 source "$1/.venv/bin/activate"
 
+# Compile the bytecode of packages as they are installed, so the first
+# script run does not compile them
+export UV_COMPILE_BYTECODE=1
+
 # Check if python-docx is installed, install it if not
 if ! python -c "import docx" &> /dev/null; then
   if [ -n "$2" ]; then
@@ -132,3 +136,14 @@ else
     echo "pillow already at correct version (v$CURRENT_VERSION)"
   fi
 fi
+
+# Precompile the reportifyr scripts, and packages installed before bytecode
+# was compiled on install, so the modules scripts import load from bytecode
+# even where the package library is read-only later
+SCRIPTS_DIR="$(cd "$(dirname "$0")" && pwd)"
+SITE_PACKAGES="$(python -c 'import sysconfig; print(sysconfig.get_paths()["purelib"])')"
+if python -m compileall -q -j 0 "$SCRIPTS_DIR" "$SITE_PACKAGES" > /dev/null; then
+  echo "Compiled Python bytecode"
+else
+  echo "Could not compile all Python bytecode, it is compiled on first use instead"
+fi
@@ -0,0 +1,174 @@
+"""
+Checks the magic strings of a document before a build, streaming
+word/document.xml so memory stays flat whatever the size of the document.
+"""
+import os
+import sys
+import json
+import zipfile
+import argparse
+import timings
+from collections import Counter
+from typing import Iterator, Optional
+
+from lxml import etree
+
+from parse_magic_string import MAGIC_SENTINEL, lex_magic_strings
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_P = f"{{{W_NS}}}p"
+W_T = f"{{{W_NS}}}t"
+W_TR = f"{{{W_NS}}}tr"
+
+FIGURE_EXTENSIONS = [".png"]
+TABLE_EXTENSIONS = [".csv", ".rds"]
+# characters left in a file name by an unclosed list or argument block
+MALFORMED = set("[]<>")
+
+
+def iter_paragraph_texts(docx_in: str) -> Iterator[str]:
+    """
+    Text of every paragraph in word/document.xml in document order,
+    clearing each paragraph and table row after it is read.
+    """
+    with zipfile.ZipFile(docx_in) as z:
+        timings.add_bytes(read=z.getinfo("word/document.xml").file_size)
+        with z.open("word/document.xml") as xml:
+            for _, element in etree.iterparse(xml, events=("end",), tag=(W_P, W_TR)):
+                if element.tag == W_P:
+                    yield "".join(t.text for t in element.iter(W_T) if t.text)
+                element.clear(keep_tail=True)
+                # drop the siblings already read, they are empty once cleared
+                parent = element.getparent()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+
+def metadata_path(artifact_dir: str, file_name: str) -> str:
+    object_name, extension = os.path.splitext(file_name)
+    return os.path.join(artifact_dir, f"{object_name}_{extension[1::]}_metadata.json")
+
+
+def artifact_dir(
+    file_name: str, figure_dir: Optional[str], table_dir: Optional[str]
+) -> Optional[str]:
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in FIGURE_EXTENSIONS:
+        return figure_dir
+    if extension in TABLE_EXTENSIONS:
+        return table_dir
+    return None
+
+
+@timings.timed("scan")
+def validate_docx(
+    docx_in: str,
+    figure_dir: Optional[str] = None,
+    table_dir: Optional[str] = None,
+) -> dict:
+    """
+    Report on the magic strings of docx_in:
+
+        {"paragraphs": 1200,
+         "magic_strings": [{"paragraph": 12, "text": "{rpfy}:fig.png",
+                            "value": "fig.png", "files": ["fig.png"]}, ...],
+         "invalid": [{"paragraph": 40, "text": "{rpfy}:[a.csv, b.csv"}],
+         "files": ["fig.png", ...],
+         "unsupported": [], "duplicates": [],
+         "missing_files": [], "missing_metadata": []}
+
+    paragraph is the position of the paragraph in the document, counting
+    from 1 and including paragraphs in tables. invalid has paragraphs with
+    "{rpfy}:" but no magic string naming a file, and magic strings with a
+    malformed file list. missing_files and missing_metadata are only
+    checked for figures (.png) when figure_dir is given and for tables
+    (.csv, .rds) when table_dir is given.
+    """
+    magic_strings = []
+    invalid = []
+    files = []
+    paragraph = 0
+    for paragraph, text in enumerate(iter_paragraph_texts(docx_in), start=1):
+        if MAGIC_SENTINEL not in text:
+            continue
+        tokens = lex_magic_strings(text)
+        if not tokens:
+            invalid.append({"paragraph": paragraph, "text": text})
+            continue
+        for token in tokens:
+            names = token.file_names
+            if any(not name or MALFORMED & set(name) for name in names):
+                invalid.append({"paragraph": paragraph, "text": token.text})
+                continue
+            magic_strings.append(
+                {
+                    "paragraph": paragraph,
+                    "text": token.text,
+                    "value": token.value,
+                    "files": names,
+                }
+            )
+            files.extend(names)
+
+    supported = FIGURE_EXTENSIONS + TABLE_EXTENSIONS
+    counts = Counter(files)
+    missing_files = []
+    missing_metadata = []
+    for file_name in counts:
+        directory = artifact_dir(file_name, figure_dir, table_dir)
+        if directory is None:
+            continue
+        if not os.path.exists(os.path.join(directory, file_name)):
+            missing_files.append(file_name)
+        if not os.path.exists(metadata_path(directory, file_name)):
+            missing_metadata.append(file_name)
+
+    timings.observe("anchors", len(magic_strings))
+    return {
+        "paragraphs": paragraph,
+        "magic_strings": magic_strings,
+        "invalid": invalid,
+        "files": files,
+        "unsupported": [
+            name
+            for name in counts
+            if os.path.splitext(name)[1].lower() not in supported
+        ],
+        "duplicates": [name for name, n in counts.items() if n > 1],
+        "missing_files": missing_files,
+        "missing_metadata": missing_metadata,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check the magic strings of input docx document and print a JSON report"
+    )
+    parser.add_argument(
+        "-i", "--input", type=str, required=True, help="input docx file path"
+    )
+    parser.add_argument(
+        "-d",
+        "--figure_dir",
+        type=str,
+        default=None,
+        help="figures directory, to check figure files and metadata exist",
+    )
+    parser.add_argument(
+        "-t",
+        "--table_dir",
+        type=str,
+        default=None,
+        help="tables directory, to check table files and metadata exist",
+    )
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with timings.record("validate_docx.py", args):
+        report = validate_docx(args.input, args.figure_dir, args.table_dir)
+        json.dump(report, sys.stdout)
+        print()
+
+
+if __name__ == "__main__":
+    main()
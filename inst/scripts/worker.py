@@ -0,0 +1,151 @@
+"""
+Keeps a single Python process alive for the R front end, running the
+scripts in-process so modules, parsed YAML and saved documents stay loaded.
+"""
+import io
+import os
+import sys
+import json
+import helper
+import argparse
+import importlib
+import traceback
+import contextlib
+
+SCRIPTS = [
+    "add_figure.py",
+    "add_figure_alt_text.py",
+    "add_figure_footnotes.py",
+    "add_table_alt_text.py",
+    "add_table_footnotes.py",
+    "alt_text.py",
+    "batch.py",
+    "check_alt_text_magic.py",
+    "finalize.py",
+    "keep_caption_next.py",
+    "parse_magic_string.py",
+    "incremental.py",
+    "pipeline.py",
+    "remove_bookmarks.py",
+    "remove_figures.py",
+    "remove_footnotes.py",
+    "remove_magic_strings.py",
+    "remove_tables.py",
+    "validate_docx.py",
+]
+
+
+def run_script(script: str, args: list[str]) -> dict:
+    """Run a script's main() capturing its output and exit status."""
+    if script not in SCRIPTS:
+        return {"status": 1, "stdout": "", "stderr": f"Unknown script: {script}"}
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    status = 0
+    argv = sys.argv
+    sys.argv = [script] + args
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            module = importlib.import_module(os.path.splitext(script)[0])
+            module.main(args)
+        except SystemExit as e:
+            if e.code is None:
+                status = 0
+            elif isinstance(e.code, int):
+                status = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                status = 1
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            sys.argv = argv
+
+    return {"status": status, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def handle_request(request: dict) -> dict:
+    command = request.get("command")
+    match command:
+        case "ping":
+            return {"status": 0, "stdout": "pong", "stderr": ""}
+        case "clear_cache":
+            helper.clear_document_cache()
+            return {"status": 0, "stdout": "", "stderr": ""}
+        case None:
+            if request.get("cwd"):
+                os.chdir(request["cwd"])
+            args = request.get("args", [])
+            if isinstance(args, str):
+                args = [args]
+            return run_script(request.get("script", ""), [str(a) for a in args])
+        case _:
+            return {"status": 1, "stdout": "", "stderr": f"Unknown command: {command}"}
+
+
+def serve(max_documents: int):
+    """
+    Read requests from stdin and write responses to stdout, one JSON object
+    per line:
+
+        {"id": 1, "script": "add_figure.py", "args": ["-i", ...], "cwd": "..."}
+        {"id": 1, "status": 0, "stdout": "...", "stderr": "..."}
+
+    script is run by calling its main() with args, exactly as
+    `uv run script.py args...` would. The commands "ping", "clear_cache",
+    and "shutdown" may be sent instead of a script.
+    """
+    helper.enable_document_cache(max_documents)
+
+    # the protocol owns the real stdout, scripts only see redirected streams
+    protocol_out = sys.stdout
+
+    def respond(response: dict):
+        protocol_out.write(json.dumps(response) + "\n")
+        protocol_out.flush()
+
+    respond({"id": None, "status": 0, "stdout": "ready", "stderr": ""})
+
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            respond({"id": None, "status": 1, "stdout": "", "stderr": f"Invalid request: {e}"})
+            continue
+
+        if request.get("command") == "shutdown":
+            respond({"id": request.get("id"), "status": 0, "stdout": "", "stderr": ""})
+            break
+
+        response = handle_request(request)
+        response["id"] = request.get("id")
+        respond(response)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve reportifyr script requests as JSON lines over stdin/stdout"
+    )
+    parser.add_argument(
+        "-n",
+        "--max_documents",
+        type=int,
+        default=4,
+        help="Number of saved documents to keep in memory between requests",
+    )
+    args = parser.parse_args(argv)
+
+    serve(args.max_documents)
+
+
+if __name__ == "__main__":
+    main()